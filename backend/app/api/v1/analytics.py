@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.services import analytics_store as analytics
+from app.services.analytics_store import analytics_store
+from app.services.export_service import parquet_available
+
+router = APIRouter()
+
+# Sync endpoints on purpose: the Parquet scans run in the threadpool
+
+def _store():
+    if not parquet_available():
+        raise HTTPException(503, "The analytics store requires pyarrow to be installed")
+    # First use builds the store; after that the background refresher keeps it current
+    analytics_store.refresh_if_empty()
+    return analytics_store
+
+def _filters(date_from, date_to, condition):
+    if date_from and date_to and date_from >= date_to:
+        raise HTTPException(400, "date_from must be before date_to")
+    return {"date_from": date_from, "date_to": date_to, "condition": condition}
+
+# COHORT TRENDS
+@router.get("/resting-hr")
+def resting_hr_trend(
+    period: str = Query("week", pattern="^(week|month)$"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    condition: Optional[str] = None,
+):
+    return {"period": period,
+            "items": analytics.resting_hr_by_period(_store(), period, **_filters(date_from, date_to, condition))}
+
+@router.get("/urgent-share")
+def urgent_share_trend(
+    period: str = Query("week", pattern="^(week|month)$"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    condition: Optional[str] = None,
+):
+    return {"period": period,
+            "items": analytics.urgent_share_by_period(_store(), period, **_filters(date_from, date_to, condition))}
+
+@router.get("/borg")
+def borg_by_intensity(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    condition: Optional[str] = None,
+):
+    return {"items": analytics.borg_by_intensity(_store(), **_filters(date_from, date_to, condition))}
+
+# STORE MAINTENANCE
+@router.get("/status")
+def store_status():
+    if not parquet_available():
+        raise HTTPException(503, "The analytics store requires pyarrow to be installed")
+    return analytics_store.status()
+
+@router.post("/refresh")
+def refresh_store(rebuild: bool = False):
+    if not parquet_available():
+        raise HTTPException(503, "The analytics store requires pyarrow to be installed")
+    return analytics_store.refresh(rebuild=rebuild)
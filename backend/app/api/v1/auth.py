@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.db.session import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.session import get_db
 from app.models.user import User, UserRole
+from app.services.user_cache import user_cache
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -13,9 +15,9 @@ class UserCreate(BaseModel):
     role: UserRole
 
 @router.post("/register")
-def register_new_user(user_data: UserCreate, db: Session = Depends(get_session)):
+async def register_new_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     # 1. Check if username exists
-    existing = db.exec(select(User).where(User.username == user_data.username)).first()
+    existing = (await db.exec(select(User).where(User.username == user_data.username))).first()
     if existing:
         raise HTTPException(status_code=400, detail="Username taken")
     
@@ -29,7 +31,8 @@ def register_new_user(user_data: UserCreate, db: Session = Depends(get_session))
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    user_cache.invalidate(user_id=new_user.id, username=new_user.username)
     
     return {"status": "success", "user_id": new_user.id}
\ No newline at end of file
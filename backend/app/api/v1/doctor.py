@@ -1,52 +1,311 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List
-from app.db.session import get_session
+import asyncio
+import base64
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import and_, case, insert, or_, update
+from typing import List, Optional
+from app.db.session import get_db
 from app.models.health import HealthRecord, Remark
-from app.models.user import User # Import User model
+from app.schemas.health_schema import Intensity, OverrideItem, RemarkItem
+from app.services import stats_service
+from app.services.alert_broker import ALERT_FIELDS, alert_broker
+from app.services.user_cache import user_cache
+from app.core.config import settings
+from app.core.instrumentation import stage
+from app.core.responses import FastJSONResponse, columnar
+from app.services.ml_service import estimate_calories
+from app.services.export_service import EXPORT_FORMATS, parquet_available, stream_export
 
 router = APIRouter()
 
+RECORD_FIELDS = [c.name for c in HealthRecord.__table__.columns]
+DASHBOARD_FIELDS = RECORD_FIELDS + ["patient_username"]
+
+def _encode_cursor(timestamp: datetime, record_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), record_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+async def _attach_usernames(db, items):
+    # One cached lookup per page instead of a User join on every row
+    users = await user_cache.get_many(db, {item["patient_id"] for item in items})
+    for item in items:
+        user = users.get(item["patient_id"])
+        item["patient_username"] = user["username"] if user else None
+
+def _decode_cursor(cursor: str):
+    try:
+        ts, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(ts), int(record_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+def _before_cursor(cursor: str):
+    # Rows after the cursor in (timestamp DESC, id DESC) order. The plain
+    # timestamp bound lets the (timestamp, id) indexes seek to the cursor
+    # instead of scanning every newer row first.
+    ts, last_id = _decode_cursor(cursor)
+    return (HealthRecord.timestamp <= ts,
+            or_(HealthRecord.timestamp < ts, and_(HealthRecord.timestamp == ts, HealthRecord.id < last_id)))
+
 @router.get("/dashboard")
-def get_dashboard(db: Session = Depends(get_session)):
-    # JOIN HealthRecord with User to get the username
-    statement = select(HealthRecord, User.username).join(User, HealthRecord.patient_id == User.id).order_by(HealthRecord.timestamp.desc())
-    results = db.exec(statement).all()
-    
-    # Flatten the result into a clean list of dictionaries
-    clean_data = []
-    for record, username in results:
-        rec_dict = record.dict()
-        rec_dict["patient_username"] = username # <--- ADD USERNAME HERE
-        clean_data.append(rec_dict)
-        
-    return clean_data
+async def get_dashboard(
+    patient_id: Optional[int] = None,
+    is_urgent: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    intensity: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    shape: str = Query("rows", pattern="^(rows|columns)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    # 1. Column projection (id + timestamp are always returned: they form the cursor)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()] if fields else DASHBOARD_FIELDS
+    unknown = [f for f in wanted if f not in DASHBOARD_FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {unknown}")
+    columns = ["id", "timestamp"] + [f for f in wanted if f in RECORD_FIELDS and f not in ("id", "timestamp")]
+    with_username = "patient_username" in wanted
+    if with_username and "patient_id" not in columns:
+        columns.append("patient_id")
+
+    statement = select(*[getattr(HealthRecord, c) for c in columns])
+
+    # 2. Server-side filters
+    if patient_id is not None: statement = statement.where(HealthRecord.patient_id == patient_id)
+    if is_urgent is not None: statement = statement.where(HealthRecord.is_urgent == is_urgent)
+    if date_from is not None: statement = statement.where(HealthRecord.timestamp >= date_from)
+    if date_to is not None: statement = statement.where(HealthRecord.timestamp < date_to)
+    if intensity is not None: statement = statement.where(HealthRecord.predicted_intensity == intensity)
+
+    # 3. Keyset pagination on (timestamp, id), newest first
+    if cursor:
+        statement = statement.where(*_before_cursor(cursor))
+    statement = statement.order_by(HealthRecord.timestamp.desc(), HealthRecord.id.desc()).limit(limit + 1)
+
+    with stage("doctor.dashboard", "query"):
+        rows = (await db.exec(statement)).all()
+    items = [dict(row._mapping) for row in rows[:limit]]
+    if with_username:
+        with stage("doctor.dashboard", "usernames"):
+            await _attach_usernames(db, items)
+        if "patient_id" not in wanted:
+            for item in items: del item["patient_id"]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = _encode_cursor(items[-1]["timestamp"], items[-1]["id"])
+
+    # 4. Optional columnar shape; orjson either way (skips jsonable_encoder)
+    with stage("doctor.dashboard", "serialize"):
+        if shape == "columns":
+            names = [c for c in columns if c != "patient_id" or "patient_id" in wanted]
+            if with_username: names.append("patient_username")
+            return FastJSONResponse(dict(columnar(items, names), next_cursor=next_cursor))
+        return FastJSONResponse({"items": items, "next_cursor": next_cursor})
+
+@router.get("/alerts")
+async def get_alerts(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    # Urgent records only, newest first. Served from the urgent/timestamp
+    # index, so cost depends on the page size, not the total history.
+    columns = [getattr(HealthRecord, c) for c in ALERT_FIELDS]
+    statement = select(*columns).where(HealthRecord.is_urgent == True)
+    if cursor:
+        statement = statement.where(*_before_cursor(cursor))
+    statement = statement.order_by(HealthRecord.timestamp.desc(), HealthRecord.id.desc()).limit(limit + 1)
+
+    with stage("doctor.alerts", "query"):
+        rows = (await db.exec(statement)).all()
+    items = [dict(row._mapping) for row in rows[:limit]]
+    with stage("doctor.alerts", "usernames"):
+        await _attach_usernames(db, items)
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = _encode_cursor(items[-1]["timestamp"], items[-1]["id"])
+
+    return {"items": items, "next_cursor": next_cursor}
+
+# LIVE ALERTS (server-sent events)
+def _sse(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/alerts/stream")
+async def stream_alerts(
+    last_event_id: Optional[int] = Query(None, description="Resume after this event (first connect)"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    # Pushes each new urgent record as an "alert" event, shaped like a
+    # /doctor/alerts item. Browsers resend Last-Event-ID on reconnect; if
+    # those events are no longer buffered a "reset" event tells the client
+    # to reload /doctor/alerts once and continue from the stream.
+    if last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+
+    async def events():
+        replay, sub = alert_broker.subscribe(last_event_id)
+        resume_id = alert_broker.last_id
+        try:
+            yield "retry: 3000\n\n"
+            if replay is None:
+                yield _sse(resume_id, "reset", {})
+            else:
+                for e in replay:
+                    yield _sse(e["id"], "alert", dict(e["alert"], reason=e["reason"]))
+            while not (sub.dropped and sub.queue.empty()):
+                try:
+                    e = await asyncio.wait_for(sub.queue.get(), settings.ALERT_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(e["id"], "alert", dict(e["alert"], reason=e["reason"]))
+        finally:
+            alert_broker.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# STREAMING EXPORT (model retraining / analytics)
+@router.get("/export")
+def export_records(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    patient_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(400, "Parquet export requires pyarrow to be installed")
+    filename = f"health_records.{format}"
+    return StreamingResponse(
+        stream_export(format, patient_id, date_from, date_to),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # ... (Keep existing override/remark endpoints same as before) ...
+# Target heart-rate band per intensity, as fractions of MHR. new_intensity is
+# typed as Intensity on both override routes, so other values get a 422.
+INTENSITY_HR_FACTORS = {"Low": (0.50, 0.63), "Moderate": (0.64, 0.76), "High": (0.77, 0.93)}
+MAX_BULK_ITEMS = 500
+
+def _target_hr(intensity, mhr):
+    factor_min, factor_max = INTENSITY_HR_FACTORS[intensity]
+    return int(factor_min * mhr), int(factor_max * mhr)
+
+def _check_bulk(items):
+    if not items: raise HTTPException(400, "No items given")
+    if len(items) > MAX_BULK_ITEMS: raise HTTPException(400, f"At most {MAX_BULK_ITEMS} items per request")
+
+async def _existing_records(db, record_ids, *columns):
+    # One IN query validates every ID in the batch
+    hr = HealthRecord.__table__
+    statement = select(hr.c.id, *columns).where(hr.c.id.in_(set(record_ids)))
+    return {row.id: row for row in (await db.execute(statement)).all()}
+
+# Bulk routes are declared before /remark/{record_id} so "bulk" is not read as an ID
+@router.post("/remark/bulk")
+async def add_remarks_bulk(user_id: int, items: List[RemarkItem] = Body(...), db: AsyncSession = Depends(get_db)):
+    _check_bulk(items)
+    with stage("doctor.remark_bulk", "validate"):
+        found = await _existing_records(db, [item.record_id for item in items])
+
+    now = datetime.now(timezone.utc)
+    results, rows = [], []
+    for item in items:
+        if item.record_id not in found:
+            results.append({"record_id": item.record_id, "status": "not_found"})
+            continue
+        rows.append({"record_id": item.record_id, "doctor_id": user_id, "text": item.text, "timestamp": now})
+        results.append({"record_id": item.record_id, "status": "saved"})
+
+    if rows:
+        hr = HealthRecord.__table__
+        with stage("doctor.remark_bulk", "db_write"):
+            await db.execute(insert(Remark.__table__), rows)
+            # Remarks show up in the patient's history, so they count as a change
+            await db.execute(update(hr).where(hr.c.id.in_({r["record_id"] for r in rows})).values(updated_at=now))
+            await db.commit()
+    return {"saved": len(rows), "failed": len(items) - len(rows), "results": results}
+
+@router.patch("/override/bulk")
+async def override_intensity_bulk(items: List[OverrideItem] = Body(...), db: AsyncSession = Depends(get_db)):
+    _check_bulk(items)
+    hr = HealthRecord.__table__
+    with stage("doctor.override_bulk", "validate"):
+        found = await _existing_records(db, [item.record_id for item in items],
+                                        hr.c.patient_id, hr.c.mhr, hr.c.weight, hr.c.calories_burned)
+
+    # 1. Per-item checks; a bad item is reported, the rest still go through
+    results, rows, seen = [], [], set()
+    deltas = {}
+    for item in items:
+        row = found.get(item.record_id)
+        if row is None: status = "not_found"
+        elif item.record_id in seen: status = "duplicate"
+        else: status = "updated"
+        results.append({"record_id": item.record_id, "status": status})
+        if status != "updated":
+            continue
+        seen.add(item.record_id)
+
+        hr_min, hr_max = _target_hr(item.new_intensity, row.mhr)
+        new_calories = estimate_calories(item.new_intensity, row.weight)
+        deltas[row.patient_id] = deltas.get(row.patient_id, 0.0) + new_calories - row.calories_burned
+        rows.append({"id": row.id, "intensity": item.new_intensity, "min": hr_min,
+                     "max": hr_max, "calories": new_calories})
+        results[-1]["intensity"] = item.new_intensity
+
+    # 2. One UPDATE statement for all rows (a CASE on id per column), stats
+    # deltas, one commit
+    if rows:
+        def per_id(key):
+            return case({r["id"]: r[key] for r in rows}, value=hr.c.id)
+        statement = update(hr).where(hr.c.id.in_([r["id"] for r in rows])).values(
+            predicted_intensity=per_id("intensity"),
+            target_hr_min=per_id("min"),
+            target_hr_max=per_id("max"),
+            calories_burned=per_id("calories"),
+            is_urgent=False,
+        )
+        with stage("doctor.override_bulk", "db_write"):
+            await db.execute(statement)
+            await stats_service.adjust_calories(db, deltas)
+            await db.commit()
+    return {"updated": len(rows), "failed": len(items) - len(rows), "results": results}
+
 @router.post("/remark/{record_id}")
-def add_remark(record_id: int, text: str, user_id: int, db: Session = Depends(get_session)):
-    record = db.get(HealthRecord, record_id)
+async def add_remark(record_id: int, text: str, user_id: int, db: AsyncSession = Depends(get_db)):
+    record = await db.get(HealthRecord, record_id)
     if not record: raise HTTPException(404, "Record not found")
     new_remark = Remark(record_id=record_id, doctor_id=user_id, text=text)
-    db.add(new_remark)
-    db.commit()
+    record.updated_at = new_remark.timestamp # history sync picks up the new note
+    with stage("doctor.remark", "db_write"):
+        db.add(new_remark)
+        db.add(record)
+        await db.commit()
     return {"status": "saved"}
 
 @router.patch("/override/{record_id}")
-def override_intensity(record_id: int, new_intensity: str, db: Session = Depends(get_session)):
-    record = db.get(HealthRecord, record_id)
+async def override_intensity(record_id: int, new_intensity: Intensity, db: AsyncSession = Depends(get_db)):
+    record = await db.get(HealthRecord, record_id)
     if not record: raise HTTPException(404, "Record not found")
     
-    mhr = record.mhr
-    if new_intensity == "Low": factor_min, factor_max = 0.50, 0.63
-    elif new_intensity == "Moderate": factor_min, factor_max = 0.64, 0.76
-    else: factor_min, factor_max = 0.77, 0.93
-
     record.predicted_intensity = new_intensity
-    record.target_hr_min = int(factor_min * mhr)
-    record.target_hr_max = int(factor_max * mhr)
+    record.target_hr_min, record.target_hr_max = _target_hr(new_intensity, record.mhr)
     record.is_urgent = False 
-    
-    db.add(record)
-    db.commit()
-    return {"status": "updated", "intensity": new_intensity}
\ No newline at end of file
+
+    # Calories follow the new intensity; fold the change into PatientStats
+    new_calories = estimate_calories(new_intensity, record.weight)
+    with stage("doctor.override", "db_write"):
+        await stats_service.adjust_calories(db, {record.patient_id: new_calories - record.calories_burned})
+        record.calories_burned = new_calories
+        db.add(record)
+        await db.commit()
+    return {"status": "updated", "intensity": new_intensity}
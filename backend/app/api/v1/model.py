@@ -0,0 +1,113 @@
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import case, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
+from app.db.session import engine, get_db
+from app.models.shadow import ShadowResult
+from app.services import rescore_service
+from app.services.ml_service import ml_service
+from app.services.inference_pool import inference_pool
+
+router = APIRouter()
+
+@router.get("/cache")
+def get_cache_stats():
+    return ml_service.cache.stats()
+
+@router.get("/inference")
+def get_inference_stats():
+    return inference_pool.stats()
+
+@router.get("/versions")
+def list_versions():
+    manifest = ml_service.registry.manifest()
+    return {
+        "active": manifest["active"],
+        "loaded": ml_service.version,
+        "versions": manifest["versions"],
+    }
+
+# ACTIVATE: loads the new pair first, then swaps it in; requests already
+# scoring keep the bundle they started with.
+@router.post("/activate/{version}")
+async def activate_version(version: str):
+    try:
+        bundle = await run_in_threadpool(ml_service.activate, version)
+    except KeyError:
+        raise HTTPException(404, f"Unknown model version: {version}")
+    except Exception as e:
+        raise HTTPException(422, f"Model version {version} failed to load: {e}")
+    return {"status": "activated", "version": bundle.version}
+
+# --- SHADOW MODE ---
+@router.post("/shadow/{version}")
+async def start_shadow(version: str):
+    try:
+        await run_in_threadpool(ml_service.start_shadow, version)
+    except KeyError:
+        raise HTTPException(404, f"Unknown model version: {version}")
+    except Exception as e:
+        raise HTTPException(422, f"Model version {version} failed to load: {e}")
+    return {"status": "shadowing", "version": version}
+
+@router.delete("/shadow")
+def stop_shadow():
+    ml_service.stop_shadow()
+    return {"status": "stopped"}
+
+# SUMMARY: agreement and latency per (production, shadow) version pair,
+# plus where the two models disagree
+@router.get("/shadow")
+async def shadow_summary(shadow_version: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    sr = ShadowResult.__table__
+    pair = (sr.c.production_version, sr.c.shadow_version)
+    where = [sr.c.shadow_version == shadow_version] if shadow_version else []
+    await run_in_threadpool(ml_service.shadow.flush)
+
+    totals = (await db.execute(
+        select(*pair, func.count().label("n"),
+               func.sum(case((sr.c.agree, 1), else_=0)).label("agreed"),
+               func.avg(sr.c.production_ms).label("production_ms_avg"),
+               func.max(sr.c.production_ms).label("production_ms_max"),
+               func.avg(sr.c.shadow_ms).label("shadow_ms_avg"),
+               func.max(sr.c.shadow_ms).label("shadow_ms_max"))
+        .where(*where).group_by(*pair)
+    )).all()
+    cells = (await db.execute(
+        select(*pair, sr.c.production_intensity, sr.c.shadow_intensity, func.count().label("n"))
+        .where(*where).group_by(*pair, sr.c.production_intensity, sr.c.shadow_intensity)
+    )).all()
+
+    comparisons = []
+    for row in totals:
+        comparisons.append({
+            "production_version": row.production_version,
+            "shadow_version": row.shadow_version,
+            "predictions": row.n,
+            "agreement_rate": round(row.agreed / row.n, 4),
+            "production_ms": {"avg": round(row.production_ms_avg, 3), "max": round(row.production_ms_max, 3)},
+            "shadow_ms": {"avg": round(row.shadow_ms_avg, 3), "max": round(row.shadow_ms_max, 3)},
+            # confusion counts: production intensity -> shadow intensity -> n
+            "matrix": {},
+        })
+        for cell in cells:
+            if (cell.production_version, cell.shadow_version) == (row.production_version, row.shadow_version):
+                comparisons[-1]["matrix"].setdefault(cell.production_intensity, {})[cell.shadow_intensity] = cell.n
+    return {"evaluator": ml_service.shadow.stats(), "comparisons": comparisons}
+
+# --- OFFLINE RESCORE RUNS (started with `python -m app.manage rescore`) ---
+@router.get("/rescore")
+def list_rescore_runs(limit: int = 20):
+    runs = rescore_service.RUNS
+    with engine.connect() as conn:
+        rows = conn.execute(select(runs).order_by(runs.c.id.desc()).limit(limit)).all()
+    return [dict(row._mapping) for row in rows]
+
+@router.get("/rescore/{run_id}")
+def rescore_run_summary(run_id: int):
+    with engine.connect() as conn:
+        summary = rescore_service.summarize_run(conn, run_id)
+    if summary is None:
+        raise HTTPException(404, f"No rescore run {run_id}")
+    return summary
@@ -1,55 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List
-from app.db.session import get_session
-from app.schemas.health_schema import HealthInput, HealthResponse, WorkoutFeedback, UserUpdate
-from app.services.ml_service import ml_service
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from app.db.session import get_db
+from app.schemas.health_schema import HealthInput, HealthBatchItem, HealthResponse, WorkoutFeedback, UserUpdate
+from app.services.ml_service import ml_service, estimate_calories, reports_urgent_symptoms
+from app.services.inference_pool import inference_pool
 from app.models.health import HealthRecord
 from app.models.user import User
+from app.services import stats_service, trend_service
+from app.services.alert_broker import alert_broker, alert_payload
+from app.services.feedback_writer import feedback_writer
+from app.services.user_cache import user_cache
+from app.core.instrumentation import stage
+from app.core.responses import FastJSONResponse, columnar
+from sqlalchemy import func
 from sqlalchemy.orm import selectinload # Need this for relationships
 
 router = APIRouter()
 
-# UPDATE PROFILE (Age/Gender)
-@router.patch("/profile/{user_id}")
-def update_profile(user_id: int, data: UserUpdate, db: Session = Depends(get_session)):
-    user = db.get(User, user_id)
-    if not user: raise HTTPException(404, "User not found")
-    user.age = data.age
-    user.gender = data.gender
-    db.add(user)
-    db.commit()
-    return {"status": "updated"}
-
-# PREDICT (Now fetches Age/Gender from Profile)
-@router.post("/predict/{user_id}", response_model=HealthResponse)
-def predict_health(user_id: int, data: HealthInput, db: Session = Depends(get_session)):
-    # 1. Get User Profile
-    user = db.get(User, user_id)
-    if not user or not user.age or not user.gender:
-        raise HTTPException(400, "Please complete your profile (Age/Gender) first.")
+HISTORY_FIELDS = [c.name for c in HealthRecord.__table__.columns] + ["doctor_note"]
 
-    # 2. Format Conditions String for ML
+def _conditions_str(data: HealthInput) -> str:
     cond_list = []
     if data.has_htn: cond_list.append("HTN")
     if data.has_dm: cond_list.append("DM")
-    conditions_str = ", ".join(cond_list) if cond_list else "None"
-
-    # 3. ML Service
-    result = ml_service.predict_and_audit(
-        user.age, user.gender, data.weight, data.resting_hr, 
-        data.bp_systolic, data.bp_diastolic,
-        data.pulse_rate_before, data.respiratory_rate_before,
-        data.borg_rating_before, conditions_str
-    )
+    return ", ".join(cond_list) if cond_list else "None"
 
-    # 4. Calories Calculation
-    mets = {"Low": 3.5, "Moderate": 5.0, "High": 8.0}
+def _build_record(user_id: int, data: HealthInput, conditions_str: str, result: dict) -> HealthRecord:
+    # Calories Calculation
     intensity = "Low" if result["is_urgent"] else result["predicted_intensity"]
-    calories = mets.get(intensity, 3.5) * data.weight * 0.33
 
-    # 5. Save Record
-    record = HealthRecord(
+    return HealthRecord(
         patient_id=user_id,
         weight=data.weight, resting_hr=data.resting_hr,
         bp_systolic=data.bp_systolic, bp_diastolic=data.bp_diastolic,
@@ -62,57 +46,222 @@ def predict_health(user_id: int, data: HealthInput, db: Session = Depends(get_se
         target_hr_min=result["target_hr_min"],
         target_hr_max=result["target_hr_max"],
         is_urgent=result["is_urgent"],
-        calories_burned=round(calories, 1)
+        calories_burned=estimate_calories(intensity, data.weight),
+        model_version=result["model_version"],
+        model_intensity=result["predicted_intensity"],
+        model_urgent=result["is_urgent"]
     )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
+
+# UPDATE PROFILE (Age/Gender)
+@router.patch("/profile/{user_id}")
+async def update_profile(user_id: int, data: UserUpdate, db: AsyncSession = Depends(get_db)):
+    user = await db.get(User, user_id)
+    if not user: raise HTTPException(404, "User not found")
+    user.age = data.age
+    user.gender = data.gender
+    db.add(user)
+    await db.commit()
+    user_cache.invalidate(user_id=user_id)
+    return {"status": "updated"}
+
+# BATCH PREDICT (clinic intake / wearable backfills)
+# Declared before /predict/{user_id} so "batch" is not parsed as a user id.
+@router.post("/predict/batch", response_model=List[HealthResponse])
+async def predict_health_batch(items: List[HealthBatchItem], db: AsyncSession = Depends(get_db)):
+    if not items:
+        return []
+
+    # 1. Get all User Profiles in one query
+    user_ids = {item.user_id for item in items}
+    with stage("patient.predict_batch", "load_users"):
+        users = await user_cache.get_many(db, user_ids)
+    incomplete = sorted(uid for uid in user_ids
+                        if uid not in users or not users[uid]["age"] or not users[uid]["gender"])
+    if incomplete:
+        raise HTTPException(400, f"Please complete the profile (Age/Gender) for users: {incomplete}")
+
+    # 2. Format Conditions Strings for ML
+    conditions = [_conditions_str(item) for item in items]
+
+    # 3. ML Service (one vectorized call, off the event loop)
+    with stage("patient.predict_batch", "inference"):
+        results = await run_in_threadpool(
+            ml_service.predict_and_audit_many,
+            [users[i.user_id]["age"] for i in items],
+            [users[i.user_id]["gender"] for i in items],
+            [i.weight for i in items], [i.resting_hr for i in items],
+            [i.bp_systolic for i in items], [i.bp_diastolic for i in items],
+            [i.pulse_rate_before for i in items], [i.respiratory_rate_before for i in items],
+            [i.borg_rating_before for i in items], conditions
+        )
+
+    # 4. Save Records (one bulk insert, one commit)
+    records = [_build_record(item.user_id, item, cond, result)
+               for item, cond, result in zip(items, conditions, results)]
+    with stage("patient.predict_batch", "db_insert"):
+        db.add_all(records)
+        await db.flush() # populates primary keys without a refresh per row
+        await stats_service.record_sessions(db, records)
+        trends = await trend_service.record_sessions(db, records)
+
+    responses = []
+    for record, result, (trend, flags) in zip(records, results, trends):
+        resp = HealthResponse(**record.dict())
+        resp.youtube_link = result["youtube_link"]
+        resp.trend, resp.trend_flags = trend, flags
+        responses.append(resp)
+    alerts = [alert_payload(r, users[r.patient_id]["username"]) for r in records if r.is_urgent]
+    with stage("patient.predict_batch", "db_commit"):
+        await db.commit()
+    for alert in alerts:
+        alert_broker.publish("prediction", alert)
+    return responses
+
+# PREDICT (Now fetches Age/Gender from Profile)
+@router.post("/predict/{user_id}", response_model=HealthResponse)
+async def predict_health(user_id: int, data: HealthInput, db: AsyncSession = Depends(get_db)):
+    # 1. Get User Profile (cached)
+    with stage("patient.predict", "load_user"):
+        user = await user_cache.get(db, user_id)
+        age, gender, username = (user["age"], user["gender"], user["username"]) if user else (None, None, None)
+        # End the read transaction so no pooled connection is held while the
+        # request waits on the inference pool.
+        await db.rollback()
+    if not age or not gender:
+        raise HTTPException(400, "Please complete your profile (Age/Gender) first.")
+
+    # 2. Format Conditions String for ML
+    conditions_str = _conditions_str(data)
+
+    # 3. ML Service (dedicated inference pool, micro-batched)
+    with stage("patient.predict", "inference"):
+        result = await inference_pool.predict(
+            age, gender, data.weight, data.resting_hr, 
+            data.bp_systolic, data.bp_diastolic,
+            data.pulse_rate_before, data.respiratory_rate_before,
+            data.borg_rating_before, conditions_str
+        )
+
+    # 4. Calories + Save Record
+    record = _build_record(user_id, data, conditions_str, result)
+    with stage("patient.predict", "db_insert"):
+        db.add(record)
+        await stats_service.record_sessions(db, [record]) # same transaction
+        [(trend, flags)] = await trend_service.record_sessions(db, [record])
+        await db.commit()
+    with stage("patient.predict", "db_refresh"):
+        await db.refresh(record)
     
+    if record.is_urgent:
+        alert_broker.publish("prediction", alert_payload(record, username))
+
     resp = HealthResponse(**record.dict())
     resp.youtube_link = result["youtube_link"]
+    resp.trend, resp.trend_flags = trend, flags
     return resp
 
 # 2. SUBMIT FEEDBACK (Mood/Borg)
 @router.patch("/feedback/{record_id}")
-def submit_feedback(record_id: int, feedback: WorkoutFeedback, db: Session = Depends(get_session)):
-    record = db.get(HealthRecord, record_id)
+async def submit_feedback(record_id: int, feedback: WorkoutFeedback, db: AsyncSession = Depends(get_db)):
+    # Convert list to string
+    symptoms_str = ",".join(feedback.symptoms) if feedback.symptoms else "None"
+    urgent = reports_urgent_symptoms(symptoms_str)
+
+    # Write-behind: routine feedback is acknowledged now and written in the
+    # next batch. A primary-key probe keeps the 404 for unknown records.
+    if feedback_writer.accepts(urgent):
+        with stage("patient.feedback", "exists"):
+            exists = (await db.execute(select(HealthRecord.id).where(HealthRecord.id == record_id))).first()
+        if not exists: raise HTTPException(404, "Record not found")
+        feedback_writer.submit(record_id, feedback.borg_rating, feedback.mood, symptoms_str)
+        return {"status": "queued"}
+    if feedback_writer.running:
+        await feedback_writer.before_direct_write(record_id)
+
+    record = await db.get(HealthRecord, record_id)
     if not record: raise HTTPException(404, "Record not found")
     
-    record.borg_rating = feedback.borg_rating
+    record.borg_rating_after = feedback.borg_rating
     record.mood = feedback.mood
-    # Convert list to string
-    symptoms_str = ",".join(feedback.symptoms) if feedback.symptoms else "None"
     record.symptoms = symptoms_str
     
     # CRITICAL FIX: Flag urgency if dangerous symptoms are reported
-    if "Chest Pain" in symptoms_str or "Dizziness" in symptoms_str:
+    alert = None
+    if urgent:
         record.is_urgent = True
+        patient = await user_cache.get(db, record.patient_id)
+        alert = alert_payload(record, patient["username"] if patient else None)
     
     db.add(record)
-    db.commit()
+    with stage("patient.feedback", "db_write"):
+        await trend_service.record_feedback(db, record.patient_id, record_id, feedback.borg_rating)
+        await db.commit()
+    if feedback_writer.running:
+        feedback_writer.written_directly(record_id, feedback.borg_rating, feedback.mood, symptoms_str)
+    if alert:
+        alert_broker.publish("feedback", alert)
     return {"status": "saved"}
 
+@router.get("/feedback/queue")
+def feedback_queue():
+    return feedback_writer.stats()
+
+# STATS (materialized, O(1) regardless of history length)
+@router.get("/stats/{user_id}")
+async def get_stats(user_id: int, db: AsyncSession = Depends(get_db)):
+    return await stats_service.get_stats(db, user_id)
+
+# TREND WINDOW (the last TREND_WINDOW sessions, one primary-key read)
+@router.get("/trend/{user_id}")
+async def get_trend(user_id: int, db: AsyncSession = Depends(get_db)):
+    return await trend_service.get_window(db, user_id)
+
 # 3. HISTORY & LOGIN
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header: return False
+    return header.strip() == "*" or etag in [t.strip() for t in header.split(",")]
+
 @router.get("/history/{user_id}")
-def get_history(user_id: int, db: Session = Depends(get_session)):
+async def get_history(user_id: int, request: Request, since: Optional[datetime] = None,
+                      shape: str = Query("rows", pattern="^(rows|columns)$"),
+                      db: AsyncSession = Depends(get_db)):
+    # 1. Validator: count + latest change, answered from the (patient_id, updated_at) index
+    with stage("patient.history", "etag"):
+        count, latest = (await db.execute(
+            select(func.count(), func.max(HealthRecord.updated_at)).where(HealthRecord.patient_id == user_id)
+        )).one()
+    etag = f'W/"{count}-{latest.isoformat() if latest else 0}"'
+    cursor = latest.isoformat() if latest else ""
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "X-Sync-Cursor": cursor})
+
+    # 2. Full history, or with ?since= only records created/changed at or after
+    # that cursor (>=, so equal timestamps are re-sent, never missed; clients
+    # merge by id). A write landing between 1. and 2. is sent again next time.
     # Use selectinload to fetch the remarks relationship efficiently
     statement = select(HealthRecord).where(HealthRecord.patient_id == user_id).options(selectinload(HealthRecord.remarks)).order_by(HealthRecord.timestamp.desc())
-    results = db.exec(statement).all()
+    if since is not None:
+        statement = statement.where(HealthRecord.updated_at >= since)
+    with stage("patient.history", "query"):
+        results = (await db.exec(statement)).all()
     
     # Format the response to include remark text
-    history_data = []
-    for record in results:
-        rec_dict = record.dict()
-        # Join all remarks into a single string
-        if record.remarks:
-            rec_dict["doctor_note"] = "; ".join([r.text for r in record.remarks])
-        else:
-            rec_dict["doctor_note"] = "No remarks"
-        history_data.append(rec_dict)
-        
-    return history_data
+    with stage("patient.history", "serialize"):
+        history_data = []
+        for record in results:
+            rec_dict = {f: getattr(record, f) for f in HISTORY_FIELDS[:-1]}
+            # Join all remarks into a single string
+            if record.remarks:
+                rec_dict["doctor_note"] = "; ".join([r.text for r in record.remarks])
+            else:
+                rec_dict["doctor_note"] = "No remarks"
+            history_data.append(rec_dict)
+        # 3. Optional columnar shape; orjson either way (skips jsonable_encoder)
+        payload = columnar(history_data, HISTORY_FIELDS) if shape == "columns" else history_data
+        return FastJSONResponse(payload, headers={"ETag": etag, "X-Sync-Cursor": cursor})
 @router.get("/login/{username}")
-def login(username: str, db: Session = Depends(get_session)):
-    user = db.exec(select(User).where(User.username == username)).first()
+async def login(username: str, db: AsyncSession = Depends(get_db)):
+    user = await user_cache.get_by_username(db, username)
     if not user: raise HTTPException(404, "User not found")
     return user
\ No newline at end of file
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.session import get_db
+from app.services.user_cache import user_cache
+
+router = APIRouter()
+
+MAX_IDS = 1000
+
+# BULK RESOLVE (e.g. usernames for a dashboard page that only carries patient_id)
+@router.get("")
+async def resolve_users(ids: str = Query(..., description="Comma-separated user IDs"),
+                        db: AsyncSession = Depends(get_db)):
+    try:
+        wanted = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(400, "ids must be comma-separated integers")
+    if len(wanted) > MAX_IDS:
+        raise HTTPException(400, f"At most {MAX_IDS} ids per request")
+
+    found = await user_cache.get_many(db, wanted)
+    return {
+        "items": [found[i] for i in wanted if i in found],
+        "missing": [i for i in wanted if i not in found],
+    }
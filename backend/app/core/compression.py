@@ -0,0 +1,94 @@
+import gzip
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/plain", "text/csv", "text/html")
+THREADPOOL_BYTES = 256 * 1024  # compress bodies this big off the event loop
+
+
+def _accepted(accept_encoding):
+    accepted = set()
+    for token in accept_encoding.split(","):
+        name, _, params = token.partition(";")
+        key, _, value = params.strip().partition("=")
+        try:
+            q = float(value) if key.strip() == "q" else 1.0
+        except ValueError:
+            q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing complete responses of at least
+    `minimum_size` bytes: brotli when the client accepts it and the brotli
+    package is installed, gzip otherwise. Streaming responses (exports, the
+    SSE alert stream) pass through untouched, since buffering them would
+    defeat the streaming.
+    """
+
+    def __init__(self, app, minimum_size, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _encoding(self, scope):
+        accepted = _accepted(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compress(self, encoding, body):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._encoding(scope) if scope["type"] == "http" and self.minimum_size > 0 else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message # held until the first body chunk shows the size
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if (message.get("more_body") or len(body) < self.minimum_size
+                    or "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= THREADPOOL_BYTES:
+                body = await run_in_threadpool(self._compress, encoding, body)
+            else:
+                body = self._compress(encoding, body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
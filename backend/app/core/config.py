@@ -1,8 +1,96 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Cardiac Exercise Prescriber"
     DATABASE_URL: str = "sqlite:///./database.db"
+
+    # Database engine (pool settings apply to file SQLite and Postgres)
+    DB_ECHO: bool = False
+    # Handlers use AsyncSession (aiosqlite/asyncpg) when True, the sync
+    # Session on the threadpool when False
+    DB_ASYNC: bool = True
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    SQLITE_WAL: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Rows fetched per server-side cursor round trip in /doctor/export
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    # Response compression: brotli (if the brotli package is installed and
+    # the client accepts it) or gzip for complete responses of at least
+    # COMPRESSION_MIN_BYTES (0 disables it). Streaming responses are left alone.
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Columnar analytics copy of HealthRecord (Parquet, one directory per
+    # month) behind /doctor/analytics. Refreshed incrementally every
+    # ANALYTICS_REFRESH_SECONDS (0: only on demand); each refresh re-reads the
+    # last ANALYTICS_LOOKBACK_SECONDS of changes to catch late commits, and a
+    # month is compacted once it holds ANALYTICS_MAX_PARTS files.
+    ANALYTICS_DIR: str = "./analytics_store"
+    ANALYTICS_REFRESH_SECONDS: float = 300.0
+    ANALYTICS_LOOKBACK_SECONDS: float = 60.0
+    ANALYTICS_MAX_PARTS: int = 8
+
+    # Per-patient trend window: the last TREND_WINDOW sessions, compared with
+    # each new one in /predict. Flags need TREND_MIN_SESSIONS earlier sessions
+    # and fire when resting HR / systolic BP exceed the window mean by the
+    # given amount, or the mean Borg rise (after - before) reaches TREND_BORG_RISE.
+    # After changing TREND_WINDOW run `python -m app.manage rebuild-trends`.
+    TREND_WINDOW: int = 8
+    TREND_MIN_SESSIONS: int = 3
+    TREND_RESTING_HR_RISE: int = 10
+    TREND_BP_SYSTOLIC_RISE: int = 15
+    TREND_BORG_RISE: float = 5.0
+
+    # Prediction cache (0 disables it)
+    PREDICTION_CACHE_SIZE: int = 4096
+    PREDICTION_CACHE_TTL_SECONDS: float = 300.0
+
+    # User profile cache for logins and per-request profile reads (0 disables)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 60.0
+
+    # Inference pool: "thread" or "process"; 0 workers runs inference inline
+    INFERENCE_EXECUTOR: str = "thread"
+    INFERENCE_WORKERS: int = 2
+    INFERENCE_BATCH_WINDOW_MS: float = 2.0
+    INFERENCE_MAX_BATCH: int = 32
+
+    # How often each worker checks ml_models/manifest.json for a new active
+    # model version (0 disables polling)
+    MODEL_MANIFEST_POLL_SECONDS: float = 5.0
+    # Load the model in a background task at startup (True) or on the first
+    # prediction (False). Either way non-ML routes serve immediately.
+    MODEL_PRELOAD: bool = True
+
+    # Shadow mode: also score live traffic with this registry version (results
+    # go to the shadowresult table, never to patients). Can be switched at
+    # runtime via /api/v1/model/shadow. Jobs beyond SHADOW_MAX_PENDING are dropped.
+    SHADOW_MODEL_VERSION: Optional[str] = None
+    SHADOW_MAX_PENDING: int = 256
+
+    # /doctor/alerts/stream: events kept for Last-Event-ID resume, events a
+    # slow client may lag behind before it is disconnected, keep-alive period
+    ALERT_REPLAY_SIZE: int = 1000
+    ALERT_SUBSCRIBER_QUEUE: int = 100
+    ALERT_STREAM_KEEPALIVE_SECONDS: float = 15.0
+
+    # Write-behind feedback: /patient/feedback acknowledges at once and a
+    # background task writes batches (every FEEDBACK_FLUSH_ROWS updates or
+    # FEEDBACK_FLUSH_SECONDS). Urgent symptoms are always written inline, as
+    # is everything once FEEDBACK_MAX_PENDING updates are waiting. Queued
+    # updates are journaled to FEEDBACK_JOURNAL_DIR ("" = drain on shutdown only).
+    FEEDBACK_WRITE_BEHIND: bool = False
+    FEEDBACK_FLUSH_ROWS: int = 200
+    FEEDBACK_FLUSH_SECONDS: float = 0.5
+    FEEDBACK_MAX_PENDING: int = 5000
+    FEEDBACK_JOURNAL_DIR: str = "./feedback_journal"
     
     class Config:
         env_file = ".env"
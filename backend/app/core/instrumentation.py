@@ -0,0 +1,104 @@
+import time
+
+from sqlalchemy import event
+
+from app.core.metrics import Counter, Histogram
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Time to response start, per route",
+                            labelnames=("method", "route", "status"))
+STAGE_LATENCY = Histogram("stage_duration_seconds", "Time spent in one step of a handler or the model",
+                          labelnames=("component", "stage"))
+DB_QUERIES = Counter("db_queries", "SQL statements executed", labelnames=("operation",))
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "SQL statement execution time",
+                             labelnames=("operation",))
+DB_ERRORS = Counter("db_errors", "SQL statements that raised", labelnames=("operation",))
+
+
+_stages = {}
+
+
+def stage(component, name):
+    """Time a block into stage_duration_seconds{component, stage}."""
+    series = _stages.get((component, name))
+    if series is None:
+        series = _stages[(component, name)] = STAGE_LATENCY.labels(component, name)
+    return series.time()
+
+
+def _operation(statement):
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA") else "OTHER"
+
+
+def install_db_metrics(sync_engine):
+    # Cursor-level events fire for ORM, Core and async (greenlet) use alike
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = _operation(statement)
+        DB_QUERIES.labels(operation).inc()
+        DB_QUERY_LATENCY.labels(operation).observe(elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if starts:
+            starts.pop()
+        DB_ERRORS.labels(_operation(context.statement or "")).inc()
+
+
+def _route_template(scope):
+    # Included routers may report the route's own path without the router
+    # prefix, so rebuild the prefix from the concrete request path.
+    route_format = getattr(scope.get("route"), "path_format", None)
+    if route_format is None:
+        return "<unmatched>"
+    try:
+        concrete = route_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return route_format
+    path = scope["path"]
+    if concrete and path.endswith(concrete):
+        return path[:len(path) - len(concrete)] + route_format
+    return route_format
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording http_request_duration_seconds. Routes are
+    labelled by their template (/patient/history/{user_id}), not the raw
+    path, so the label set stays bounded; unmatched paths share one label.
+    Streaming responses are timed to their first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        started = False
+
+        def observe(status):
+            REQUEST_LATENCY.labels(scope["method"], _route_template(scope), status
+                                   ).observe(time.perf_counter() - start)
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not started:
+                observe(500)
+            raise
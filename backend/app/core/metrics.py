@@ -0,0 +1,214 @@
+"""
+Minimal in-process metrics with Prometheus text exposition (no client
+library). Every metric registers itself in REGISTRY; render() produces the
+/metrics payload. Each process (uvicorn worker, inference worker process)
+keeps its own values.
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+REGISTRY = []
+
+# Seconds; covers sub-millisecond model calls up to slow requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _HistogramSeries:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            running += n
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "mean": round(total / count, 6) if count else 0.0,
+            "buckets": cumulative,
+        }
+
+
+class _Timer:
+    # Plain class instead of @contextmanager: a generator per use is ~3x slower
+    __slots__ = ("series", "start")
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.series.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _ValueSeries:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        self._default = None if self.labelnames else self.labels()
+        REGISTRY.append(self)
+
+    @abstractmethod
+    def _new_series(self):
+        """Return the per-label-set series object of this metric type."""
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def samples(self):
+        # [(suffix, {label: value}, number)] for the exposition format
+        with self._lock:
+            series = list(self._series.items())
+        for key, s in series:
+            yield from self._series_samples(dict(zip(self.labelnames, key)), s)
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; cheap enough to observe on every request."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    # Unlabeled histograms are used directly
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def snapshot(self):
+        return self._default.snapshot()
+
+    def _series_samples(self, labels, series):
+        snap = series.snapshot()
+        for le, n in snap["buckets"].items():
+            yield "_bucket", dict(labels, le=le), n
+        yield "_sum", labels, snap["sum"]
+        yield "_count", labels, snap["count"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _ValueSeries()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _series_samples(self, labels, series):
+        yield "_total", labels, series.value
+
+
+class Gauge(_Metric):
+    """
+    Settable gauge, or computed at scrape time when `fn` is given: fn returns
+    a number (unlabeled) or {label values tuple: number}.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        self.fn = fn
+        super().__init__(name, help_text, labelnames)
+
+    def _new_series(self):
+        return _ValueSeries()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def samples(self):
+        if self.fn is None:
+            yield from super().samples()
+            return
+        value = self.fn()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for key, number in items:
+            if number is not None:
+                yield "", dict(zip(self.labelnames, key)), number
+
+    def _series_samples(self, labels, series):
+        yield "", labels, series.value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(number):
+    if number == float("inf"):
+        return "+Inf"
+    if isinstance(number, bool):
+        return "1" if number else "0"
+    return repr(float(number)) if isinstance(number, float) else str(number)
+
+
+def render():
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        help_text = metric.help.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {metric.name} {help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, number in metric.samples():
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            label_str = f"{{{label_str}}}" if label_str else ""
+            lines.append(f"{metric.name}{suffix}{label_str} {_format_number(number)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,172 @@
+"""
+Schema migrations for existing database files.
+
+create_all() only creates missing tables, so anything added to an existing
+table (indexes, columns) is applied here. Each migration runs once, in its
+own transaction, and is recorded in the schemaversion table. Steps are
+written to be idempotent so a fresh database (where create_all already built
+everything) simply records them as applied.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlmodel import SQLModel, Field
+
+
+class SchemaVersion(SQLModel, table=True):
+    version: int = Field(primary_key=True)
+    description: str
+    applied_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+def _find_index(table_name: str, index_name: str):
+    table = SQLModel.metadata.tables[table_name]
+    for index in table.indexes:
+        if index.name == index_name:
+            return index
+    raise KeyError(f"{index_name} is not declared on {table_name}")
+
+
+def create_index(conn, table_name: str, index_name: str):
+    _find_index(table_name, index_name).create(conn, checkfirst=True)
+
+
+def add_column(conn, table_name: str, column_name: str, default_sql: Optional[str] = None):
+    existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+    if column_name in existing:
+        return
+    column = SQLModel.metadata.tables[table_name].c[column_name]
+    col_type = column.type.compile(dialect=conn.dialect)
+    ddl = f'ALTER TABLE "{table_name}" ADD COLUMN "{column_name}" {col_type}'
+    if default_sql is not None:
+        ddl += f" DEFAULT {default_sql}"
+    conn.exec_driver_sql(ddl)
+
+
+# --- MIGRATIONS (append only, never renumber) ---
+
+def _m001_history_indexes(conn):
+    create_index(conn, "healthrecord", "ix_healthrecord_urgent_timestamp")
+    create_index(conn, "healthrecord", "ix_healthrecord_patient_id_timestamp")
+    create_index(conn, "remark", "ix_remark_record_id")
+
+
+def _m002_backfill_patient_stats(conn):
+    from app.services.stats_service import rebuild_stats
+    rebuild_stats(conn)
+
+
+def _m003_healthrecord_model_version(conn):
+    # Existing rows predate the registry; leave them NULL (unknown)
+    add_column(conn, "healthrecord", "model_version")
+
+
+def _m004_healthrecord_updated_at(conn):
+    add_column(conn, "healthrecord", "updated_at")
+    # Existing rows: last remark if any, else creation time
+    conn.exec_driver_sql(
+        'UPDATE healthrecord SET updated_at = COALESCE('
+        '(SELECT MAX(remark.timestamp) FROM remark WHERE remark.record_id = healthrecord.id), timestamp) '
+        'WHERE updated_at IS NULL'
+    )
+    create_index(conn, "healthrecord", "ix_healthrecord_patient_id_updated_at")
+
+
+def _m005_healthrecord_updated_at_index(conn):
+    create_index(conn, "healthrecord", "ix_healthrecord_updated_at")
+
+
+def _m006_backfill_patient_trends(conn):
+    from app.services.trend_service import TRENDS, rebuild_trends
+    TRENDS.create(conn, checkfirst=True)
+    rebuild_trends(conn)
+
+
+def _m007_model_output_columns(conn):
+    from sqlalchemy import bindparam, select, update
+    from app.models.rescore import RescoreResult, RescoreRun
+    from app.services.ml_service import reports_urgent_symptoms
+
+    add_column(conn, "healthrecord", "model_intensity")
+    add_column(conn, "healthrecord", "model_urgent")
+    for table, column, default in ((RescoreRun.__table__, "adjusted", "0"),
+                                   (RescoreRun.__table__, "excluded", "0"),
+                                   (RescoreResult.__table__, "adjusted", "FALSE")):
+        table.create(conn, checkfirst=True)
+        add_column(conn, table.name, column, default)
+
+    # Existing rows: the stored prescription is the model's own unless a
+    # doctor overrode it (an override replaces the safety layer's 0.85 x MHR
+    # upper target) or urgent symptoms escalated it; those stay NULL.
+    # updated_at is kept: nothing a client syncs has changed.
+    hr = SQLModel.metadata.tables["healthrecord"]
+    statement = update(hr).where(hr.c.id == bindparam("b_id")).values(
+        model_intensity=bindparam("b_intensity"), model_urgent=bindparam("b_urgent"),
+        updated_at=hr.c.updated_at)
+    after = 0
+    while True:
+        rows = conn.execute(
+            select(hr.c.id, hr.c.predicted_intensity, hr.c.is_urgent, hr.c.mhr,
+                   hr.c.target_hr_max, hr.c.symptoms)
+            .where(hr.c.id > after, hr.c.model_intensity.is_(None))
+            .order_by(hr.c.id).limit(10_000)
+        ).all()
+        if not rows:
+            break
+        after = rows[-1].id
+        values = [{"b_id": r.id, "b_intensity": r.predicted_intensity, "b_urgent": r.is_urgent}
+                  for r in rows
+                  if r.target_hr_max == int(0.85 * r.mhr)
+                  and not (r.is_urgent and reports_urgent_symptoms(r.symptoms))]
+        if values:
+            conn.execute(statement, values)
+
+
+def _m008_healthrecord_timestamp_id_index(conn):
+    create_index(conn, "healthrecord", "ix_healthrecord_timestamp_id")
+
+
+def _m009_refill_trend_feedback(conn):
+    # Ratings used to be looked up when a window was read and were only
+    # persisted with the next session; they are now written with the feedback
+    from app.services.trend_service import rebuild_trends
+    rebuild_trends(conn)
+
+
+MIGRATIONS = [
+    (1, "healthrecord (patient_id, timestamp) + urgent indexes, remark.record_id index", _m001_history_indexes),
+    (2, "backfill patientstats from existing history", _m002_backfill_patient_stats),
+    (3, "healthrecord.model_version", _m003_healthrecord_model_version),
+    (4, "healthrecord.updated_at + (patient_id, updated_at) index", _m004_healthrecord_updated_at),
+    (5, "healthrecord.updated_at index", _m005_healthrecord_updated_at_index),
+    (6, "backfill patienttrend windows from existing history", _m006_backfill_patient_trends),
+    (7, "healthrecord.model_intensity/model_urgent, rescore adjusted/excluded counts", _m007_model_output_columns),
+    (8, "healthrecord (timestamp, id) index for dashboard pages", _m008_healthrecord_timestamp_id_index),
+    (9, "refill patienttrend post-workout ratings", _m009_refill_trend_feedback),
+]
+
+
+def applied_versions(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(SchemaVersion.__table__.select()).all()
+    return {row.version for row in rows}
+
+
+def run_migrations(engine, verbose=False):
+    SchemaVersion.__table__.create(engine, checkfirst=True)
+    done = applied_versions(engine)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(SchemaVersion.__table__.insert().values(
+                version=version, description=description,
+                applied_at=datetime.now(timezone.utc)
+            ))
+        applied.append(version)
+        if verbose:
+            print(f"✅ Applied migration {version:03d}: {description}")
+    return applied
@@ -1,18 +1,143 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlmodel import create_engine, Session, SQLModel
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.instrumentation import install_db_metrics
 
-# check_same_thread is needed for SQLite to run with FastAPI
-connect_args = {"check_same_thread": False}
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
 
-engine = create_engine(
-    settings.DATABASE_URL, 
-    echo=True, 
-    connect_args=connect_args
-)
+
+def normalize_url(database_url: str) -> str:
+    # Hosted Postgres often hands out "postgres://", which SQLAlchemy rejects
+    if database_url.startswith("postgres://"):
+        return "postgresql://" + database_url[len("postgres://"):]
+    return database_url
+
+
+def _engine_kwargs(url):
+    kwargs = {"echo": settings.DB_ECHO}
+
+    if url.get_backend_name() == "sqlite":
+        # check_same_thread is needed for SQLite to run with FastAPI
+        kwargs["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+        in_memory = url.database in (None, "", ":memory:")
+        if not in_memory:
+            kwargs.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW,
+                          pool_timeout=settings.DB_POOL_TIMEOUT, pool_recycle=settings.DB_POOL_RECYCLE)
+    else:
+        kwargs.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW,
+                      pool_timeout=settings.DB_POOL_TIMEOUT, pool_recycle=settings.DB_POOL_RECYCLE,
+                      pool_pre_ping=True)
+    return kwargs
+
+
+def _install_sqlite_pragmas(sync_engine):
+    @event.listens_for(sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        if settings.SQLITE_WAL:
+            # Readers no longer block the writer, and commits skip the fsync
+            # of the main file (safe in WAL mode).
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.close()
+
+
+def build_engine(database_url: str):
+    url = make_url(normalize_url(database_url))
+    new_engine = create_engine(url, **_engine_kwargs(url))
+    if url.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(new_engine)
+    install_db_metrics(new_engine)
+    return new_engine
+
+
+def build_async_engine(database_url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    url = make_url(normalize_url(database_url))
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS and "+" not in url.drivername:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    new_engine = create_async_engine(url, **_engine_kwargs(url))
+    if backend == "sqlite":
+        _install_sqlite_pragmas(new_engine.sync_engine)
+    install_db_metrics(new_engine.sync_engine)
+    return new_engine
+
+
+DB_BACKEND = make_url(normalize_url(settings.DATABASE_URL)).get_backend_name()
+
+engine = build_engine(settings.DATABASE_URL)
+async_engine = build_async_engine(settings.DATABASE_URL) if settings.DB_ASYNC else None
 
 def get_session():
     with Session(engine) as session:
         yield session
 
+
+class SyncSessionAdapter:
+    """
+    Gives a sync Session the AsyncSession call style, running each blocking
+    call on the threadpool. Lets the same async handlers be A/B tested
+    against the sync engine (DB_ASYNC=False).
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def add(self, instance):
+        self.session.add(instance)
+
+    def add_all(self, instances):
+        self.session.add_all(instances)
+
+    async def exec(self, statement, **kwargs):
+        # Buffer rows in the worker thread, like AsyncSession does
+        kwargs["execution_options"] = {"prebuffer_rows": True, **kwargs.get("execution_options", {})}
+        return await run_in_threadpool(self.session.exec, statement, **kwargs)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.session.execute, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.session.get, entity, ident, **kwargs)
+
+    async def flush(self):
+        await run_in_threadpool(self.session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.session.rollback)
+
+    async def refresh(self, instance, *args, **kwargs):
+        await run_in_threadpool(self.session.refresh, instance, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.session.close)
+
+
+async def get_db():
+    # Request-scoped session for the async handlers
+    if async_engine is not None:
+        from sqlmodel.ext.asyncio.session import AsyncSession
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+    else:
+        adapter = SyncSessionAdapter(Session(engine, expire_on_commit=False))
+        try:
+            yield adapter
+        finally:
+            await adapter.close()
+
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    from app.db.migrations import run_migrations
+    SQLModel.metadata.create_all(engine)
+    # Bring existing database files up to date (indexes/columns on old tables)
+    run_migrations(engine)
@@ -1,11 +1,68 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from app.db.session import create_db_and_tables, engine
 from app.models.user import User, UserRole
 from sqlmodel import Session, select
 # --- IMPORT AUTH HERE ---
-from app.api.v1 import patient, doctor, auth 
+from app.api.v1 import patient, doctor, auth, model, users, analytics
+from app.services.analytics_store import analytics_store
+from app.services.export_service import parquet_available
+from app.services.inference_pool import inference_pool
+from app.services.feedback_writer import feedback_writer
+from app.services.ml_service import ml_service
+from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.instrumentation import MetricsMiddleware
+from app.core.responses import FastJSONResponse
+from app.core.metrics import render as render_metrics
 
-app = FastAPI(title="Cardiac Exercise AI")
+app = FastAPI(title="Cardiac Exercise AI", default_response_class=FastJSONResponse)
+# Inside the metrics middleware, so request latency includes compression
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES,
+                   gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+                   brotli_quality=settings.COMPRESSION_BROTLI_QUALITY)
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def start_inference_pool():
+    await inference_pool.start()
+
+@app.on_event("shutdown")
+async def stop_inference_pool():
+    await inference_pool.stop()
+
+@app.on_event("shutdown")
+async def stop_shadow_mode():
+    # Writes the shadow results still buffered
+    await run_in_threadpool(ml_service.stop_shadow, True)
+
+@app.on_event("startup")
+async def preload_model():
+    # Runs off the event loop; /ready reports when it's done
+    if settings.MODEL_PRELOAD:
+        app.state.model_loader = asyncio.create_task(run_in_threadpool(ml_service.ensure_loaded))
+
+async def _watch_model_manifest():
+    # Other workers activate versions by rewriting the shared manifest
+    while True:
+        await asyncio.sleep(settings.MODEL_MANIFEST_POLL_SECONDS)
+        try:
+            await run_in_threadpool(ml_service.reload_if_changed)
+        except Exception as e:
+            print(f"⚠️  Model manifest check failed: {e}")
+
+@app.on_event("startup")
+async def start_manifest_watcher():
+    if settings.MODEL_MANIFEST_POLL_SECONDS > 0:
+        app.state.manifest_watcher = asyncio.create_task(_watch_model_manifest())
+
+@app.on_event("shutdown")
+async def stop_manifest_watcher():
+    task = getattr(app.state, "manifest_watcher", None)
+    if task:
+        task.cancel()
 
 @app.on_event("startup")
 def on_startup():
@@ -22,11 +79,57 @@ def on_startup():
             session.commit()
             print("✅ Seeded test users: Patient (ID 1), Doctor (ID 2)")
 
+# Registered after on_startup: replaying the journal needs the tables
+@app.on_event("startup")
+async def start_feedback_writer():
+    await feedback_writer.start()
+
+@app.on_event("shutdown")
+async def stop_feedback_writer():
+    await feedback_writer.stop()
+
+async def _refresh_analytics_store():
+    # Appends what changed since the last run; cheap when nothing did
+    while True:
+        await asyncio.sleep(settings.ANALYTICS_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(analytics_store.refresh)
+        except Exception as e:
+            print(f"⚠️  Analytics store refresh failed: {e}")
+
+@app.on_event("startup")
+async def start_analytics_refresher():
+    if settings.ANALYTICS_REFRESH_SECONDS > 0 and parquet_available():
+        app.state.analytics_refresher = asyncio.create_task(_refresh_analytics_store())
+
+@app.on_event("shutdown")
+async def stop_analytics_refresher():
+    task = getattr(app.state, "analytics_refresher", None)
+    if task:
+        task.cancel()
+
 # --- REGISTER THE ROUTERS ---
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Auth"]) # <--- NEW
 app.include_router(patient.router, prefix="/api/v1/patient", tags=["Patient"])
 app.include_router(doctor.router, prefix="/api/v1/doctor", tags=["Doctor"])
+app.include_router(analytics.router, prefix="/api/v1/doctor/analytics", tags=["Doctor"])
+app.include_router(model.router, prefix="/api/v1/model", tags=["Model"])
+app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 
 @app.get("/")
 def root():
-    return {"message": "System Operational"}
\ No newline at end of file
+    return {"message": "System Operational"}
+
+# READINESS: 503 until the model is loaded, so traffic can wait for it
+# (with MODEL_PRELOAD off the first prediction loads it, so don't wait)
+@app.get("/ready")
+def ready():
+    model = ml_service.status()
+    is_ready = model["state"] == "ready" or (model["state"] == "not_loaded" and not settings.MODEL_PRELOAD)
+    status_code = 200 if is_ready else 503
+    return JSONResponse({"ready": status_code == 200, "model": model}, status_code=status_code)
+
+# PROMETHEUS SCRAPE (per process: each uvicorn worker reports its own series)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""
+Maintenance commands. Run from the backend directory:
+
+    python -m app.manage migrate
+    python -m app.manage rebuild-stats
+    python -m app.manage rebuild-trends
+    python -m app.manage register-model v2 path/to/xgb_pipeline.pkl path/to/label_encoder.pkl [--activate]
+    python -m app.manage profile-startup [--top 25]
+    python -m app.manage rescore [--version v2] [--workers 4] [--chunk-size 5000] [--changed-only]
+    python -m app.manage rescore --resume RUN_ID
+    python -m app.manage rescore-report RUN_ID
+    python -m app.manage analytics-refresh [--rebuild]
+"""
+import argparse
+import json
+import os
+
+# Runs in a fresh interpreter under -X importtime: import the app exactly as
+# uvicorn would, then load the model the way the first request would.
+_PROFILE_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter() - start
+from app.services.ml_service import ml_service
+start = time.perf_counter()
+ml_service.ensure_loaded()
+loaded = time.perf_counter() - start
+sys.stdout.write(json.dumps({"import_seconds": imported, "model_load_seconds": loaded,
+                             "model": ml_service.status()}))
+"""
+
+
+def cmd_migrate(args):
+    from sqlmodel import SQLModel
+    from app.db.session import engine
+    from app.db.migrations import run_migrations
+    import app.models.user, app.models.health, app.models.stats, app.models.shadow, app.models.rescore, app.models.trend  # noqa: F401  (register tables)
+
+    SQLModel.metadata.create_all(engine)
+    applied = run_migrations(engine, verbose=True)
+    if not applied:
+        print("Database schema is up to date.")
+
+
+def cmd_rebuild_stats(args):
+    from app.db.session import engine
+    from app.services.stats_service import rebuild_stats
+
+    with engine.begin() as conn:
+        patients = rebuild_stats(conn)
+    print(f"✅ Rebuilt stats for {patients} patients.")
+
+
+def cmd_rebuild_trends(args):
+    from app.db.session import engine
+    from app.services.trend_service import rebuild_trends
+
+    with engine.begin() as conn:
+        patients = rebuild_trends(conn)
+    print(f"✅ Rebuilt trend windows for {patients} patients.")
+
+
+def cmd_register_model(args):
+    from app.services.ml_service import MODEL_DIR
+    from app.services.model_registry import ModelRegistry
+
+    registry = ModelRegistry(MODEL_DIR)
+    if args.input_domains:
+        input_domains = json.loads(args.input_domains)
+    else:
+        # The API sends the same values whatever the model version
+        manifest = registry.manifest()
+        input_domains = manifest["versions"][manifest["active"]].get("input_domains", {})
+    registry.register(args.version, args.pipeline, args.encoder, args.description, input_domains)
+    # Validate before anyone can activate it
+    bundle = registry.load(args.version)
+    print(f"✅ Registered model version {bundle.version}.")
+    if bundle.fast_path is None:
+        print("⚠️  No single-row fast path for this version; predictions use the pipeline.")
+    if args.activate:
+        registry.set_active(args.version)
+        print(f"✅ {args.version} is now active (running workers pick it up from the manifest).")
+
+
+def _parse_importtime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | package"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def cmd_profile_startup(args):
+    import json
+    import subprocess
+    import sys
+    from collections import defaultdict
+
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROFILE_CHILD],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    rows = _parse_importtime(proc.stderr)
+
+    # Everything imported after app.main finished was pulled in by the model load
+    main_at = next(i for i, r in enumerate(rows) if r[0] == "app.main")
+    app_rows, model_rows = rows[:main_at + 1], rows[main_at + 1:]
+
+    print(f"Import app.main: {result['import_seconds']:.3f}s")
+    print(f"Model load:      {result['model_load_seconds']:.3f}s "
+          f"(state={result['model']['state']}, version={result['model']['version']})")
+    if result["model"]["error"]:
+        print(f"  ⚠️  {result['model']['error']}")
+
+    for title, section in (("app.main imports", app_rows), ("imports triggered by model load", model_rows)):
+        by_package = defaultdict(int)
+        for name, self_us, _ in section:
+            by_package[name.split(".")[0]] += self_us
+        print(f"\n--- {title}: top {args.top} packages by self time ---")
+        for package, us in sorted(by_package.items(), key=lambda x: -x[1])[:args.top]:
+            print(f"{us / 1000:10.1f} ms  {package}")
+
+    print(f"\n--- app.main imports: top {args.top} modules by cumulative time ---")
+    for name, _, cumulative_us in sorted(app_rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cumulative_us / 1000:10.1f} ms  {name}")
+
+
+def _print_rescore_summary(summary):
+    print(f"Run {summary['run_id']} ({summary['model_version']}): {summary['status']}"
+          + (f" - {summary['error']}" if summary["error"] else ""))
+    print(f"  scored {summary['scored']}, skipped {summary['skipped']} (no age/gender), "
+          f"changed {summary['changed']} ({summary['changed_rate']:.1%})")
+    print(f"  newly urgent {summary['newly_urgent']}, no longer urgent {summary['no_longer_urgent']}")
+    print(f"  adjusted since prediction {summary['adjusted']} (override/escalation, not drift), "
+          f"excluded {summary['excluded']} (model output unknown)")
+    for transition, n in sorted(summary["transitions"].items(), key=lambda x: -x[1]):
+        print(f"  {transition:20s} {n}")
+
+
+def cmd_rescore(args):
+    from sqlmodel import SQLModel
+    from app.db.session import engine
+    from app.services import rescore_service
+
+    SQLModel.metadata.create_all(engine, tables=[rescore_service.RUNS, rescore_service.RESULTS])
+    if args.resume:
+        run_id = args.resume
+        print(f"Resuming rescore run {run_id}...")
+    else:
+        from app.services.ml_service import MODEL_DIR
+        from app.services.model_registry import ModelRegistry
+        version = args.version or ModelRegistry(MODEL_DIR).active_version()
+        run_id = rescore_service.create_run(engine, version, args.chunk_size, args.changed_only)
+        print(f"Started rescore run {run_id} with model {version} ({args.workers} workers).")
+
+    def progress(last_id, upto_id, done, seconds):
+        print(f"  up to record {last_id}/{upto_id}: {done} rows, {done / seconds:,.0f} rows/s", flush=True)
+
+    try:
+        rescore_service.execute_run(engine, run_id, args.workers, progress)
+    except KeyboardInterrupt:
+        print(f"\n⚠️  Interrupted. Continue with: python -m app.manage rescore --resume {run_id}")
+        return
+    with engine.connect() as conn:
+        _print_rescore_summary(rescore_service.summarize_run(conn, run_id))
+    print(f"✅ Rescore run {run_id} finished.")
+
+
+def cmd_rescore_report(args):
+    from app.db.session import engine
+    from app.services import rescore_service
+
+    with engine.connect() as conn:
+        summary = rescore_service.summarize_run(conn, args.run_id)
+    if summary is None:
+        raise SystemExit(f"No rescore run {args.run_id}")
+    _print_rescore_summary(summary)
+
+
+def cmd_analytics_refresh(args):
+    from app.services.analytics_store import analytics_store
+
+    result = analytics_store.refresh(rebuild=args.rebuild)
+    print(f"Appended {result['rows_appended']} rows to {len(result['months_touched'])} month(s) "
+          f"in {result['seconds']:.2f}s.")
+    if result["compacted"]:
+        print(f"Compacted: {', '.join(result['compacted'])}")
+    status = analytics_store.status()
+    print(f"✅ Analytics store at {status['directory']}: {sum(status['months'].values())} files, "
+          f"{status['bytes'] / 1e6:.1f} MB, watermark {status['watermark']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("migrate", help="Create missing tables and apply pending schema migrations")
+    sub.add_parser("rebuild-stats", help="Recompute PatientStats from HealthRecord")
+    sub.add_parser("rebuild-trends", help="Rebuild PatientTrend windows from HealthRecord")
+    register = sub.add_parser("register-model", help="Copy a pipeline/encoder pair into the model registry")
+    register.add_argument("version")
+    register.add_argument("pipeline")
+    register.add_argument("encoder")
+    register.add_argument("--description", default="")
+    register.add_argument("--activate", action="store_true")
+    register.add_argument("--input-domains", help='JSON {column: [values]} for unfitted categorical steps '
+                                                  "(default: the active version's)")
+    profile = sub.add_parser("profile-startup", help="Report per-module import time and model load time")
+    profile.add_argument("--top", type=int, default=25)
+    rescore = sub.add_parser("rescore", help="Re-score HealthRecord history into a comparison table")
+    rescore.add_argument("--version", help="Registry model version (default: the active one)")
+    rescore.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                         help="Scoring processes (0 scores in this process)")
+    rescore.add_argument("--chunk-size", type=int, default=5000)
+    rescore.add_argument("--changed-only", action="store_true", help="Store only rows whose result changed")
+    rescore.add_argument("--resume", type=int, metavar="RUN_ID", help="Continue an interrupted run")
+    report = sub.add_parser("rescore-report", help="Summarize a rescore run")
+    report.add_argument("run_id", type=int)
+    analytics = sub.add_parser("analytics-refresh", help="Append new/changed HealthRecords to the analytics store")
+    analytics.add_argument("--rebuild", action="store_true", help="Drop the store and rebuild it from scratch")
+
+    args = parser.parse_args(argv)
+    {
+        "migrate": cmd_migrate,
+        "rebuild-stats": cmd_rebuild_stats,
+        "rebuild-trends": cmd_rebuild_trends,
+        "register-model": cmd_register_model,
+        "profile-startup": cmd_profile_startup,
+        "rescore": cmd_rescore,
+        "rescore-report": cmd_rescore_report,
+        "analytics-refresh": cmd_analytics_refresh,
+    }[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,22 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from typing import Optional, List
 from datetime import datetime, timezone
 
+def _utcnow():
+    return datetime.now(timezone.utc)
+
 class HealthRecord(SQLModel, table=True):
+    __table_args__ = (
+        # Backs /doctor/alerts. Partial (urgent rows only) on SQLite/Postgres,
+        # a plain composite index elsewhere.
+        Index(
+            "ix_healthrecord_urgent_timestamp", "is_urgent", "timestamp",
+            sqlite_where=text("is_urgent = 1"),
+            postgresql_where=text("is_urgent"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="user.id")
     # Use timezone-aware UTC for accurate history
@@ -28,18 +42,38 @@ class HealthRecord(SQLModel, table=True):
     target_hr_max: int
     is_urgent: bool = Field(default=False)
     calories_burned: float = Field(default=0.0)
+    model_version: Optional[str] = Field(default=None) # registry version that scored it
+    # What the model + safety rules gave, kept when a doctor override or a
+    # symptom escalation later changes predicted_intensity / is_urgent
+    # (NULL on older rows where the two can't be told apart)
+    model_intensity: Optional[str] = Field(default=None)
+    model_urgent: Optional[bool] = Field(default=None)
 
     # --- POST-WORKOUT FEEDBACK ---
     borg_rating_after: Optional[int] = Field(default=None)
     mood: Optional[str] = Field(default=None)
     symptoms: Optional[str] = Field(default=None)
 
+    # Last change to the record or its remarks; drives history ETags and
+    # ?since= sync. Set by the column default/onupdate, so Core inserts and
+    # UPDATE statements keep it current too (remark writes bump it explicitly).
+    updated_at: Optional[datetime] = Field(default=None, sa_column_kwargs={"default": _utcnow, "onupdate": _utcnow})
+
     remarks: List["Remark"] = Relationship(back_populates="record")
 
 class Remark(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    record_id: int = Field(foreign_key="healthrecord.id")
+    record_id: int = Field(foreign_key="healthrecord.id", index=True)
     doctor_id: int = Field(foreign_key="user.id")
     text: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    record: Optional[HealthRecord] = Relationship(back_populates="remarks")
\ No newline at end of file
+    record: Optional[HealthRecord] = Relationship(back_populates="remarks")
+
+# Backs /patient/history: filter on patient_id, newest first
+Index("ix_healthrecord_patient_id_timestamp", HealthRecord.patient_id, HealthRecord.timestamp.desc())
+# Backs the history ETag (max updated_at) and ?since= delta queries
+Index("ix_healthrecord_patient_id_updated_at", HealthRecord.patient_id, HealthRecord.updated_at)
+# Backs the incremental analytics-store refresh (everything changed since X)
+Index("ix_healthrecord_updated_at", HealthRecord.updated_at)
+# Backs /doctor/dashboard keyset pages: (timestamp, id), newest first
+Index("ix_healthrecord_timestamp_id", HealthRecord.timestamp.desc(), HealthRecord.id.desc())
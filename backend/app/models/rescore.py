@@ -0,0 +1,44 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime, timezone
+
+class RescoreRun(SQLModel, table=True):
+    # One offline re-scoring pass over HealthRecord history. The scan covers
+    # ids up to upto_record_id (fixed at start); last_record_id is the
+    # checkpoint, committed together with each chunk's results.
+    id: Optional[int] = Field(default=None, primary_key=True)
+    model_version: str
+    status: str = Field(default="running") # running | done | failed
+    started_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = Field(default=None)
+    chunk_size: int
+    changed_only: bool = Field(default=False)
+    upto_record_id: int
+    last_record_id: int = Field(default=0)
+    scored: int = Field(default=0)
+    changed: int = Field(default=0)
+    skipped: int = Field(default=0) # patient has no age/gender on file
+    # Scored rows whose prescription a doctor override or symptom escalation
+    # changed after prediction (compared on the model's own output)
+    adjusted: int = Field(default=0)
+    excluded: int = Field(default=0) # older adjusted rows: model output unknown, not compared
+    error: Optional[str] = Field(default=None)
+
+class RescoreResult(SQLModel, table=True):
+    # What the stored model gave (the record's model_intensity / model_urgent)
+    # vs. what the run's model + current safety rules give; targets as stored
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(foreign_key="rescorerun.id", index=True)
+    record_id: int
+    patient_id: int
+    stored_model_version: Optional[str] = Field(default=None)
+    stored_intensity: str
+    rescored_intensity: str
+    stored_urgent: bool
+    rescored_urgent: bool
+    stored_target_hr_min: int
+    stored_target_hr_max: int
+    rescored_target_hr_min: int
+    rescored_target_hr_max: int
+    changed: bool # intensity or urgency differs
+    adjusted: bool = Field(default=False) # live prescription was overridden / escalated since
@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime, timezone
+
+class ShadowResult(SQLModel, table=True):
+    # One row per live prediction that the candidate (shadow) model also
+    # scored; both intensities are after the safety layer
+    id: Optional[int] = Field(default=None, primary_key=True)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    production_version: Optional[str] = Field(default=None)
+    shadow_version: str = Field(index=True)
+    production_intensity: str
+    shadow_intensity: str
+    agree: bool
+    production_ms: float  # model time per row on the live path
+    shadow_ms: float      # model time per row in the shadow worker
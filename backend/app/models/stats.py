@@ -0,0 +1,13 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import date, datetime
+
+class PatientStats(SQLModel, table=True):
+    # Materialized per-patient aggregates, kept current by every write that
+    # creates a session or changes its calories (see stats_service)
+    patient_id: int = Field(primary_key=True, foreign_key="user.id")
+    sessions: int = Field(default=0)
+    total_calories: float = Field(default=0.0)
+    active_days: int = Field(default=0)  # distinct UTC dates with a session
+    last_active_date: Optional[date] = Field(default=None)
+    last_session_at: Optional[datetime] = Field(default=None)
@@ -0,0 +1,10 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, LargeBinary
+
+class PatientTrend(SQLModel, table=True):
+    # The patient's last TREND_WINDOW sessions, packed into a fixed-size
+    # ring buffer (see trend_service.TrendBuffer); kept current by every
+    # write that creates a session, in the same transaction
+    patient_id: int = Field(primary_key=True, foreign_key="user.id")
+    buffer: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    sessions: int = Field(default=0) # sessions ever appended, not just the buffered ones
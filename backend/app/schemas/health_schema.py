@@ -2,6 +2,9 @@ from pydantic import BaseModel
 from typing import Optional, List, Literal
 from datetime import datetime
 
+# The levels the model predicts; overrides are checked against the same set
+Intensity = Literal["Low", "Moderate", "High"]
+
 class UserUpdate(BaseModel):    # <--- THIS WAS MISSING OR NOT SAVED
     age: int
     gender: Literal["M", "F"]
@@ -19,6 +22,9 @@ class HealthInput(BaseModel):
     has_htn: bool
     has_dm: bool
 
+class HealthBatchItem(HealthInput):
+    user_id: int
+
 class WorkoutFeedback(BaseModel):
     borg_rating: int
     mood: str
@@ -38,4 +44,16 @@ class HealthResponse(BaseModel):
     target_hr_max: int
     is_urgent: bool
     calories_burned: float
-    youtube_link: Optional[str] = None
\ No newline at end of file
+    model_version: Optional[str] = None
+    youtube_link: Optional[str] = None
+    # Comparison with the patient's recent sessions (see trend_service);
+    # the flags are advisory and never change the prescription or is_urgent
+    trend: Optional[dict] = None
+    trend_flags: List[str] = []
+class RemarkItem(BaseModel):
+    record_id: int
+    text: str
+
+class OverrideItem(BaseModel):
+    record_id: int
+    new_intensity: Intensity
@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+from abc import ABC, abstractmethod
+from collections import deque
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+
+ALERTS_PUBLISHED = Counter("alerts_published", "Urgent-alert events published", labelnames=("reason",))
+SUBSCRIBERS_DROPPED = Counter("alert_subscribers_dropped", "Alert streams closed for falling behind")
+
+# Same columns as a /doctor/alerts item, so clients can merge events into that list
+ALERT_FIELDS = ["id", "patient_id", "timestamp", "predicted_intensity", "resting_hr",
+                "bp_systolic", "bp_diastolic", "symptoms", "mood"]
+
+
+def alert_payload(record, patient_username):
+    # Call while the record is loaded (before commit, or after a refresh):
+    # committed instances may be expired
+    payload = {f: getattr(record, f) for f in ALERT_FIELDS}
+    payload["patient_username"] = patient_username
+    return jsonable_encoder(payload)
+
+
+class Subscription:
+    def __init__(self, max_queue):
+        self.queue = asyncio.Queue(max_queue)
+        self.dropped = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client is cut off instead of buffering without bound;
+            # it reconnects with Last-Event-ID and replays what it missed.
+            self.dropped = True
+        return not self.dropped
+
+
+class AlertBroker(ABC):
+    """
+    Interface used by the API. publish() is called after the record is
+    committed; subscribe() returns (replay, subscription) where replay holds
+    the buffered events after `last_event_id`, or None when that ID is no
+    longer buffered (the client should then refetch /doctor/alerts).
+    An external broker (Redis streams, NATS, ...) implements the same three
+    methods and replaces `alert_broker` below.
+    """
+
+    @abstractmethod
+    def publish(self, reason, payload):
+        ...
+
+    @abstractmethod
+    def subscribe(self, last_event_id=None):
+        ...
+
+    @abstractmethod
+    def unsubscribe(self, subscription):
+        ...
+
+
+class InProcessAlertBroker(AlertBroker):
+    """
+    Pub/sub inside one process, with a ring buffer of the last `replay_size`
+    events for resuming. Call from the event loop only. Each uvicorn worker
+    has its own broker, so run a single worker (or an external broker) when
+    doctors must see alerts raised by every worker.
+    """
+
+    def __init__(self, replay_size, max_queue):
+        self.max_queue = max_queue
+        self._ids = itertools.count(1)
+        self._recent = deque(maxlen=replay_size)
+        self._subscribers = set()
+
+    @property
+    def last_id(self):
+        return self._recent[-1]["id"] if self._recent else 0
+
+    def publish(self, reason, payload):
+        event = {"id": next(self._ids), "reason": reason, "alert": payload}
+        self._recent.append(event)
+        ALERTS_PUBLISHED.labels(reason).inc()
+        for sub in list(self._subscribers):
+            if not sub.deliver(event):
+                self._subscribers.discard(sub)
+                SUBSCRIBERS_DROPPED.inc()
+        return event
+
+    def subscribe(self, last_event_id=None):
+        replay = []
+        if last_event_id is not None:
+            # IDs restart at 1 with the process, so an ID from the future
+            # means the server restarted: the client must resync too.
+            oldest = self._recent[0]["id"] if self._recent else self.last_id + 1
+            if last_event_id > self.last_id or last_event_id < oldest - 1:
+                replay = None
+            else:
+                replay = [e for e in self._recent if e["id"] > last_event_id]
+        sub = Subscription(self.max_queue)
+        self._subscribers.add(sub)
+        return replay, sub
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def stats(self):
+        return {"subscribers": len(self._subscribers), "buffered": len(self._recent),
+                "last_event_id": self.last_id}
+
+
+alert_broker = InProcessAlertBroker(settings.ALERT_REPLAY_SIZE, settings.ALERT_SUBSCRIBER_QUEUE)
+
+Gauge("alert_stream_subscribers", "Open /doctor/alerts/stream connections",
+      fn=lambda: len(alert_broker._subscribers))
@@ -0,0 +1,331 @@
+"""
+Append-only columnar copy of HealthRecord for cohort analytics.
+
+Layout: <ANALYTICS_DIR>/healthrecord/month=YYYY-MM/part-NNNNNN.parquet, split
+on the (immutable) session timestamp. Each refresh streams the rows changed
+since the last watermark (HealthRecord.updated_at) out of the OLTP database
+and appends one part file per touched month; an edited record therefore has
+several versions, and readers keep the one with the newest updated_at.
+Months with ANALYTICS_MAX_PARTS files are compacted back to one.
+
+Queries read only the needed columns of the needed months and aggregate
+with Arrow compute kernels; no ORM objects are built.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.metrics import Gauge, Histogram
+from app.models.health import HealthRecord
+from app.services.export_service import arrow_schema, stream_chunks
+
+HR = HealthRecord.__table__
+ROW_GROUP_ROWS = 65536  # buffer this many rows per month before writing a row group
+REFRESH_LATENCY = Histogram("analytics_refresh_duration_seconds", "Incremental analytics-store refresh time")
+
+
+def _utc(value):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _lock_exclusive(lock_file):
+    # Cross-process lock, released when lock_file is closed. Without fcntl
+    # or msvcrt only the in-process refresh lock applies.
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue  # LK_LOCK gives up after ~10s; keep waiting
+
+
+def _latest_versions(table):
+    # Keep the newest version of each record (vectorized: sort, then drop
+    # every row whose id equals the previous row's)
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if table.num_rows < 2:
+        return table
+    table = table.sort_by([("id", "ascending"), ("updated_at", "descending")])
+    ids = table.column("id").combine_chunks()
+    changed = pc.not_equal(ids.slice(1), ids.slice(0, len(ids) - 1))
+    return table.filter(pa.concat_arrays([pa.array([True]), changed]))
+
+
+class AnalyticsStore:
+    def __init__(self, root, lookback_seconds, max_parts):
+        self.root = Path(root)
+        self.data_dir = self.root / "healthrecord"
+        self.lookback = timedelta(seconds=lookback_seconds)
+        self.max_parts = max_parts
+        self._lock = threading.Lock()  # refresh vs. readers in this process
+        self._refresh_lock = threading.Lock()  # one refresh at a time in this process
+        self.last_refresh = None
+
+    # --- STATE ---
+    def _state(self):
+        try:
+            return json.loads((self.root / "state.json").read_text())
+        except FileNotFoundError:
+            return {"watermark": None, "next_part": 1, "refreshed_at": None, "rows_appended": 0}
+
+    def _save_state(self, state):
+        tmp = self.root / "state.json.tmp"
+        tmp.write_text(json.dumps(state, indent=2))
+        os.replace(tmp, self.root / "state.json")
+
+    def initialized(self):
+        return (self.root / "state.json").exists()
+
+    def _months(self):
+        if not self.data_dir.exists():
+            return {}
+        return {d.name.split("=", 1)[1]: sorted(d.glob("part-*.parquet"))
+                for d in sorted(self.data_dir.glob("month=*")) if d.is_dir()}
+
+    # --- REFRESH ---
+    def refresh(self, rebuild=False):
+        """Append everything changed since the watermark; returns a summary."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._refresh_lock, open(self.root / ".lock", "w") as lock_file:
+            # One refresher at a time across processes (uvicorn workers, CLI)
+            _lock_exclusive(lock_file)
+            start = time.perf_counter()
+            if rebuild:
+                with self._lock:
+                    for parts in self._months().values():
+                        for path in parts:
+                            path.unlink()
+                    (self.root / "state.json").unlink(missing_ok=True)
+            state = self._state()
+            part = state["next_part"]
+
+            statement = select(HR).order_by(HR.c.id)
+            if state["watermark"]:
+                since = datetime.fromisoformat(state["watermark"]) - self.lookback
+                statement = statement.where(HR.c.updated_at > since)
+
+            schema = arrow_schema()
+            writers, buffers, appended = {}, {}, 0
+            watermark = datetime.fromisoformat(state["watermark"]) if state["watermark"] else None
+
+            def write(month):
+                if month not in writers:
+                    directory = self.data_dir / f"month={month}"
+                    directory.mkdir(parents=True, exist_ok=True)
+                    tmp = directory / f".part-{part:06d}.parquet.tmp"
+                    writers[month] = (pq.ParquetWriter(tmp, schema), tmp)
+                writers[month][0].write_table(pa.concat_tables(buffers.pop(month)))
+
+            try:
+                for rows in stream_chunks(statement):
+                    table = pa.Table.from_pylist([dict(row._mapping) for row in rows], schema=schema)
+                    appended += table.num_rows
+                    latest = pc.max(table["updated_at"]).as_py()
+                    if latest is not None and (watermark is None or latest > watermark):
+                        watermark = latest
+                    months = pc.strftime(table["timestamp"], format="%Y-%m")
+                    for month in pc.unique(months).to_pylist():
+                        buffers.setdefault(month, []).append(table.filter(pc.equal(months, month)))
+                        if sum(t.num_rows for t in buffers[month]) >= ROW_GROUP_ROWS:
+                            write(month)
+                for month in list(buffers):
+                    write(month)
+            except BaseException:
+                # A failed refresh leaves no part behind; the watermark hasn't
+                # moved, so the next one reads the same rows again
+                for writer, tmp in writers.values():
+                    with contextlib.suppress(Exception):
+                        writer.close()
+                    tmp.unlink(missing_ok=True)
+                raise
+            # Files only become visible (renamed) once complete
+            for writer, tmp in writers.values():
+                writer.close()
+                os.replace(tmp, tmp.with_name(f"part-{part:06d}.parquet"))
+            if writers:
+                part += 1
+
+            compacted = []
+            for month, parts in self._months().items():
+                if len(parts) >= self.max_parts:
+                    self._compact(month, parts, part)
+                    compacted.append(month)
+                    part += 1
+
+            state.update(watermark=watermark.isoformat() if watermark else None, next_part=part,
+                         refreshed_at=datetime.now(timezone.utc).isoformat(),
+                         rows_appended=state["rows_appended"] + appended)
+            self._save_state(state)
+            seconds = time.perf_counter() - start
+            REFRESH_LATENCY.observe(seconds)
+            self.last_refresh = {"rows_appended": appended, "months_touched": sorted(writers),
+                                 "compacted": compacted, "seconds": round(seconds, 3)}
+            return self.last_refresh
+
+    def _compact(self, month, parts, part):
+        import pyarrow.parquet as pq
+
+        directory = self.data_dir / f"month={month}"
+        table = _latest_versions(pq.read_table(parts, schema=arrow_schema()))
+        tmp = directory / f".part-{part:06d}.parquet.tmp"
+        pq.write_table(table.sort_by("id"), tmp)
+        with self._lock:
+            os.replace(tmp, directory / f"part-{part:06d}.parquet")
+            for path in parts:
+                path.unlink()
+
+    def refresh_if_empty(self):
+        if not self.initialized():
+            self.refresh()
+
+    # --- QUERIES ---
+    def load(self, columns, date_from=None, date_to=None, condition=None):
+        """Latest version of each record in [date_from, date_to), `columns` only."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        date_from, date_to = _utc(date_from), _utc(date_to)
+        wanted = list(dict.fromkeys(["id", "updated_at", "timestamp", *columns]
+                                    + (["conditions"] if condition else [])))
+        schema = pa.schema([arrow_schema().field(c) for c in wanted])
+
+        for attempt in range(3):
+            with self._lock:
+                months = self._months()
+            # Partition pruning on the month directories
+            files, multi_part = [], False
+            for month, parts in months.items():
+                if date_from and month < date_from.strftime("%Y-%m"): continue
+                if date_to and month > date_to.strftime("%Y-%m"): continue
+                files += parts
+                multi_part = multi_part or len(parts) > 1
+            if not files:
+                return schema.empty_table()
+            try:
+                table = pq.read_table(files, columns=wanted, schema=schema)
+                break
+            except FileNotFoundError:
+                continue  # another process compacted the month meanwhile
+        else:
+            raise RuntimeError("Analytics store kept changing during the read")
+
+        if multi_part:
+            table = _latest_versions(table)
+        mask = None
+        if date_from:
+            mask = pc.greater_equal(table["timestamp"], pa.scalar(date_from, schema.field("timestamp").type))
+        if date_to:
+            upper = pc.less(table["timestamp"], pa.scalar(date_to, schema.field("timestamp").type))
+            mask = upper if mask is None else pc.and_(mask, upper)
+        if condition:
+            has = pc.match_substring(table["conditions"], condition)
+            mask = has if mask is None else pc.and_(mask, has)
+        return table if mask is None else table.filter(mask)
+
+    def status(self):
+        state = self._state()
+        with self._lock:
+            months = self._months()
+        return {
+            "directory": str(self.root),
+            "watermark": state["watermark"],
+            "refreshed_at": state["refreshed_at"],
+            "rows_appended": state["rows_appended"],
+            "months": {month: len(parts) for month, parts in months.items()},
+            "bytes": sum(p.stat().st_size for parts in months.values() for p in parts),
+            "last_refresh": self.last_refresh,
+        }
+
+
+def _period_start(timestamps, period):
+    import pyarrow.compute as pc
+    if period == "week":
+        return pc.floor_temporal(timestamps, unit="week", week_starts_monday=True)
+    return pc.floor_temporal(timestamps, unit="month")
+
+
+def _rows(table, key, fields):
+    # Arrow group_by output -> JSON-ready list sorted by the group key
+    rows = []
+    for record in table.sort_by(key).to_pylist():
+        row = {key: record[key].date().isoformat() if hasattr(record[key], "date") else record[key]}
+        for out, (src, digits) in fields.items():
+            value = record[src]
+            row[out] = round(value, digits) if isinstance(value, float) else value
+        rows.append(row)
+    return rows
+
+
+def resting_hr_by_period(store, period="week", **filters):
+    table = store.load(["resting_hr"], **filters)
+    table = table.append_column("period_start", _period_start(table["timestamp"], period))
+    grouped = table.group_by("period_start").aggregate([("resting_hr", "mean"), ("resting_hr", "count")])
+    return _rows(grouped, "period_start", {"avg_resting_hr": ("resting_hr_mean", 1),
+                                           "sessions": ("resting_hr_count", 0)})
+
+
+def urgent_share_by_period(store, period="week", **filters):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = store.load(["is_urgent"], **filters)
+    table = table.append_column("period_start", _period_start(table["timestamp"], period))
+    table = table.append_column("urgent", pc.cast(table["is_urgent"], pa.int64()))
+    grouped = table.group_by("period_start").aggregate([("urgent", "sum"), ("urgent", "count")])
+    rows = _rows(grouped, "period_start", {"urgent": ("urgent_sum", 0), "sessions": ("urgent_count", 0)})
+    for row in rows:
+        row["urgent_share"] = round(row["urgent"] / row["sessions"], 4) if row["sessions"] else 0.0
+    return rows
+
+
+def borg_by_intensity(store, **filters):
+    table = store.load(["predicted_intensity", "borg_rating_before", "borg_rating_after"], **filters)
+    grouped = table.group_by("predicted_intensity").aggregate([
+        ("borg_rating_before", "mean"), ("borg_rating_after", "mean"),
+        ("borg_rating_before", "count"), ("borg_rating_after", "count"),
+    ])
+    rows = _rows(grouped, "predicted_intensity", {
+        "avg_borg_before": ("borg_rating_before_mean", 2),
+        "avg_borg_after": ("borg_rating_after_mean", 2),
+        "sessions": ("borg_rating_before_count", 0),
+        "sessions_with_feedback": ("borg_rating_after_count", 0),
+    })
+    for row in rows:
+        before, after = row["avg_borg_before"], row["avg_borg_after"]
+        row["avg_borg_change"] = round(after - before, 2) if before is not None and after is not None else None
+    return rows
+
+
+analytics_store = AnalyticsStore(settings.ANALYTICS_DIR, settings.ANALYTICS_LOOKBACK_SECONDS,
+                                 settings.ANALYTICS_MAX_PARTS)
+
+Gauge("analytics_store_bytes", "Size of the analytics store's Parquet files",
+      fn=lambda: analytics_store.status()["bytes"] if analytics_store.initialized() else 0)
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.health import HealthRecord
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+HR = HealthRecord.__table__
+COLUMNS = [c.name for c in HR.columns]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _statement(patient_id=None, date_from=None, date_to=None):
+    statement = select(HR)
+    if patient_id is not None: statement = statement.where(HR.c.patient_id == patient_id)
+    if date_from is not None: statement = statement.where(HR.c.timestamp >= date_from)
+    if date_to is not None: statement = statement.where(HR.c.timestamp < date_to)
+    return statement.order_by(HR.c.id)
+
+
+def stream_chunks(statement):
+    """
+    Run `statement` on a server-side cursor and yield its rows in chunks of
+    EXPORT_CHUNK_SIZE, so only one chunk is ever held in memory. Uses the
+    sync engine on purpose: StreamingResponse drives sync iterators from the
+    threadpool, so the event loop is never blocked.
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=settings.EXPORT_CHUNK_SIZE
+        ).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+
+def _ndjson(statement):
+    for rows in stream_chunks(statement):
+        yield "".join(json.dumps(dict(row._mapping), default=_json_default) + "\n" for row in rows).encode()
+
+
+def _csv(statement):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in stream_chunks(statement):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _DrainableSink(io.RawIOBase):
+    # File-like target for ParquetWriter that hands back what was written so far
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def arrow_schema():
+    # Fixed schema from the table definition, so an all-NULL chunk can't
+    # change a column's type mid-file
+    import pyarrow as pa
+
+    arrow_types = {
+        bool: pa.bool_(), int: pa.int64(), float: pa.float64(),
+        datetime: pa.timestamp("us", tz="UTC"), date: pa.date32(),
+    }
+
+    def arrow_type(col_type):
+        col_type = getattr(col_type, "impl_instance", col_type)  # unwrap TypeDecorators
+        try:
+            return arrow_types.get(col_type.python_type, pa.string())
+        except NotImplementedError:
+            return pa.string()
+
+    return pa.schema([(c.name, arrow_type(c.type)) for c in HR.columns])
+
+
+def _parquet(statement):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in stream_chunks(statement):
+        table = pa.Table.from_pylist([dict(row._mapping) for row in rows], schema=schema)
+        writer.write_table(table)  # one row group per chunk
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def stream_export(fmt, patient_id=None, date_from=None, date_to=None):
+    statement = _statement(patient_id, date_from, date_to)
+    return {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}[fmt](statement)
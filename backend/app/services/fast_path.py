@@ -0,0 +1,122 @@
+import threading
+import numpy as np
+
+# Order of the arguments predict_and_audit receives, mapped to pipeline columns
+FEATURE_ORDER = (
+    'Age', 'Gender', 'Weight (kg)', 'Resting Heart Rate (BPM)',
+    'BPB_Systolic', 'BPB_Diastolic', 'Pulse Rate Before',
+    'Respiratory Rate Before', 'Borg Scale Rating (Before)',
+    'Pre-existing Conditions'
+)
+
+
+class CompiledPipeline:
+    """
+    Precompiled copy of xgb_pipeline.pkl for single-row inference.
+
+    The fitted StandardScaler is reduced to its mean_/scale_ arrays, the
+    categorical transformers to lookup tables of their encoded rows, and the
+    XGBoost booster is fed a reused NumPy buffer directly. Produces exactly
+    what pipeline.predict + encoder.inverse_transform produce.
+
+    A categorical step needs a known input domain to become a lookup table:
+    the fitted categories_ of an encoder, or else the version's
+    "input_domains" entry in manifest.json. Without one the pipeline is not
+    compiled (predictions use the pipeline), and values outside the domain
+    return None so the caller falls back to the pipeline.
+    """
+
+    def __init__(self, pipeline, encoder, input_domains=None):
+        preprocess = pipeline.named_steps['preprocess']
+        self.model = pipeline.named_steps['model']
+        self.booster = self.model.get_booster()
+        self.classes = [str(c) for c in encoder.classes_]
+        self.input_domains = input_domains or {}
+        # Trees XGBClassifier.predict uses: up to the best iteration when the
+        # model was trained with early stopping, otherwise all of them
+        try:
+            self.iteration_range = (0, self.model.best_iteration + 1)
+        except AttributeError:
+            self.iteration_range = (0, 0)
+        self.width = sum(s.stop - s.start for s in preprocess.output_indices_.values())
+
+        if preprocess.remainder != 'drop':
+            raise ValueError("remainder columns are not supported")
+
+        self.numeric = None    # (columns, out slice, mean, scale)
+        self.lookups = []      # (column, out slice, {raw value: encoded row})
+        for name, transformer, columns in preprocess.transformers_:
+            if name == 'remainder' or transformer == 'drop':
+                continue
+            out = preprocess.output_indices_[name]
+            if hasattr(transformer, 'mean_') and hasattr(transformer, 'scale_'):
+                mean = transformer.mean_ if transformer.mean_ is not None else np.zeros(len(columns))
+                scale = transformer.scale_ if transformer.scale_ is not None else np.ones(len(columns))
+                if self.numeric is not None:
+                    raise ValueError("more than one numeric block")
+                self.numeric = ([FEATURE_ORDER.index(c) for c in columns], out, mean, scale)
+            elif len(columns) == 1:
+                self.lookups.append((FEATURE_ORDER.index(columns[0]), out,
+                                     self._lookup_table(transformer, columns[0], self.input_domains)))
+            else:
+                raise ValueError(f"unsupported transformer: {name}")
+        if self.numeric is None:
+            raise ValueError("no numeric block found")
+
+        self._local = threading.local()
+
+    @staticmethod
+    def _lookup_table(transformer, column, input_domains):
+        import pandas as pd
+        if hasattr(transformer, 'categories_'):
+            domain = [v for v in transformer.categories_[0]]
+        elif column in input_domains:
+            domain = list(input_domains[column])
+        else:
+            raise ValueError(f"no known domain for {column} (add it to input_domains in manifest.json)")
+        encoded = np.asarray(transformer.transform(pd.DataFrame({column: domain})), dtype=np.float64)
+        return {value: encoded[i].copy() for i, value in enumerate(domain)}
+
+    def _buffer(self):
+        # One buffer per thread: FastAPI runs sync handlers concurrently
+        buf = getattr(self._local, 'buf', None)
+        if buf is None:
+            buf = self._local.buf = np.empty((1, self.width), dtype=np.float64)
+        return buf
+
+    def predict(self, *features):
+        """Return the intensity label, or None if a category is unknown."""
+        buf = self._buffer()
+        for idx, out, table in self.lookups:
+            row = table.get(features[idx])
+            if row is None:
+                return None
+            buf[0, out] = row
+
+        cols, out, mean, scale = self.numeric
+        view = buf[0, out]
+        view[:] = [features[i] for i in cols]
+        # Same in-place ops (and order) as StandardScaler.transform
+        view -= mean
+        view /= scale
+
+        class_probs = self.booster.inplace_predict(
+            buf, iteration_range=self.iteration_range,
+            missing=self.model.missing, validate_features=False
+        )
+        # Same post-processing as XGBClassifier.predict
+        if class_probs.ndim > 1 and self.model.n_classes_ != 2:
+            label = int(np.argmax(class_probs, axis=1)[0])
+        elif self.model.objective == "multi:softmax":
+            label = int(class_probs.astype(np.int32)[0])
+        else:
+            label = int(class_probs[0] > 0.5)
+        return self.classes[label]
+
+
+def compile_pipeline(pipeline, encoder, input_domains=None):
+    try:
+        return CompiledPipeline(pipeline, encoder, input_domains)
+    except Exception as e:
+        print(f"⚠️  Fast path disabled: {e}")
+        return None
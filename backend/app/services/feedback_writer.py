@@ -0,0 +1,242 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from sqlalchemy import bindparam, update
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+from app.models.health import HealthRecord
+
+FEEDBACK_QUEUED = Counter("feedback_queued", "Feedback updates accepted into the write-behind queue")
+FEEDBACK_WRITTEN = Counter("feedback_written", "Queued feedback updates written to the database")
+FEEDBACK_SYNC = Counter("feedback_sync_writes", "Feedback written synchronously", labelnames=("reason",))
+FLUSH_ERRORS = Counter("feedback_flush_errors", "Write-behind flushes that failed (rows are retried)")
+FLUSH_ROWS = Histogram("feedback_flush_rows", "Rows written per write-behind flush",
+                       (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500))
+FLUSH_LATENCY = Histogram("feedback_flush_duration_seconds", "Time to write one write-behind batch")
+
+HR = HealthRecord.__table__
+_UPDATE = update(HR).where(HR.c.id == bindparam("b_id")).values(
+    borg_rating_after=bindparam("b_borg"), mood=bindparam("b_mood"), symptoms=bindparam("b_symptoms"))
+
+
+def _write_rows(rows):
+    # One transaction, one executemany UPDATE for the whole batch (sync engine,
+    # so it works the same with DB_ASYNC on or off); the trend windows get the
+    # ratings in the same transaction
+    from app.db.session import engine
+    from app.services.trend_service import record_feedback_batch
+    with engine.begin() as conn:
+        conn.execute(_UPDATE, rows)
+        record_feedback_batch(conn, {row["b_id"]: row["b_borg"] for row in rows})
+
+
+class FeedbackWriter:
+    """
+    Write-behind queue for post-workout feedback. submit() only records the
+    update in memory (coalesced per record: the latest feedback wins) and in
+    an append-only journal; a background task writes everything pending in
+    one transaction once `flush_rows` updates are waiting or every
+    `flush_seconds`. A failed flush keeps its rows pending and retries.
+
+    Durability: stop() drains the queue on shutdown. The journal covers
+    crashes: its segments are deleted only after the rows they hold are
+    committed, and start() replays whatever is left. Lines are flushed to
+    the OS, not fsync'ed, so a power loss can still drop the last few.
+    The journal directory must belong to one process (one uvicorn worker).
+    """
+
+    def __init__(self, enabled, flush_rows, flush_seconds, max_pending, journal_dir):
+        self.enabled = enabled
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.journal_dir = Path(journal_dir) if journal_dir else None
+        self._pending = {}  # record_id -> update row; event-loop only
+        self._oldest = None
+        self._journal = None
+        self._segment = 0
+        self._closed_segments = []
+        self._wake = None
+        self._flush_lock = None
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    # --- LIFECYCLE ---
+    async def start(self):
+        if not self.enabled or self.running:
+            return
+        if self.journal_dir:
+            self.journal_dir.mkdir(parents=True, exist_ok=True)
+            replayed = await run_in_threadpool(self._replay_journal)
+            if replayed:
+                print(f"✅ Replayed {replayed} journaled feedback updates.")
+            self._open_segment()
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush() # drain; on failure the journal keeps the rows
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+            if not self._pending:
+                self._segment_path(self._segment).unlink(missing_ok=True)
+
+    # --- REQUEST PATH ---
+    def accepts(self, urgent):
+        # Urgent feedback is written inline; so is everything past max_pending
+        # (backpressure: callers slow down to the database's pace)
+        if not self.running:
+            return False
+        if urgent:
+            FEEDBACK_SYNC.labels("urgent").inc()
+            return False
+        if len(self._pending) >= self.max_pending:
+            FEEDBACK_SYNC.labels("queue_full").inc()
+            return False
+        return True
+
+    def submit(self, record_id, borg_rating, mood, symptoms):
+        row = {"b_id": record_id, "b_borg": borg_rating, "b_mood": mood, "b_symptoms": symptoms}
+        self._journal_append(row)
+        self._pending[record_id] = row
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        FEEDBACK_QUEUED.inc()
+        if len(self._pending) >= self.flush_rows:
+            self._wake.set()
+
+    async def before_direct_write(self, record_id):
+        # A synchronous write supersedes any queued update for the record, and
+        # must not be overwritten by an older one from a flush in progress
+        if self._pending.pop(record_id, None) is not None and not self._pending:
+            self._oldest = None
+        async with self._flush_lock:
+            pass
+
+    def written_directly(self, record_id, borg_rating, mood, symptoms):
+        # Journaled too, so a replay can't restore older queued values
+        if self._journal:
+            self._journal_append({"b_id": record_id, "b_borg": borg_rating,
+                                  "b_mood": mood, "b_symptoms": symptoms})
+
+    # --- BACKGROUND WRITER ---
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything pending now; returns the number of rows written."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending, self._oldest = self._pending, {}, None
+            # Every line journaled so far belongs to this batch (or was
+            # superseded), so its segments can go once the batch commits.
+            self._rotate_segment()
+            rows = list(batch.values())
+            start = time.perf_counter()
+            try:
+                await run_in_threadpool(_write_rows, rows)
+            except asyncio.CancelledError:
+                self._requeue(batch) # the UPDATE is idempotent, so rewriting is safe
+                raise
+            except Exception as e:
+                print(f"⚠️  Feedback flush failed ({len(rows)} rows kept for retry): {e}")
+                FLUSH_ERRORS.inc()
+                self._requeue(batch)
+                return 0
+            FLUSH_LATENCY.observe(time.perf_counter() - start)
+            FLUSH_ROWS.observe(len(rows))
+            FEEDBACK_WRITTEN.inc(len(rows))
+            for path in self._closed_segments:
+                path.unlink(missing_ok=True)
+            self._closed_segments = []
+            return len(rows)
+
+    def _requeue(self, batch):
+        for record_id, row in batch.items():
+            self._pending.setdefault(record_id, row) # newer feedback wins
+        if self._pending and self._oldest is None:
+            self._oldest = time.monotonic()
+
+    # --- JOURNAL ---
+    def _segment_path(self, n):
+        return self.journal_dir / f"feedback-{n:08d}.ndjson"
+
+    def _open_segment(self):
+        self._segment += 1
+        self._journal = open(self._segment_path(self._segment), "a", encoding="utf-8")
+
+    def _rotate_segment(self):
+        if not self._journal:
+            return
+        self._journal.close()
+        self._closed_segments.append(self._segment_path(self._segment))
+        self._open_segment()
+
+    def _journal_append(self, row):
+        if self._journal:
+            self._journal.write(json.dumps(row) + "\n")
+            self._journal.flush()
+
+    def _replay_journal(self):
+        segments = sorted(self.journal_dir.glob("feedback-*.ndjson"))
+        latest = {}
+        for path in segments:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue # torn last line from a crash
+                    latest[row["b_id"]] = row
+        if latest:
+            _write_rows(list(latest.values()))
+        for path in segments:
+            path.unlink()
+        return len(latest)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "oldest_pending_seconds": round(time.monotonic() - self._oldest, 3) if self._oldest else 0.0,
+            "flush_rows": self.flush_rows,
+            "flush_seconds": self.flush_seconds,
+            "journal_dir": str(self.journal_dir) if self.journal_dir else None,
+            "flush_rows_histogram": FLUSH_ROWS.snapshot(),
+        }
+
+
+feedback_writer = FeedbackWriter(settings.FEEDBACK_WRITE_BEHIND, settings.FEEDBACK_FLUSH_ROWS,
+                                 settings.FEEDBACK_FLUSH_SECONDS, settings.FEEDBACK_MAX_PENDING,
+                                 settings.FEEDBACK_JOURNAL_DIR)
+
+Gauge("feedback_queue_length", "Feedback updates waiting to be written",
+      fn=lambda: len(feedback_writer._pending))
+Gauge("feedback_queue_oldest_seconds", "Age of the oldest unwritten feedback update",
+      fn=lambda: time.monotonic() - feedback_writer._oldest if feedback_writer._oldest else 0.0)
@@ -0,0 +1,155 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import Gauge, Histogram
+
+QUEUE_DEPTH = Histogram("inference_queue_depth", "Requests waiting when a new one is enqueued",
+                        (0, 1, 2, 4, 8, 16, 32, 64, 128, 256))
+BATCH_SIZE = Histogram("inference_batch_size", "Requests coalesced into one predict call",
+                       (1, 2, 4, 8, 16, 32, 64, 128))
+
+
+def _score_rows(rows, versions=None):
+    # Runs inside the executor; in "process" mode each worker process
+    # imports (and loads) its own MLService on first use and follows the
+    # parent's (model, shadow model) versions when they change.
+    from app.services.ml_service import ml_service
+    if versions is not None:
+        ml_service.use_version(versions[0])
+        ml_service.use_shadow_version(versions[1])
+    return ml_service.predict_and_audit_rows(rows)
+
+
+class InferencePool:
+    """
+    Dedicated executor for model calls, kept apart from the default threadpool
+    that serves the blocking DB work. Requests arriving within the batch window
+    are coalesced into one predict call.
+    """
+
+    def __init__(self, kind, workers, window_ms, max_batch):
+        self.kind = kind
+        self.workers = workers
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._executor = None
+        self._queue = None
+        self._slots = None
+        self._task = None
+        self._collecting = []
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    async def start(self):
+        if self.running or self.workers <= 0:
+            return
+        if self.kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            # Fork the workers now, before other threads (e.g. the background
+            # model load) can hold a lock the children would inherit locked
+            await asyncio.get_running_loop().run_in_executor(self._executor, os.getpid)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="inference")
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Requests still queued or in the batch being collected never reach a
+        # worker; fail them rather than leave their callers waiting forever
+        pending = self._collecting
+        self._collecting = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("inference pool stopped"))
+        # In-flight batches finish; wait for them off the event loop so the
+        # other shutdown hooks keep running meanwhile
+        executor, self._executor = self._executor, None
+        await asyncio.get_running_loop().run_in_executor(None, partial(executor.shutdown, wait=True))
+
+    async def predict(self, *features):
+        if not self.running:
+            # Pool disabled (or app started without lifespan): score inline
+            rows = await run_in_threadpool(_score_rows, [features])
+            return rows[0]
+        future = asyncio.get_running_loop().create_future()
+        QUEUE_DEPTH.observe(self._queue.qsize())
+        self._queue.put_nowait((features, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Waiting for a free worker lets more requests pile into the next batch
+            await self._slots.acquire()
+            self._collecting = []
+            asyncio.create_task(self._dispatch(batch, self._executor))
+
+    async def _dispatch(self, batch, executor):
+        try:
+            BATCH_SIZE.observe(len(batch))
+            rows = [features for features, _ in batch]
+            loop = asyncio.get_running_loop()
+            try:
+                versions = None
+                if self.kind == "process":
+                    from app.services.ml_service import ml_service
+                    versions = (ml_service.version, ml_service.shadow.version)
+                results = await loop.run_in_executor(executor, _score_rows, rows, versions)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "running": self.running,
+            "batch_window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_depth_histogram": QUEUE_DEPTH.snapshot(),
+            "batch_size_histogram": BATCH_SIZE.snapshot(),
+        }
+
+
+inference_pool = InferencePool(settings.INFERENCE_EXECUTOR, settings.INFERENCE_WORKERS,
+                               settings.INFERENCE_BATCH_WINDOW_MS, settings.INFERENCE_MAX_BATCH)
+
+Gauge("inference_queue_length", "Requests currently waiting for the inference pool",
+      fn=lambda: inference_pool._queue.qsize() if inference_pool._queue else 0)
@@ -1,7 +1,13 @@
-import joblib
-import pandas as pd
-import numpy as np
+import threading
+import time
+from contextlib import nullcontext
 from pathlib import Path
+from app.core.config import settings
+from app.core.instrumentation import STAGE_LATENCY, stage
+from app.core.metrics import Gauge
+from app.services.model_registry import EMPTY_BUNDLE, ModelRegistry
+from app.services.prediction_cache import PredictionCache
+from app.services.shadow_service import ShadowEvaluator
 
 # --- FIX STARTS HERE ---
 # 1. Get the directory where THIS file (ml_service.py) lives: .../backend/app/services
@@ -9,47 +15,253 @@ BASE_DIR = Path(__file__).resolve().parent
 
 # 2. Go up one level to 'app', then down into 'ml_models'
 MODEL_DIR = BASE_DIR.parent / "ml_models"
+# Versioned artifacts are listed in MODEL_DIR / "manifest.json"
 
-MODEL_PATH = MODEL_DIR / "xgb_pipeline.pkl"
-ENCODER_PATH = MODEL_DIR / "label_encoder.pkl"
+# Real YouTube Links
+YOUTUBE_MAP = {
+    "Low": "https://www.youtube.com/watch?v=ipNvN-GHhe0",      # Joe Wicks 15 Min Low Impact
+    "Moderate": "https://www.youtube.com/watch?v=rZDzP11ePt8", # FitByMik 20 Min Cardio
+    "High": "https://www.youtube.com/watch?v=hLVh5IBsCxk"      # GrowingAnnanas HIIT
+}
+
+# Calories Calculation (MET value x weight x session length factor)
+METS = {"Low": 3.5, "Moderate": 5.0, "High": 8.0}
+
+SAFETY_STAGE = STAGE_LATENCY.labels("ml", "safety_rules")
+
+# Post-workout symptoms that flag the session as urgent
+URGENT_SYMPTOMS = ("Chest Pain", "Dizziness")
+
+def reports_urgent_symptoms(symptoms):
+    return any(s in (symptoms or "") for s in URGENT_SYMPTOMS)
+
+def _untimed(component, name):
+    return nullcontext()
+
+def estimate_calories(intensity, weight):
+    return round(METS.get(intensity, 3.5) * weight * 0.33, 1)
 
 class MLService:
     def __init__(self):
-        try:
-            self.pipeline = joblib.load(MODEL_PATH)
-            self.encoder = joblib.load(ENCODER_PATH)
-            print("✅ ML Models loaded successfully.")
-        except Exception as e:
-            print(f"⚠️  ML Load Error: {e}")
-            self.pipeline = None
+        self.cache = PredictionCache(settings.PREDICTION_CACHE_SIZE,
+                                     settings.PREDICTION_CACHE_TTL_SECONDS)
+        self.registry = ModelRegistry(MODEL_DIR)
+        # Every prediction reads self.bundle exactly once, so swapping it is
+        # atomic: in-flight requests finish on the bundle they started with.
+        self.bundle = EMPTY_BUNDLE
+        self._swap_lock = threading.RLock()
+        self._manifest_mtime = None
+        # Loading is deferred (see ensure_loaded) so importing this module
+        # doesn't pull in pandas/sklearn/xgboost or unpickle anything.
+        # state: "not_loaded" -> "loading" -> "ready" | "failed"
+        self.state = "not_loaded"
+        self.load_error = None
+        self.load_seconds = None
+        # Candidate model scored in the background on live traffic
+        self.shadow = ShadowEvaluator(self.score_rows, settings.SHADOW_MAX_PENDING)
+
+    # Read-only views of the active bundle
+    @property
+    def version(self): return self.bundle.version
+    @property
+    def pipeline(self): return self.bundle.pipeline
+    @property
+    def encoder(self): return self.bundle.encoder
+    @property
+    def fast_path(self): return self.bundle.fast_path
+
+    def ensure_loaded(self):
+        """Return the active bundle, loading it on first use."""
+        if self.state not in ("ready", "failed"):
+            with self._swap_lock:
+                if self.state not in ("ready", "failed"):
+                    self.load_models()
+                    if settings.SHADOW_MODEL_VERSION and not self.shadow.bundle:
+                        try:
+                            self.start_shadow(settings.SHADOW_MODEL_VERSION)
+                        except Exception as e:
+                            print(f"⚠️  Shadow Load Error: {e}")
+        return self.bundle
+
+    def status(self):
+        return {
+            "state": self.state,
+            "version": self.version,
+            "load_seconds": self.load_seconds,
+            "error": self.load_error,
+        }
+
+    def load_models(self, version=None):
+        """Load `version` (default: the manifest's active one) and swap it in."""
+        with self._swap_lock:
+            if self.state != "ready":
+                self.state = "loading"
+            start = time.perf_counter()
+            try:
+                self._manifest_mtime = self.registry.manifest_mtime()
+                bundle = self.registry.load(version or self.registry.active_version())
+            except Exception as e:
+                print(f"⚠️  ML Load Error: {e}")
+                if self.state != "ready":
+                    # Keep serving the rule-based default instead of retrying per request
+                    self.state, self.load_error = "failed", str(e)
+                return False
+            self.bundle = bundle
+            # Keys carry the version, so this only frees the old entries
+            self.cache.clear()
+            self.state, self.load_error = "ready", None
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            print(f"✅ ML Models loaded successfully (version {bundle.version}, {self.load_seconds}s).")
+            return True
+
+    def activate(self, version):
+        """Load `version`, make it the active one in the manifest, then swap."""
+        bundle = self.registry.load(version) # raises before anything changes
+        with self._swap_lock:
+            self.registry.set_active(version)
+            self._manifest_mtime = self.registry.manifest_mtime()
+            self.bundle = bundle
+            self.cache.clear()
+            self.state, self.load_error = "ready", None
+        print(f"✅ Activated model version {version}.")
+        return bundle
+
+    def start_shadow(self, version):
+        """Score live traffic with `version` as well, without serving it."""
+        self.shadow.start(self.registry.load(version))
+
+    def stop_shadow(self, wait=False):
+        self.shadow.stop(wait)
+
+    def use_version(self, version):
+        # Inference worker processes follow the version the parent scored with
+        if version is not None and version != self.version:
+            self.load_models(version)
+
+    def use_shadow_version(self, version):
+        # ...and the parent's shadow model (None: shadow mode off)
+        if version != self.shadow.version:
+            if version is None:
+                self.stop_shadow()
+            else:
+                self.start_shadow(version)
+
+    def reload_if_changed(self):
+        # Picks up activations made by other uvicorn workers (shared manifest)
+        if self.state != "ready":
+            return False # the first load reads the manifest anyway
+        mtime = self.registry.manifest_mtime()
+        if mtime is None or mtime == self._manifest_mtime:
+            return False
+        self._manifest_mtime = mtime
+        if self.registry.active_version() == self.version:
+            return False
+        return self.load_models()
+
+    def _predict_label_pipeline(self, bundle, age, gender, weight, rhr, bp_sys, bp_dia,
+                                pulse_before, resp_before, borg_before, conditions, timer=stage):
+        import pandas as pd
+        with timer("ml", "build_frame"):
+            input_data = pd.DataFrame([{
+                'Age': age,
+                'Gender': gender,
+                'Weight (kg)': weight,
+                'Resting Heart Rate (BPM)': rhr,
+                'BPB_Systolic': bp_sys,
+                'BPB_Diastolic': bp_dia,
+                'Pre-existing Conditions': conditions,
+                'Borg Scale Rating (Before)': borg_before,
+                'Pulse Rate Before': pulse_before,
+                'Respiratory Rate Before': resp_before
+            }])
+        with timer("ml", "predict"):
+            pred_encoded = bundle.pipeline.predict(input_data)
+        with timer("ml", "inverse_transform"):
+            return bundle.encoder.inverse_transform(pred_encoded)[0]
+
+    def _predict_label(self, bundle, *features, timer=stage):
+        # Fast path first; unknown categories fall back to the full pipeline
+        if bundle.fast_path:
+            with timer("ml", "fast_path"):
+                label = bundle.fast_path.predict(*features)
+            if label is not None:
+                return label
+        return self._predict_label_pipeline(bundle, *features, timer=timer)
 
     def predict_and_audit(self, age, gender, weight, rhr, bp_sys, bp_dia, 
                           pulse_before, resp_before, borg_before, conditions):
-        
-        # 1. Prepare Data
-        input_data = pd.DataFrame([{
-            'Age': age,
-            'Gender': gender,
-            'Weight (kg)': weight,
-            'Resting Heart Rate (BPM)': rhr,
-            'BPB_Systolic': bp_sys,
-            'BPB_Diastolic': bp_dia,
-            'Pre-existing Conditions': conditions,
-            'Borg Scale Rating (Before)': borg_before,
-            'Pulse Rate Before': pulse_before,
-            'Respiratory Rate Before': resp_before
-        }])
-
-        # 2. Get ML Prediction
+        bundle = self.ensure_loaded()
+        features = (age, gender, weight, rhr, bp_sys, bp_dia,
+                    pulse_before, resp_before, borg_before, conditions)
+        key = (bundle.version,) + features
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        (result,), cacheable = self._score_live(bundle, [features])
+        if cacheable:
+            self.cache.put(key, result)
+        return result
+
+    def predict_and_audit_rows(self, rows):
+        # Cache-aware scoring of many feature tuples (used by the inference pool)
+        bundle = self.ensure_loaded()
+        keys = [(bundle.version,) + tuple(row) for row in rows]
+        results = [self.cache.get(key) for key in keys]
+        misses = [i for i, r in enumerate(results) if r is None]
+        if misses:
+            scored, cacheable = self._score_live(bundle, [tuple(rows[i]) for i in misses])
+            for i, result in zip(misses, scored):
+                results[i] = result
+                if cacheable:
+                    self.cache.put(keys[i], result)
+        return results
+
+    def _score(self, bundle, rows, instrument=True):
+        # Model + safety layer for feature tuples; no cache, no shadow.
+        # instrument=False keeps background work out of the request-path
+        # stage timings.
+        if len(rows) == 1:
+            # A lone row is cheaper on the single-row fast path
+            result, cacheable = self._predict_and_audit(bundle, *rows[0], instrument=instrument)
+            return [result], cacheable
+        return self._predict_and_audit_many(bundle, *zip(*rows), instrument=instrument)
+
+    def score_rows(self, bundle, rows):
+        """
+        Score feature tuples with `bundle` outside the request path (shadow
+        evaluation, offline rescoring): no cache, no shadow, no stage timings.
+        Returns (results, ok); ok is False when the model call failed and the
+        results carry the default intensity.
+        """
+        return self._score(bundle, rows, instrument=False)
+
+    def _score_live(self, bundle, rows):
+        # Cache hits are not shadowed: they repeat an input already compared
+        if not self.shadow.bundle:
+            return self._score(bundle, rows)
+        start = time.perf_counter()
+        results, cacheable = self._score(bundle, rows)
+        production_ms = (time.perf_counter() - start) * 1000 / len(rows)
+        self.shadow.submit(bundle.version, rows, results, production_ms)
+        return results, cacheable
+
+    def _predict_and_audit(self, bundle, age, gender, weight, rhr, bp_sys, bp_dia,
+                           pulse_before, resp_before, borg_before, conditions, instrument=True):
+
+        # 1-2. Get ML Prediction
         prediction = "Moderate" # Default
-        if self.pipeline:
+        cacheable = True # a failed prediction is never cached
+        if bundle.pipeline:
             try:
-                pred_encoded = self.pipeline.predict(input_data)
-                prediction = self.encoder.inverse_transform(pred_encoded)[0]
+                prediction = self._predict_label(bundle, age, gender, weight, rhr, bp_sys, bp_dia,
+                                                 pulse_before, resp_before, borg_before, conditions,
+                                                 timer=stage if instrument else _untimed)
             except Exception as e:
                 print(f"Prediction Error: {e}")
+                cacheable = False
 
         # 3. SAFETY LAYER (UPDATED: Checks vitals INDEPENDENTLY)
+        safety_start = time.perf_counter()
         mhr = 220 - age
         target_min = int(0.50 * mhr)
         target_max = int(0.85 * mhr)
@@ -64,13 +276,8 @@ class MLService:
         if prediction == "High":
             if age > 65 or rhr > 90:
                 prediction = "Moderate" # Downgrade for safety (but not urgent)
-
-        # 4. Real YouTube Links
-        youtube_map = {
-            "Low": "https://www.youtube.com/watch?v=ipNvN-GHhe0",      # Joe Wicks 15 Min Low Impact
-            "Moderate": "https://www.youtube.com/watch?v=rZDzP11ePt8", # FitByMik 20 Min Cardio
-            "High": "https://www.youtube.com/watch?v=hLVh5IBsCxk"      # GrowingAnnanas HIIT
-        }
+        if instrument:
+            SAFETY_STAGE.observe(time.perf_counter() - safety_start)
 
         return {
             "predicted_intensity": prediction,
@@ -78,7 +285,106 @@ class MLService:
             "target_hr_min": target_min,
             "target_hr_max": target_max,
             "is_urgent": is_urgent,
-            "youtube_link": youtube_map.get(prediction, "")
-        }
+            "youtube_link": YOUTUBE_MAP.get(prediction, ""),
+            "model_version": bundle.version
+        }, cacheable
+
+    def predict_and_audit_many(self, ages, genders, weights, rhrs, bp_sys, bp_dia,
+                               pulse_before, resp_before, borg_before, conditions):
+        # Same contract as predict_and_audit, but every argument is a sequence
+        # (one entry per session) and the result is a list of dicts.
+        rows = list(zip(ages, genders, weights, rhrs, bp_sys, bp_dia,
+                        pulse_before, resp_before, borg_before, conditions))
+        if not rows:
+            return []
+        results, _ = self._score_live(self.ensure_loaded(), rows)
+        return results
+
+    def _predict_and_audit_many(self, bundle, ages, genders, weights, rhrs, bp_sys, bp_dia,
+                                pulse_before, resp_before, borg_before, conditions, instrument=True):
+        import numpy as np
+        import pandas as pd
+        timer = stage if instrument else _untimed
+
+        # 1. Prepare Data (one frame for the whole batch)
+        with timer("ml", "build_frame"):
+            input_data = pd.DataFrame({
+                'Age': ages,
+                'Gender': genders,
+                'Weight (kg)': weights,
+                'Resting Heart Rate (BPM)': rhrs,
+                'BPB_Systolic': bp_sys,
+                'BPB_Diastolic': bp_dia,
+                'Pre-existing Conditions': conditions,
+                'Borg Scale Rating (Before)': borg_before,
+                'Pulse Rate Before': pulse_before,
+                'Respiratory Rate Before': resp_before
+            })
+        n = len(input_data)
+        if n == 0:
+            return [], True
+
+        # 2. Get ML Prediction (single predict call)
+        prediction = np.full(n, "Moderate", dtype=object) # Default
+        cacheable = True
+        if bundle.pipeline:
+            try:
+                with timer("ml", "predict"):
+                    pred_encoded = bundle.pipeline.predict(input_data)
+                with timer("ml", "inverse_transform"):
+                    prediction = np.asarray(bundle.encoder.inverse_transform(pred_encoded), dtype=object)
+            except Exception as e:
+                print(f"Prediction Error: {e}")
+                cacheable = False
+
+        # 3. SAFETY LAYER (vectorized, same rules as predict_and_audit)
+        safety_start = time.perf_counter()
+        age = input_data['Age'].to_numpy()
+        rhr = input_data['Resting Heart Rate (BPM)'].to_numpy()
+        sys_ = input_data['BPB_Systolic'].to_numpy()
+        dia = input_data['BPB_Diastolic'].to_numpy()
+
+        mhr = 220 - age
+        target_min = (0.50 * mhr).astype(int)
+        target_max = (0.85 * mhr).astype(int)
+
+        # RULE A: Absolute Contraindications
+        is_urgent = (rhr > 100) | (sys_ > 160) | (dia > 100)
+        prediction = np.where(is_urgent, "Low", prediction)
+
+        # RULE B: High Intensity Safety Check
+        downgrade = (prediction == "High") & ((age > 65) | (rhr > 90))
+        prediction = np.where(downgrade, "Moderate", prediction)
+        if instrument:
+            SAFETY_STAGE.observe(time.perf_counter() - safety_start)
+
+        return [
+            {
+                "predicted_intensity": str(prediction[i]),
+                "mhr": int(mhr[i]),
+                "target_hr_min": int(target_min[i]),
+                "target_hr_max": int(target_max[i]),
+                "is_urgent": bool(is_urgent[i]),
+                "youtube_link": YOUTUBE_MAP.get(str(prediction[i]), ""),
+                "model_version": bundle.version
+            }
+            for i in range(n)
+        ], cacheable
+
+ml_service = MLService()
 
-ml_service = MLService()
\ No newline at end of file
+# --- SCRAPE-TIME GAUGES ---
+Gauge("model_info", "1 for the loaded model version and its load state",
+      labelnames=("version", "state"),
+      fn=lambda: {(ml_service.version or "none", ml_service.state): 1})
+Gauge("model_load_seconds", "Duration of the last successful model load",
+      fn=lambda: ml_service.load_seconds)
+Gauge("prediction_cache_entries", "Entries in the prediction cache",
+      fn=lambda: ml_service.cache.stats()["size"])
+Gauge("prediction_cache_hit_ratio", "Prediction cache hits / lookups",
+      fn=lambda: ml_service.cache.stats()["hit_rate"])
+Gauge("shadow_model_info", "1 for the model version being shadowed",
+      labelnames=("version",),
+      fn=lambda: {(ml_service.shadow.version,): 1} if ml_service.shadow.version else {})
+Gauge("shadow_jobs_dropped", "Shadow jobs dropped because the worker was behind",
+      fn=lambda: ml_service.shadow.dropped)
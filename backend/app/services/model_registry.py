@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+# joblib, numpy and the pickled sklearn/xgboost classes are imported on the
+# first load() so importing this module stays cheap
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ModelBundle:
+    """One pipeline/encoder pair plus everything derived from it."""
+
+    def __init__(self, version, pipeline, encoder, input_domains=None):
+        self.version = version
+        self.pipeline = pipeline
+        self.encoder = encoder
+        # {pipeline column: every value the API sends}, for unfitted categorical steps
+        self.input_domains = input_domains or {}
+        self.fast_path = None
+        if pipeline is not None:
+            from app.services.fast_path import compile_pipeline
+            # Zero-pandas single-row path, built once from the fitted steps
+            self.fast_path = compile_pipeline(pipeline, encoder, self.input_domains)
+
+
+EMPTY_BUNDLE = ModelBundle(None, None, None)
+
+
+def _alias_pickled_classes():
+    # The artifacts name their custom transformers as __main__.<class>
+    # (they were pickled from a training script); expose ours under that
+    # name in whichever program is running
+    import __main__
+    from app.services.transformers import PICKLED_MAIN_CLASSES
+
+    for name, cls in PICKLED_MAIN_CLASSES.items():
+        if not hasattr(__main__, name):
+            setattr(__main__, name, cls)
+
+
+class ModelRegistry:
+    """
+    Versioned artifacts under app/ml_models, described by manifest.json:
+
+        {"active": "v1",
+         "versions": {"v1": {"pipeline": "xgb_pipeline.pkl",
+                             "encoder": "label_encoder.pkl",
+                             "input_domains": {"Pre-existing Conditions": [...]}, ...}}}
+
+    Artifact paths are relative to the models directory. input_domains lists
+    the values of categorical columns whose transformer has no fitted
+    categories (the fast path needs them; see fast_path.CompiledPipeline).
+    """
+
+    def __init__(self, model_dir: Path):
+        self.model_dir = Path(model_dir)
+        self.manifest_path = self.model_dir / MANIFEST_NAME
+
+    def manifest(self):
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def manifest_mtime(self):
+        try:
+            return self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def active_version(self):
+        return self.manifest()["active"]
+
+    def load(self, version) -> ModelBundle:
+        import joblib
+        _alias_pickled_classes()
+
+        entry = self.manifest()["versions"].get(version)
+        if entry is None:
+            raise KeyError(f"Unknown model version: {version}")
+        # mmap_mode only maps the NumPy arrays stored uncompressed in the
+        # artifact (scaler/encoder arrays: a few KB). The XGBoost booster,
+        # almost all of the pipeline's size, is pickled as an opaque byte blob
+        # and deserialized into every process that loads it, so each
+        # inference/rescore worker process still holds its own booster.
+        pipeline = joblib.load(self.model_dir / entry["pipeline"], mmap_mode="r")
+        encoder = joblib.load(self.model_dir / entry["encoder"], mmap_mode="r")
+        return ModelBundle(version, pipeline, encoder, entry.get("input_domains"))
+
+    def _write_manifest(self, manifest):
+        # Write-then-rename so readers never see a half-written manifest
+        fd, tmp = tempfile.mkstemp(dir=self.model_dir, suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+        os.replace(tmp, self.manifest_path)
+
+    def set_active(self, version):
+        manifest = self.manifest()
+        if version not in manifest["versions"]:
+            raise KeyError(f"Unknown model version: {version}")
+        manifest["active"] = version
+        self._write_manifest(manifest)
+
+    def register(self, version, pipeline_file, encoder_file, description="", input_domains=None):
+        manifest = self.manifest()
+        if version in manifest["versions"]:
+            raise ValueError(f"Model version already registered: {version}")
+        target = self.model_dir / version
+        target.mkdir(parents=True, exist_ok=False)
+        shutil.copy2(pipeline_file, target / Path(pipeline_file).name)
+        shutil.copy2(encoder_file, target / Path(encoder_file).name)
+        manifest["versions"][version] = {
+            "pipeline": f"{version}/{Path(pipeline_file).name}",
+            "encoder": f"{version}/{Path(encoder_file).name}",
+            "description": description,
+            "input_domains": input_domains or {},
+            "registered_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self._write_manifest(manifest)
@@ -0,0 +1,214 @@
+"""
+Offline re-scoring of HealthRecord history with a registry model version and
+the current safety rules, to see how prescriptions would shift.
+
+The parent process walks the table in id order (keyset chunks, each read in
+its own short transaction) and hands every chunk to a worker process, which
+rebuilds the feature frame from the stored vitals plus the patient's current
+User.age/gender and scores it with one vectorized predict call. The baseline
+is what the stored model gave (model_intensity / model_urgent), not the live
+prescription: doctor overrides and symptom escalations are counted as
+`adjusted` instead of as model drift, and older rows whose model output is
+unknown are `excluded`. Results are
+written in chunk order, in the same transaction as the run's checkpoint
+(last_record_id), so an interrupted run resumes exactly where it stopped.
+At most 2 x workers chunks are in flight, which bounds memory regardless
+of table size.
+"""
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select, update
+
+from app.models.health import HealthRecord
+from app.models.rescore import RescoreResult, RescoreRun
+from app.models.user import User
+
+HR = HealthRecord.__table__
+USERS = User.__table__
+RUNS = RescoreRun.__table__
+RESULTS = RescoreResult.__table__
+
+STORED_COLUMNS = ["id", "patient_id", "model_version", "predicted_intensity", "is_urgent",
+                  "model_intensity", "model_urgent", "target_hr_min", "target_hr_max"]
+# Feature tuple order of MLService.score_rows (after age, gender)
+FEATURE_COLUMNS = ["weight", "resting_hr", "bp_systolic", "bp_diastolic", "pulse_rate_before",
+                   "respiratory_rate_before", "borg_rating_before", "conditions"]
+
+_bundle = None  # the run's model, loaded once per worker process
+
+
+def _init_worker(version):
+    global _bundle
+    from app.services.ml_service import ml_service
+    _bundle = ml_service.registry.load(version)
+
+
+def _score_chunk(rows):
+    from app.services.ml_service import ml_service
+    results, ok = ml_service.score_rows(_bundle, rows)
+    if not ok:
+        # The live path falls back to a default intensity; a comparison must not
+        raise RuntimeError("model predict failed for this chunk")
+    return [(r["predicted_intensity"], r["is_urgent"], r["target_hr_min"], r["target_hr_max"])
+            for r in results]
+
+
+def _read_chunk(engine, after_id, upto_id, size):
+    statement = (
+        select(*[HR.c[c] for c in STORED_COLUMNS + FEATURE_COLUMNS], USERS.c.age, USERS.c.gender)
+        .join(USERS, USERS.c.id == HR.c.patient_id)
+        .where(HR.c.id > after_id, HR.c.id <= upto_id)
+        .order_by(HR.c.id)
+        .limit(size)
+    )
+    # A short transaction per chunk: SQLite without WAL can't commit results
+    # while a long-lived read transaction is open
+    with engine.connect() as conn:
+        return conn.execute(statement).all()
+
+
+def _features(rows):
+    return [(r.age, r.gender, *[getattr(r, c) for c in FEATURE_COLUMNS]) for r in rows]
+
+
+def _write_chunk(engine, run, last_id, rows, scored, skipped, excluded):
+    results, changed, adjusted = [], 0, 0
+    for r, (intensity, urgent, hr_min, hr_max) in zip(rows, scored):
+        is_changed = intensity != r.model_intensity or urgent != r.model_urgent
+        is_adjusted = r.predicted_intensity != r.model_intensity or r.is_urgent != r.model_urgent
+        changed += is_changed
+        adjusted += is_adjusted
+        if is_changed or not run.changed_only:
+            results.append({
+                "run_id": run.id, "record_id": r.id, "patient_id": r.patient_id,
+                "stored_model_version": r.model_version,
+                "stored_intensity": r.model_intensity, "rescored_intensity": intensity,
+                "stored_urgent": r.model_urgent, "rescored_urgent": urgent,
+                "stored_target_hr_min": r.target_hr_min, "stored_target_hr_max": r.target_hr_max,
+                "rescored_target_hr_min": hr_min, "rescored_target_hr_max": hr_max,
+                "changed": is_changed, "adjusted": is_adjusted,
+            })
+    with engine.begin() as conn:
+        if results:
+            conn.execute(insert(RESULTS), results)
+        conn.execute(update(RUNS).where(RUNS.c.id == run.id).values(
+            last_record_id=last_id,
+            scored=RUNS.c.scored + len(rows),
+            changed=RUNS.c.changed + changed,
+            skipped=RUNS.c.skipped + skipped,
+            adjusted=RUNS.c.adjusted + adjusted,
+            excluded=RUNS.c.excluded + excluded,
+        ))
+
+
+def create_run(engine, version, chunk_size, changed_only=False):
+    with engine.begin() as conn:
+        upto = conn.execute(select(func.max(HR.c.id))).scalar() or 0
+        result = conn.execute(insert(RUNS).values(
+            model_version=version, status="running", started_at=datetime.now(timezone.utc),
+            chunk_size=chunk_size, changed_only=changed_only, upto_record_id=upto,
+            last_record_id=0, scored=0, changed=0, skipped=0, adjusted=0, excluded=0,
+        ))
+    return result.inserted_primary_key[0]
+
+
+def execute_run(engine, run_id, workers, progress=None):
+    """Score the run's remaining records; resumable after any failure."""
+    with engine.begin() as conn:
+        run = conn.execute(select(RUNS).where(RUNS.c.id == run_id)).one()
+        if run.status == "done":
+            return run
+        conn.execute(update(RUNS).where(RUNS.c.id == run_id).values(status="running", error=None))
+
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(run.model_version,))
+    else:
+        _init_worker(run.model_version)
+    max_inflight = max(1, 2 * workers)
+
+    inflight = deque()
+    after, exhausted = run.last_record_id, False
+    start, done = time.perf_counter(), 0
+    try:
+        while True:
+            # 1. Keep the workers busy while the parent writes finished chunks
+            while not exhausted and len(inflight) < max_inflight:
+                rows = _read_chunk(engine, after, run.upto_record_id, run.chunk_size)
+                if not rows:
+                    exhausted = True
+                    break
+                after = rows[-1].id
+                profiled = [r for r in rows if r.age and r.gender]
+                scorable = [r for r in profiled if r.model_intensity is not None]
+                if executor and scorable:
+                    future = executor.submit(_score_chunk, _features(scorable))
+                else:
+                    future = Future()
+                    future.set_result(_score_chunk(_features(scorable)) if scorable else [])
+                inflight.append((after, scorable, len(rows) - len(profiled),
+                                 len(profiled) - len(scorable), future))
+            if not inflight:
+                break
+
+            # 2. Write the oldest chunk (in order, so the checkpoint only moves forward)
+            last_id, scorable, skipped, excluded, future = inflight.popleft()
+            _write_chunk(engine, run, last_id, scorable, future.result(), skipped, excluded)
+            done += len(scorable) + skipped + excluded
+            if progress:
+                progress(last_id, run.upto_record_id, done, time.perf_counter() - start)
+    except BaseException as e:
+        with engine.begin() as conn:
+            conn.execute(update(RUNS).where(RUNS.c.id == run_id).values(
+                status="failed", error=str(e) or type(e).__name__))
+        raise
+    finally:
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    with engine.begin() as conn:
+        conn.execute(update(RUNS).where(RUNS.c.id == run_id).values(
+            status="done", finished_at=datetime.now(timezone.utc)))
+        return conn.execute(select(RUNS).where(RUNS.c.id == run_id)).one()
+
+
+def summarize_run(conn, run_id):
+    run = conn.execute(select(RUNS).where(RUNS.c.id == run_id)).first()
+    if run is None:
+        return None
+    transitions = conn.execute(
+        select(RESULTS.c.stored_intensity, RESULTS.c.rescored_intensity, func.count())
+        .where(RESULTS.c.run_id == run_id)
+        .group_by(RESULTS.c.stored_intensity, RESULTS.c.rescored_intensity)
+    ).all()
+    urgent_changes = conn.execute(
+        select(RESULTS.c.stored_urgent, func.count())
+        .where(RESULTS.c.run_id == run_id, RESULTS.c.stored_urgent != RESULTS.c.rescored_urgent)
+        .group_by(RESULTS.c.stored_urgent)
+    ).all()
+    urgent = dict(urgent_changes)
+    return {
+        "run_id": run.id,
+        "model_version": run.model_version,
+        "status": run.status,
+        "error": run.error,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "progress": {"last_record_id": run.last_record_id, "upto_record_id": run.upto_record_id},
+        "scored": run.scored,
+        "skipped": run.skipped,
+        # Prescriptions changed by a doctor override / symptom escalation:
+        # compared on the model's own output, so not counted as drift
+        "adjusted": run.adjusted,
+        "excluded": run.excluded,
+        "changed": run.changed,
+        "changed_rate": round(run.changed / run.scored, 4) if run.scored else 0.0,
+        "newly_urgent": urgent.get(False, 0),
+        "no_longer_urgent": urgent.get(True, 0),
+        # stored model -> rescored intensity counts (changed rows only for --changed-only runs)
+        "transitions": {f"{a}->{b}": n for a, b, n in transitions},
+    }
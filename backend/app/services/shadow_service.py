@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app.core.metrics import Histogram
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250)
+PRODUCTION_LATENCY = Histogram("shadow_production_model_ms", "Production model time per row (shadowed calls)",
+                               LATENCY_BUCKETS)
+SHADOW_LATENCY = Histogram("shadow_candidate_model_ms", "Shadow model time per row", LATENCY_BUCKETS)
+
+
+def _lower_priority():
+    # Linux schedules threads individually: at nice 19 the shadow worker only
+    # gets CPU the request path isn't using (it drops jobs instead of
+    # competing when the box is saturated)
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class ShadowEvaluator:
+    """
+    Scores live traffic with a candidate model on its own worker thread.
+
+    The request path only hands over the rows it already scored (submit is a
+    counter check and a queue put); scoring the candidate and writing the
+    ShadowResult rows happen entirely in the background. When the worker
+    falls behind by more than `max_pending` jobs, new jobs are dropped
+    rather than queued. Rows are buffered and inserted `flush_rows` at a
+    time to keep commits off the hot loop; a timer flushes whatever is left
+    `flush_seconds` after the first buffered row, so a quiet period never
+    strands results, and stop() writes the remainder.
+    """
+
+    def __init__(self, score, max_pending, flush_rows=200, flush_seconds=5.0):
+        self._score = score  # MLService.score_rows(bundle, rows) -> (results, ok)
+        self.max_pending = max_pending
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._buffer = []  # only touched on the worker thread
+        self._flush_timer = None
+        self.bundle = None
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def version(self):
+        bundle = self.bundle
+        return bundle.version if bundle else None
+
+    def start(self, bundle):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow",
+                                                    initializer=_lower_priority)
+            self.bundle = bundle
+        print(f"✅ Shadow mode on: scoring live traffic with model version {bundle.version}.")
+
+    def stop(self, wait=False):
+        with self._lock:
+            self.bundle = None
+            executor, self._executor = self._executor, None
+            timer, self._flush_timer = self._flush_timer, None
+        if timer:
+            timer.cancel()
+        if executor:
+            executor.submit(self._flush)
+            executor.shutdown(wait=wait) # queued jobs still finish
+            print("✅ Shadow mode off.")
+
+    def flush(self):
+        """Write buffered results now (runs after any queued jobs)."""
+        executor = self._executor
+        if executor:
+            executor.submit(self._flush).result()
+
+    def submit(self, production_version, rows, results, production_ms):
+        bundle = self.bundle
+        if bundle is None:
+            return
+        with self._lock:
+            if self._executor is None or self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+            self.submitted += 1
+            executor = self._executor
+        executor.submit(self._evaluate, bundle, production_version, rows, results, production_ms)
+
+    def _evaluate(self, bundle, production_version, rows, results, production_ms):
+        try:
+            start = time.perf_counter()
+            shadow_results, _ = self._score(bundle, rows)
+            shadow_ms = (time.perf_counter() - start) * 1000 / len(rows)
+
+            now = datetime.now(timezone.utc)
+            for live, shadow in zip(results, shadow_results):
+                PRODUCTION_LATENCY.observe(production_ms)
+                SHADOW_LATENCY.observe(shadow_ms)
+                self._buffer.append({
+                    "timestamp": now,
+                    "production_version": production_version,
+                    "shadow_version": bundle.version,
+                    "production_intensity": live["predicted_intensity"],
+                    "shadow_intensity": shadow["predicted_intensity"],
+                    "agree": live["predicted_intensity"] == shadow["predicted_intensity"],
+                    "production_ms": production_ms,
+                    "shadow_ms": shadow_ms,
+                })
+            if len(self._buffer) >= self.flush_rows:
+                self._flush()
+            elif self._buffer:
+                self._arm_flush_timer()
+        except Exception as e:
+            print(f"⚠️  Shadow evaluation error: {e}")
+            with self._lock:
+                self.errors += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _arm_flush_timer(self):
+        with self._lock:
+            if self._flush_timer is not None:
+                return
+            timer = self._flush_timer = threading.Timer(self.flush_seconds, self._flush_due)
+        timer.daemon = True
+        timer.start()
+
+    def _flush_due(self):
+        # Timer thread: hand the flush to the worker, which owns the buffer
+        with self._lock:
+            self._flush_timer = None
+            executor = self._executor
+        if executor:
+            try:
+                executor.submit(self._flush)
+            except RuntimeError:
+                pass # stopped meanwhile; stop() queued its own flush
+
+    def _flush(self):
+        from sqlalchemy import insert
+        from app.db.session import engine
+        from app.models.shadow import ShadowResult
+
+        values, self._buffer = self._buffer, []
+        if not values:
+            return
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(ShadowResult.__table__), values)
+        except Exception as e:
+            print(f"⚠️  Shadow write error ({len(values)} rows lost): {e}")
+            with self._lock:
+                self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending
+        return {
+            "active": self.bundle is not None,
+            "version": self.version,
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "buffered": len(self._buffer),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "production_ms_histogram": PRODUCTION_LATENCY.snapshot(),
+            "shadow_ms_histogram": SHADOW_LATENCY.snapshot(),
+        }
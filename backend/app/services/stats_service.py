@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import timezone
+
+from sqlalchemy import case, delete, func, insert, select, update
+
+from app.db.session import DB_BACKEND
+from app.models.health import HealthRecord
+from app.models.stats import PatientStats
+
+STATS = PatientStats.__table__
+
+
+def _utc_date(ts):
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.date()
+
+
+def _upsert(values, first_date):
+    # One statement per patient: insert the first row, or fold the new
+    # sessions into the existing aggregates.
+    if DB_BACKEND == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    stmt = dialect_insert(STATS).values(**values)
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[STATS.c.patient_id],
+        set_={
+            "sessions": STATS.c.sessions + new.sessions,
+            "total_calories": STATS.c.total_calories + new.total_calories,
+            # Sessions arrive in time order, so the only day that can already
+            # be counted is the patient's last active one.
+            "active_days": STATS.c.active_days + new.active_days - case(
+                (STATS.c.last_active_date == first_date, 1), else_=0
+            ),
+            "last_active_date": case(
+                (STATS.c.last_active_date.is_(None) | (STATS.c.last_active_date < new.last_active_date),
+                 new.last_active_date),
+                else_=STATS.c.last_active_date
+            ),
+            "last_session_at": case(
+                (STATS.c.last_session_at.is_(None) | (STATS.c.last_session_at < new.last_session_at),
+                 new.last_session_at),
+                else_=STATS.c.last_session_at
+            ),
+        },
+    )
+
+
+async def record_sessions(db, records):
+    """Fold newly created HealthRecords into PatientStats (caller commits)."""
+    by_patient = defaultdict(list)
+    for record in records:
+        by_patient[record.patient_id].append(record)
+
+    for patient_id, rows in by_patient.items():
+        dates = sorted({_utc_date(r.timestamp) for r in rows})
+        values = {
+            "patient_id": patient_id,
+            "sessions": len(rows),
+            "total_calories": sum(r.calories_burned for r in rows),
+            "active_days": len(dates),
+            "last_active_date": dates[-1],
+            "last_session_at": max(r.timestamp for r in rows),
+        }
+        if DB_BACKEND in ("sqlite", "postgresql"):
+            await db.execute(_upsert(values, dates[0]))
+        else:
+            result = await db.execute(update(STATS).where(STATS.c.patient_id == patient_id).values(
+                sessions=STATS.c.sessions + values["sessions"],
+                total_calories=STATS.c.total_calories + values["total_calories"],
+                active_days=STATS.c.active_days + values["active_days"] - case(
+                    (STATS.c.last_active_date == dates[0], 1), else_=0),
+                last_active_date=values["last_active_date"],
+                last_session_at=values["last_session_at"],
+            ))
+            if result.rowcount == 0:
+                await db.execute(insert(STATS).values(**values))
+
+
+async def adjust_calories(db, deltas):
+    """Apply {patient_id: calorie delta} from edited sessions (caller commits)."""
+    for patient_id, delta in deltas.items():
+        if delta:
+            await db.execute(update(STATS).where(STATS.c.patient_id == patient_id)
+                             .values(total_calories=STATS.c.total_calories + delta))
+
+
+async def get_stats(db, patient_id):
+    row = (await db.execute(select(STATS).where(STATS.c.patient_id == patient_id))).first()
+    if row is None:
+        return {"patient_id": patient_id, "sessions": 0, "total_calories": 0.0,
+                "active_days": 0, "last_session_at": None}
+    return {
+        "patient_id": patient_id,
+        "sessions": row.sessions,
+        "total_calories": round(row.total_calories, 1),
+        "active_days": row.active_days,
+        "last_session_at": row.last_session_at,
+    }
+
+
+def rebuild_stats(conn):
+    """Recompute every patient's aggregates from HealthRecord (sync connection)."""
+    hr = HealthRecord.__table__
+    day = func.date(hr.c.timestamp)
+    source = select(
+        hr.c.patient_id,
+        func.count().label("sessions"),
+        func.coalesce(func.sum(hr.c.calories_burned), 0.0).label("total_calories"),
+        func.count(day.distinct()).label("active_days"),
+        func.max(day).label("last_active_date"),
+        func.max(hr.c.timestamp).label("last_session_at"),
+    ).group_by(hr.c.patient_id)
+
+    conn.execute(delete(STATS))
+    conn.execute(insert(STATS).from_select(
+        ["patient_id", "sessions", "total_calories", "active_days", "last_active_date", "last_session_at"],
+        source
+    ))
+    return conn.execute(select(func.count()).select_from(STATS)).scalar()
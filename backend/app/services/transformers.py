@@ -0,0 +1,25 @@
+"""
+Custom transformers the pickled pipelines refer to.
+
+xgb_pipeline.pkl was saved from the training script, so pickle recorded its
+condition step as __main__.DiabetesExtractor. ModelRegistry.load aliases the
+classes below into __main__ before unpickling, so the artifact loads in any
+process (uvicorn, inference/rescore workers, benchmarks, tests).
+"""
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+class DiabetesExtractor(BaseEstimator, TransformerMixin):
+    """'Pre-existing Conditions' ("None", "HTN", "DM", "HTN, DM") -> 1 when it lists DM, else 0."""
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        column = X.iloc[:, 0] if hasattr(X, "iloc") else np.asarray(X)[:, 0]
+        return np.array([[1 if "DM" in str(value) else 0] for value in column])
+
+
+# Classes recorded under __main__ in the shipped artifacts
+PICKLED_MAIN_CLASSES = {"DiabetesExtractor": DiabetesExtractor}
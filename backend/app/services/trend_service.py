@@ -0,0 +1,295 @@
+"""
+Per-patient rolling window of recent sessions, for trend features in /predict.
+
+Each patient's last TREND_WINDOW sessions live in one PatientTrend row, packed
+into a fixed-size ring buffer (26 bytes per slot). Creating a session reads
+that row by primary key, compares the new vitals with the buffered ones and
+appends the session, in the insert's transaction: the cost per request stays
+constant however long the patient's history grows. Post-workout Borg ratings
+arrive later: whatever writes the feedback (the route, or the write-behind
+flush) also stores it in the buffered slot, in the same transaction.
+
+Trend flags are advisory: they are returned with the prediction and counted,
+but never change the prescription, is_urgent or the doctor alert stream.
+"""
+import struct
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.db.session import DB_BACKEND
+from app.models.health import HealthRecord
+from app.models.trend import PatientTrend
+
+HR = HealthRecord.__table__
+TRENDS = PatientTrend.__table__
+
+TREND_FLAGS = Counter("trend_flags", "Trend-based safety flags raised by /predict", labelnames=("flag",))
+_FEEDBACK_UPDATE = update(TRENDS).where(TRENDS.c.patient_id == bindparam("b_patient")).values(
+    buffer=bindparam("b_buffer"))
+
+VITALS = ("resting_hr", "bp_systolic", "bp_diastolic")
+VALUES = VITALS + ("borg_rating_before", "borg_rating_after")
+UNKNOWN = -1 # no value (yet), e.g. feedback not submitted
+_HEADER = struct.Struct("<BHHH") # format version, slots, next slot, used slots
+_FORMAT_VERSION = 1
+
+
+def _epoch(ts):
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp())
+
+
+def _packed(value):
+    # Stored as int16
+    return UNKNOWN if value is None else max(0, min(int(value), 32767))
+
+
+def _session(record):
+    # HealthRecord instance or row -> the fields a slot keeps
+    session = {"record_id": record.id, "timestamp": _epoch(record.timestamp)}
+    session.update({f: _packed(getattr(record, f)) for f in VALUES})
+    return session
+
+
+class TrendBuffer:
+    """Fixed-size ring buffer of a patient's most recent sessions."""
+
+    def __init__(self, size):
+        self.size = size
+        self.head = 0 # next slot to write
+        self.count = 0
+        self.ids = [0] * size
+        self.times = [0] * size
+        self.values = {f: [UNKNOWN] * size for f in VALUES}
+
+    def _slots(self):
+        # Oldest first
+        return [(self.head - self.count + k) % self.size for k in range(self.count)]
+
+    def append(self, session):
+        i = self.head
+        self.ids[i], self.times[i] = session["record_id"], session["timestamp"]
+        for f in VALUES:
+            self.values[f][i] = session[f]
+        self.head = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def sessions(self):
+        return [dict({"record_id": self.ids[i], "timestamp": self.times[i]},
+                     **{f: self.values[f][i] for f in VALUES}) for i in self._slots()]
+
+    def set_value(self, record_id, field, value):
+        # False if the session is no longer (or not) in the window
+        for i in self._slots():
+            if self.ids[i] == record_id:
+                self.values[field][i] = _packed(value)
+                return True
+        return False
+
+    def to_bytes(self):
+        n = self.size
+        return _HEADER.pack(_FORMAT_VERSION, n, self.head, self.count) + struct.pack(
+            f"<{n}q{n}q{len(VALUES) * n}h",
+            *self.ids, *self.times, *(v for f in VALUES for v in self.values[f]))
+
+    @classmethod
+    def from_bytes(cls, data, size):
+        _, n, head, count = _HEADER.unpack_from(data)
+        flat = struct.unpack_from(f"<{n}q{n}q{len(VALUES) * n}h", data, _HEADER.size)
+        stored = cls(n)
+        stored.head, stored.count = head, count
+        stored.ids, stored.times = list(flat[:n]), list(flat[n:2 * n])
+        for k, f in enumerate(VALUES):
+            stored.values[f] = list(flat[(2 + k) * n:(3 + k) * n])
+        if n == size:
+            return stored
+        # TREND_WINDOW changed since the row was written: keep what still fits
+        buffer = cls(size)
+        for session in stored.sessions()[-size:]:
+            buffer.append(session)
+        return buffer
+
+
+def _slope(values):
+    # Least-squares change per session
+    n = len(values)
+    mean_x, mean_y = (n - 1) / 2, sum(values) / n
+    spread = sum((x - mean_x) ** 2 for x in range(n))
+    return sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / spread if spread else 0.0
+
+
+def trend_features(previous, current):
+    """Compare a session with the ones before it (oldest first); returns (features, flags)."""
+    features, flags = {"window_sessions": len(previous)}, []
+    if not previous:
+        return features, flags
+
+    for f in VITALS:
+        history = [s[f] for s in previous if s[f] != UNKNOWN]
+        if not history:
+            continue
+        mean = sum(history) / len(history)
+        features[f] = {
+            "mean": round(mean, 1),
+            "last": history[-1],
+            "delta_last": current[f] - history[-1],
+            "delta_mean": round(current[f] - mean, 1),
+            "slope_per_session": round(_slope(history + [current[f]]), 2),
+        }
+    # Borg after vs. before, per session with feedback
+    rises = [s["borg_rating_after"] - s["borg_rating_before"] for s in previous
+             if s["borg_rating_after"] != UNKNOWN and s["borg_rating_before"] != UNKNOWN]
+    features["borg_rise"] = {
+        "mean": round(sum(rises) / len(rises), 2) if rises else None,
+        "last": rises[-1] if rises else None,
+        "sessions": len(rises),
+    }
+    features["days_since_last"] = round((current["timestamp"] - previous[-1]["timestamp"]) / 86400, 1)
+
+    if len(previous) >= settings.TREND_MIN_SESSIONS:
+        if "resting_hr" in features and features["resting_hr"]["delta_mean"] >= settings.TREND_RESTING_HR_RISE:
+            flags.append("resting_hr_rising")
+        if "bp_systolic" in features and features["bp_systolic"]["delta_mean"] >= settings.TREND_BP_SYSTOLIC_RISE:
+            flags.append("bp_systolic_rising")
+    if len(rises) >= settings.TREND_MIN_SESSIONS and features["borg_rise"]["mean"] >= settings.TREND_BORG_RISE:
+        flags.append("high_exertion")
+    return features, flags
+
+
+async def _load_buffers(db, patient_ids, for_update=False):
+    statement = select(TRENDS).where(TRENDS.c.patient_id.in_(patient_ids))
+    if for_update:
+        # Postgres: concurrent sessions of one patient append in turn
+        statement = statement.with_for_update()
+    rows = (await db.execute(statement)).all()
+    buffers = {row.patient_id: TrendBuffer.from_bytes(row.buffer, settings.TREND_WINDOW) for row in rows}
+    return buffers, {row.patient_id: row.sessions for row in rows}
+
+
+def _upsert():
+    if DB_BACKEND == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+    stmt = dialect_insert(TRENDS)
+    return stmt.on_conflict_do_update(
+        index_elements=[TRENDS.c.patient_id],
+        set_={"buffer": stmt.excluded.buffer, "sessions": TRENDS.c.sessions + stmt.excluded.sessions},
+    )
+
+
+async def record_sessions(db, records):
+    """
+    Append newly created HealthRecords to their patients' trend windows
+    (caller commits). Returns (features, flags) for each record, in order,
+    each computed against the sessions before it.
+    """
+    by_patient = defaultdict(list)
+    for record in records:
+        by_patient[record.patient_id].append(record)
+
+    # 1. One primary-key read for every patient in the batch (also flushes
+    #    the new records, so they have their ids)
+    buffers, _ = await _load_buffers(db, list(by_patient), for_update=True)
+
+    # 2. Features against the window, then append
+    results = {}
+    for patient_id, new in by_patient.items():
+        buffer = buffers.setdefault(patient_id, TrendBuffer(settings.TREND_WINDOW))
+        for record in new:
+            current = _session(record)
+            features, flags = trend_features(buffer.sessions(), current)
+            for flag in flags:
+                TREND_FLAGS.labels(flag).inc()
+            results[id(record)] = (features, flags)
+            buffer.append(current)
+
+    # 3. Write back, one statement for the batch
+    values = [{"patient_id": patient_id, "buffer": buffers[patient_id].to_bytes(), "sessions": len(new)}
+              for patient_id, new in by_patient.items()]
+    if DB_BACKEND in ("sqlite", "postgresql"):
+        await db.execute(_upsert(), values)
+    else:
+        for row in values:
+            result = await db.execute(update(TRENDS).where(TRENDS.c.patient_id == row["patient_id"]).values(
+                buffer=row["buffer"], sessions=TRENDS.c.sessions + row["sessions"]))
+            if result.rowcount == 0:
+                await db.execute(insert(TRENDS).values(**row))
+    return [results[id(record)] for record in records]
+
+
+def _with_feedback(rows, feedback):
+    # feedback: {patient_id: {record_id: borg_rating_after}} -> buffers to write back
+    updates = []
+    for row in rows:
+        buffer = TrendBuffer.from_bytes(row.buffer, settings.TREND_WINDOW)
+        found = [buffer.set_value(record_id, "borg_rating_after", value)
+                 for record_id, value in feedback[row.patient_id].items()]
+        if any(found):
+            updates.append({"b_patient": row.patient_id, "b_buffer": buffer.to_bytes()})
+    return updates
+
+
+def _trend_rows(patient_ids):
+    return select(TRENDS.c.patient_id, TRENDS.c.buffer).where(
+        TRENDS.c.patient_id.in_(patient_ids)).with_for_update()
+
+
+async def record_feedback(db, patient_id, record_id, borg_rating_after):
+    """Store a post-workout rating in the patient's window (caller commits)."""
+    rows = (await db.execute(_trend_rows([patient_id]))).all()
+    updates = _with_feedback(rows, {patient_id: {record_id: borg_rating_after}})
+    if updates:
+        await db.execute(_FEEDBACK_UPDATE, updates)
+
+
+def record_feedback_batch(conn, borg_after):
+    """Same for a batch of {record_id: rating}, on the writer's sync connection."""
+    feedback = defaultdict(dict)
+    owners = conn.execute(select(HR.c.id, HR.c.patient_id).where(HR.c.id.in_(list(borg_after))))
+    for record_id, patient_id in owners:
+        feedback[patient_id][record_id] = borg_after[record_id]
+    if not feedback:
+        return
+    updates = _with_feedback(conn.execute(_trend_rows(list(feedback))).all(), feedback)
+    if updates:
+        conn.execute(_FEEDBACK_UPDATE, updates)
+
+
+async def get_window(db, patient_id):
+    buffers, totals = await _load_buffers(db, [patient_id])
+    buffer = buffers.get(patient_id)
+    sessions = []
+    for s in buffer.sessions() if buffer else []:
+        s["timestamp"] = datetime.fromtimestamp(s["timestamp"], timezone.utc)
+        sessions.append({k: None if v == UNKNOWN else v for k, v in s.items()})
+    return {"patient_id": patient_id, "window": settings.TREND_WINDOW,
+            "sessions_total": totals.get(patient_id, 0), "sessions": sessions}
+
+
+def rebuild_trends(conn):
+    """Rebuild every patient's window from HealthRecord (sync connection)."""
+    size = settings.TREND_WINDOW
+    rank = func.row_number().over(partition_by=HR.c.patient_id,
+                                  order_by=(HR.c.timestamp.desc(), HR.c.id.desc())).label("rank")
+    recent = select(HR.c.id, HR.c.patient_id, HR.c.timestamp, *[HR.c[f] for f in VALUES], rank).subquery()
+    totals = dict(conn.execute(select(HR.c.patient_id, func.count()).group_by(HR.c.patient_id)).all())
+
+    buffers = {}
+    rows = conn.execute(select(recent).where(recent.c.rank <= size)
+                        .order_by(recent.c.patient_id, recent.c.rank.desc()))
+    for row in rows:
+        buffers.setdefault(row.patient_id, TrendBuffer(size)).append(_session(row))
+
+    conn.execute(delete(TRENDS))
+    if buffers:
+        conn.execute(insert(TRENDS), [{"patient_id": patient_id, "buffer": buffer.to_bytes(),
+                                       "sessions": totals[patient_id]}
+                                      for patient_id, buffer in buffers.items()])
+    return len(buffers)
@@ -0,0 +1,78 @@
+from sqlmodel import select
+
+from app.core.config import settings
+from app.core.metrics import Gauge
+from app.models.user import User
+from app.services.prediction_cache import PredictionCache
+
+
+class UserCache:
+    """
+    In-process cache of user profiles (plain dicts, as returned by /login),
+    looked up by id or username. Writers call invalidate() after committing;
+    other processes only see the change once their entry expires, so the
+    TTL bounds how stale a profile can be across uvicorn workers.
+    """
+
+    def __init__(self, max_size, ttl_seconds):
+        self.by_id = PredictionCache(max_size, ttl_seconds)
+        self._id_for_name = PredictionCache(max_size, ttl_seconds)  # username -> {"id": id}
+        # Bumped by invalidate(): a lookup that started before an invalidation
+        # must not put the (possibly stale) row it read back in the cache
+        self._generation = 0
+
+    def _put(self, profile, generation):
+        if generation == self._generation:
+            self.by_id.put(profile["id"], profile)
+            self._id_for_name.put(profile["username"], {"id": profile["id"]})
+
+    async def get_many(self, db, user_ids):
+        """{id: profile} for the ids that exist; misses are fetched with one IN query."""
+        found, missing = {}, []
+        for user_id in set(user_ids):
+            profile = self.by_id.get(user_id)
+            if profile is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = profile
+        if missing:
+            generation = self._generation
+            rows = (await db.exec(select(User).where(User.id.in_(missing)))).all()
+            for user in rows:
+                profile = user.model_dump()
+                self._put(profile, generation)
+                found[user.id] = profile
+        return found
+
+    async def get(self, db, user_id):
+        return (await self.get_many(db, [user_id])).get(user_id)
+
+    async def get_by_username(self, db, username):
+        entry = self._id_for_name.get(username)
+        if entry is not None:
+            profile = self.by_id.get(entry["id"])
+            if profile is not None and profile["username"] == username:
+                return profile
+        generation = self._generation
+        user = (await db.exec(select(User).where(User.username == username))).first()
+        if user is None:
+            return None
+        profile = user.model_dump()
+        self._put(profile, generation)
+        return profile
+
+    def invalidate(self, user_id=None, username=None):
+        self._generation += 1
+        if user_id is not None:
+            self.by_id.invalidate(user_id)
+        if username is not None:
+            self._id_for_name.invalidate(username)
+
+    def stats(self):
+        return self.by_id.stats()
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+Gauge("user_cache_entries", "Profiles in the user cache", fn=lambda: user_cache.by_id.stats()["size"])
+Gauge("user_cache_hit_ratio", "User cache hits / lookups", fn=lambda: user_cache.by_id.stats()["hit_rate"])
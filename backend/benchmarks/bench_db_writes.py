@@ -0,0 +1,99 @@
+"""
+Concurrent write load test for the database engine settings.
+
+Run from the backend directory:
+    python benchmarks/bench_db_writes.py --threads 1 4 16 --writes 200
+    DATABASE_URL=postgresql://... python benchmarks/bench_db_writes.py
+
+Each worker thread mimics /predict (insert + commit) followed by /feedback
+(update + commit). For SQLite the run is repeated with the old defaults
+(rollback journal, pysqlite 5s timeout) and with the WAL configuration.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlmodel import SQLModel, Session  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.db.session import build_engine  # noqa: E402
+from app.models.health import HealthRecord  # noqa: E402
+from app.models.user import User, UserRole  # noqa: E402
+
+
+def worker(engine, n_writes, patient_id, errors):
+    for i in range(n_writes):
+        try:
+            with Session(engine) as db:
+                record = HealthRecord(
+                    patient_id=patient_id, weight=75.0, resting_hr=70, bp_systolic=120, bp_diastolic=80,
+                    pulse_rate_before=72, respiratory_rate_before=16, borg_rating_before=9,
+                    conditions="None", predicted_intensity="Moderate", mhr=180,
+                    target_hr_min=90, target_hr_max=153, calories_burned=123.8,
+                )
+                db.add(record)
+                db.commit()
+                record.mood = "Happy"
+                record.borg_rating_after = 13
+                db.add(record)
+                db.commit()
+        except OperationalError as e:
+            errors.append(str(e.orig))
+
+
+def run(engine, threads, writes):
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        user = User(username=f"bench_{time.time_ns()}", role=UserRole.PATIENT, age=40, gender="M")
+        db.add(user)
+        db.commit()
+        patient_id = user.id
+
+    errors = []
+    pool = [threading.Thread(target=worker, args=(engine, writes, patient_id, errors)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool: t.start()
+    for t in pool: t.join()
+    elapsed = time.perf_counter() - start
+    ok = threads * writes - len(errors)
+    return ok / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--writes", type=int, default=200, help="sessions written per thread")
+    args = parser.parse_args()
+
+    url = os.environ.get("DATABASE_URL")
+    if url and not url.startswith("sqlite"):
+        configs = [("configured", {})]
+    else:
+        configs = [
+            ("sqlite rollback journal (old default)", {"SQLITE_WAL": False, "SQLITE_BUSY_TIMEOUT_MS": 5000}),
+            ("sqlite WAL + busy_timeout", {"SQLITE_WAL": True, "SQLITE_BUSY_TIMEOUT_MS": 5000}),
+        ]
+
+    for label, overrides in configs:
+        for key, value in overrides.items():
+            setattr(settings, key, value)
+        print(f"--- {label}")
+        for threads in args.threads:
+            if url and not url.startswith("sqlite"):
+                engine = build_engine(url)
+            else:
+                engine = build_engine(f"sqlite:///{tempfile.mkdtemp()}/bench_writes.db")
+            throughput, errors = run(engine, threads, args.writes)
+            print(f"threads={threads:>3}  sessions/s={throughput:8.1f}  lock errors={errors}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
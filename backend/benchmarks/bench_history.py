@@ -0,0 +1,134 @@
+"""
+History latency before/after the healthrecord/remark indexes.
+
+Run from the backend directory:
+    python benchmarks/bench_history.py --records 100000
+
+Builds a throwaway SQLite file with the pre-index schema, seeds it, times the
+/patient/history query, applies the migrations in place and times it again.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from sqlmodel import SQLModel, Session, select  # noqa: E402
+
+from app.db.migrations import run_migrations  # noqa: E402
+from app.models.health import HealthRecord, Remark  # noqa: E402
+from app.models.stats import PatientStats  # noqa: E402,F401  (registers the table)
+from app.models.user import User, UserRole  # noqa: E402
+
+# The baseline schema had no secondary indexes on these tables, so every index
+# declared on them now (by any migration, present or future) is dropped for
+# the "before" phase
+NEW_INDEXES = tuple(sorted(index.name for table in (HealthRecord.__table__, Remark.__table__)
+                           for index in table.indexes))
+
+
+def seed(engine, n_records, n_patients, rnd):
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"username": f"patient_{i}", "role": UserRole.PATIENT.name, "age": rnd.randint(25, 85), "gender": rnd.choice("MF")}
+            for i in range(n_patients)
+        ])
+        chunk = []
+        for i in range(n_records):
+            mhr = 220 - rnd.randint(25, 85)
+            chunk.append({
+                "patient_id": rnd.randint(1, n_patients),
+                "timestamp": start + timedelta(seconds=i * 300),
+                "weight": round(rnd.gauss(78, 14), 1), "resting_hr": int(rnd.gauss(72, 10)),
+                "bp_systolic": int(rnd.gauss(128, 15)), "bp_diastolic": int(rnd.gauss(82, 9)),
+                "pulse_rate_before": int(rnd.gauss(78, 10)), "respiratory_rate_before": int(rnd.gauss(16, 3)),
+                "borg_rating_before": rnd.randint(6, 14), "conditions": rnd.choice(["None", "HTN", "DM", "HTN, DM"]),
+                "predicted_intensity": rnd.choice(["Low", "Moderate", "High"]), "mhr": mhr,
+                "target_hr_min": int(0.5 * mhr), "target_hr_max": int(0.85 * mhr),
+                "is_urgent": rnd.random() < 0.03, "calories_burned": round(rnd.uniform(80, 600), 1),
+            })
+            if len(chunk) == 10_000:
+                conn.execute(insert(HealthRecord.__table__), chunk)
+                chunk = []
+        if chunk:
+            conn.execute(insert(HealthRecord.__table__), chunk)
+        conn.execute(insert(Remark.__table__), [
+            {"record_id": rnd.randint(1, n_records), "doctor_id": 1, "text": "Reviewed",
+             "timestamp": datetime.now(timezone.utc)}
+            for _ in range(n_records // 10)
+        ])
+
+
+def time_history(engine, patient_ids, repeat):
+    samples = []
+    with Session(engine) as db:
+        for _ in range(repeat):
+            for pid in patient_ids:
+                start = time.perf_counter()
+                statement = (select(HealthRecord).where(HealthRecord.patient_id == pid)
+                             .options(selectinload(HealthRecord.remarks))
+                             .order_by(HealthRecord.timestamp.desc()))
+                db.exec(statement).all()
+                samples.append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--patients", type=int, default=1_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    path = Path(tempfile.mkdtemp()) / "bench_history.db"
+    engine = create_engine(f"sqlite:///{path}")
+
+    # 1. Pre-migration schema: tables as create_all built them before the indexes
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in NEW_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        conn.exec_driver_sql("DELETE FROM schemaversion")
+
+    print(f"Seeding {args.records:,} records for {args.patients:,} patients...")
+    seed(engine, args.records, args.patients, rnd)
+    patient_ids = rnd.sample(range(1, args.patients + 1), min(args.queries, args.patients))
+
+    before = time_history(engine, patient_ids, args.repeat)
+    print(f"before: {before}")
+
+    # 2. Apply migrations in place and re-check the data survived
+    start = time.perf_counter()
+    run_migrations(engine, verbose=True)
+    print(f"migration took {time.perf_counter() - start:.2f}s")
+    with engine.connect() as conn:
+        count = conn.exec_driver_sql("SELECT COUNT(*) FROM healthrecord").scalar()
+    assert count == args.records, "records lost during migration"
+
+    after = time_history(engine, patient_ids, args.repeat)
+    print(f"after:  {after}")
+    print(f"speedup (p50): {before['p50_ms'] / after['p50_ms']:.1f}x")
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Microbenchmark: DataFrame pipeline path vs. precompiled fast path.
+
+Run from the backend directory:
+    python benchmarks/bench_inference.py --n 5000
+
+Every generated input is scored by both paths and the labels must match
+exactly before any timing is reported.
+"""
+import argparse
+import random
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.ml_service import ml_service  # noqa: E402
+
+
+def random_features(rnd, conditions):
+    return (
+        rnd.randint(18, 90), rnd.choice(["M", "F"]), round(rnd.uniform(40, 160), 1),
+        rnd.randint(40, 130), rnd.randint(90, 200), rnd.randint(50, 120),
+        rnd.randint(45, 140), rnd.randint(8, 30), rnd.randint(6, 20),
+        rnd.choice(conditions),
+    )
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def time_path(fn, inputs):
+    samples = []
+    for features in inputs:
+        start = time.perf_counter_ns()
+        fn(*features)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ml_service.ensure_loaded()
+    if not ml_service.pipeline or not ml_service.fast_path:
+        sys.exit("Model or fast path not available; nothing to benchmark.")
+
+    bundle = ml_service.bundle
+    pipeline_path = partial(ml_service._predict_label_pipeline, bundle)
+    rnd = random.Random(args.seed)
+    conditions = bundle.input_domains["Pre-existing Conditions"]
+    inputs = [random_features(rnd, conditions) for _ in range(args.n)]
+
+    # 1. Exactness
+    mismatches = [f for f in inputs
+                  if bundle.fast_path.predict(*f) != pipeline_path(*f)]
+    if mismatches:
+        sys.exit(f"❌ {len(mismatches)} mismatches, e.g. {mismatches[0]}")
+    print(f"✅ {args.n} inputs: fast path == pipeline")
+
+    # 2. Latency (microseconds per call)
+    for name, fn in (("pipeline", pipeline_path),
+                     ("fast_path", bundle.fast_path.predict)):
+        samples = time_path(fn, inputs)
+        print(f"{name:>10}: p50={percentile(samples, 50):8.1f}us  "
+              f"p99={percentile(samples, 99):8.1f}us  mean={sum(samples) / len(samples):8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Payload size and serialization time of /doctor/dashboard and /patient/history
+responses: FastAPI's default path (jsonable_encoder + json.dumps) vs orjson,
+row vs columnar shape, uncompressed vs gzip/brotli.
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py --records 50000 --page 1000
+
+Seeds a throwaway SQLite file, builds the payloads the way the handlers do
+and times only the encoding (and compression) step.
+"""
+import argparse
+import gzip
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.responses import FastJSONResponse, columnar  # noqa: E402
+from app.models.health import HealthRecord  # noqa: E402
+from app.models.stats import PatientStats  # noqa: E402,F401  (registers the table)
+from bench_history import seed  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HR = HealthRecord.__table__
+FIELDS = [c.name for c in HR.columns]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def payloads(engine, page):
+    with engine.connect() as conn:
+        rows = conn.execute(select(HR).order_by(HR.c.timestamp.desc()).limit(page)).all()
+        busiest = conn.execute(select(HR.c.patient_id).group_by(HR.c.patient_id)
+                               .order_by(func.count().desc()).limit(1)).scalar()
+        history = conn.execute(select(HR).where(HR.c.patient_id == busiest)
+                               .order_by(HR.c.timestamp.desc())).all()
+    dashboard = [dict(r._mapping) for r in rows]
+    history = [dict(r._mapping, doctor_note="No remarks") for r in history]
+    return {
+        f"dashboard ({len(dashboard)} rows)": ({"items": dashboard, "next_cursor": None},
+                                              dict(columnar(dashboard, FIELDS), next_cursor=None)),
+        f"history ({len(history)} rows)": (history, columnar(history, FIELDS + ["doctor_note"])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        SQLModel.metadata.create_all(engine)
+        seed(engine, args.records, args.patients, random.Random(42))
+
+        print(f"{'payload':28s} {'encoding':28s} {'encode ms':>10s} {'bytes':>10s} "
+              f"{'gzip':>10s} {'gzip ms':>8s} {'br':>10s} {'br ms':>7s}")
+        for name, (rows_shape, columns_shape) in payloads(engine, args.page).items():
+            variants = [
+                ("default (jsonable+json)", lambda: JSONResponse(jsonable_encoder(rows_shape)).body),
+                ("orjson rows", lambda: FastJSONResponse(rows_shape).body),
+                ("orjson columns", lambda: FastJSONResponse(columns_shape).body),
+            ]
+            for label, encode in variants:
+                body, encode_ms = timed(encode, args.repeat)
+                gz, gzip_ms = timed(lambda: gzip.compress(body, settings.COMPRESSION_GZIP_LEVEL), args.repeat)
+                br_size, br_ms = "-", "-"
+                if brotli is not None:
+                    br, br_ms = timed(lambda: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY),
+                                      args.repeat)
+                    br_size, br_ms = len(br), f"{br_ms:.2f}"
+                print(f"{name:28s} {label:28s} {encode_ms:10.2f} {len(body):10d} "
+                      f"{len(gz):10d} {gzip_ms:8.2f} {br_size:>10} {br_ms:>7}")
+        if brotli is None:
+            print("\n(brotli not installed: pip install brotli to include it)")
+    finally:
+        engine.dispose()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Request-path cost of shadow mode.
+
+Run from the backend directory:
+    python benchmarks/bench_shadow.py --n 3000
+
+Scores random inputs through MLService.predict_and_audit at a fixed request
+rate with shadow mode off and then on (the active version shadowing itself),
+against a throwaway SQLite database, and compares the per-call latency the
+caller sees. --rate 0 runs a closed loop instead (CPU-saturated worst case).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench_shadow.db'}"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlmodel import SQLModel  # noqa: E402
+
+from app.db.session import engine  # noqa: E402
+from app.models.shadow import ShadowResult  # noqa: E402,F401  (registers the table)
+from app.services.ml_service import ml_service  # noqa: E402
+from bench_inference import percentile, random_features  # noqa: E402
+
+
+def time_calls(inputs, rate):
+    samples = []
+    interval = 1.0 / rate if rate else 0.0
+    next_at = time.perf_counter()
+    for features in inputs:
+        start = time.perf_counter_ns()
+        ml_service.predict_and_audit(*features)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=200.0, help="requests per second (0 = closed loop)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(engine)
+    ml_service.ensure_loaded()
+    if not ml_service.pipeline:
+        sys.exit("Model not available; nothing to benchmark.")
+    ml_service.cache.clear()
+
+    rnd = random.Random(args.seed)
+    off_inputs = [random_features(rnd) for _ in range(args.n)]
+    on_inputs = [random_features(rnd) for _ in range(args.n)]  # fresh inputs: no cache hits
+    time_calls(off_inputs[:200], 0)  # warm-up
+
+    off = time_calls(off_inputs, args.rate)
+    ml_service.start_shadow(ml_service.version)
+    on = time_calls(on_inputs, args.rate)
+    ml_service.shadow.flush()
+    ml_service.stop_shadow()
+
+    for name, samples in (("shadow off", off), ("shadow on", on)):
+        print(f"{name:>10}: p50={percentile(samples, 50):8.1f}us  "
+              f"p99={percentile(samples, 99):8.1f}us  mean={sum(samples) / len(samples):8.1f}us")
+    stats = ml_service.shadow.stats()
+    print(f"shadow jobs: submitted={stats['submitted']} dropped={stats['dropped']} errors={stats['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+API load test: seeds synthetic patients and sessions, then drives a weighted
+mix of endpoints at a fixed concurrency and reports throughput and latency.
+
+Run from the backend directory:
+    # in-process (ASGI app, throwaway SQLite file)
+    python benchmarks/loadtest.py --users 200 --records 20000 --concurrency 16 --duration 30
+
+    # against a running server (seeded through the API)
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --users 50 --records 2000
+
+    # compare two runs
+    python benchmarks/loadtest.py --compare results/old.json results/new.json
+
+Results are written as JSON (default benchmarks/results/loadtest-<commit>-<time>.json).
+In-process mode runs client and server on one event loop, so absolute
+numbers are lower than against uvicorn; use it for before/after comparisons.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+
+DEFAULT_MIX = "predict=4,feedback=2,history=2,dashboard=1,remark=1"
+SYMPTOMS = ["None", "Dizziness", "Shortness of Breath", "Fatigue", "Chest Pain"]
+MOODS = ["Happy", "Neutral", "Tired", "Anxious"]
+
+
+def random_vitals(rnd):
+    # Same distributions as bench_history.seed
+    return {
+        "weight": round(rnd.gauss(78, 14), 1), "resting_hr": int(rnd.gauss(72, 10)),
+        "bp_systolic": int(rnd.gauss(128, 15)), "bp_diastolic": int(rnd.gauss(82, 9)),
+        "pulse_rate_before": int(rnd.gauss(78, 10)), "respiratory_rate_before": int(rnd.gauss(16, 3)),
+        "borg_rating_before": rnd.randint(6, 14),
+        "has_htn": rnd.random() < 0.35, "has_dm": rnd.random() < 0.2,
+    }
+
+
+class Target:
+    """Ids the operations pick from; grows as /predict creates records."""
+
+    def __init__(self, patient_ids, record_ids, doctor_id):
+        self.patient_ids = list(patient_ids)
+        self.record_ids = list(record_ids)
+        self.doctor_id = doctor_id
+
+
+# --- OPERATIONS: (method, url, kwargs) builders ---
+
+def op_predict(rnd, t):
+    return "POST", f"/api/v1/patient/predict/{rnd.choice(t.patient_ids)}", {"json": random_vitals(rnd)}
+
+def op_feedback(rnd, t):
+    symptoms = [] if rnd.random() < 0.8 else [rnd.choice(SYMPTOMS[1:])]
+    body = {"borg_rating": rnd.randint(8, 17), "mood": rnd.choice(MOODS), "symptoms": symptoms}
+    return "PATCH", f"/api/v1/patient/feedback/{rnd.choice(t.record_ids)}", {"json": body}
+
+def op_history(rnd, t):
+    return "GET", f"/api/v1/patient/history/{rnd.choice(t.patient_ids)}", {}
+
+def op_dashboard(rnd, t):
+    return "GET", "/api/v1/doctor/dashboard", {"params": {"limit": 100}}
+
+def op_remark(rnd, t):
+    params = {"text": "Reviewed, continue plan", "user_id": t.doctor_id}
+    return "POST", f"/api/v1/doctor/remark/{rnd.choice(t.record_ids)}", {"params": params}
+
+OPERATIONS = {"predict": op_predict, "feedback": op_feedback, "history": op_history,
+              "dashboard": op_dashboard, "remark": op_remark}
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            sys.exit(f"Unknown operation in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+# --- SEEDING ---
+
+def seed_database(engine, n_users, n_records, rnd):
+    from sqlalchemy import insert
+    from sqlmodel import SQLModel
+    from app.models.user import User, UserRole
+    from app.services.stats_service import rebuild_stats
+    from bench_history import seed
+
+    SQLModel.metadata.create_all(engine)
+    seed(engine, n_records, n_users, rnd)  # patients get ids 1..n_users
+    with engine.begin() as conn:
+        doctor_id = conn.execute(insert(User.__table__).values(
+            username="loadtest_doctor", role=UserRole.DOCTOR.name, age=50, gender="F"
+        )).inserted_primary_key[0]
+        rebuild_stats(conn)
+    return Target(range(1, n_users + 1), range(1, n_records + 1), doctor_id)
+
+
+async def seed_via_api(client, n_users, n_records, rnd, batch_size=500):
+    run_id = int(time.time())
+    patient_ids = []
+    for i in range(n_users):
+        r = await client.post("/api/v1/auth/register", json={
+            "username": f"loadtest_{run_id}_{i}", "full_name": f"Load Test {i}", "role": "patient"})
+        r.raise_for_status()
+        uid = r.json()["user_id"]
+        r = await client.patch(f"/api/v1/patient/profile/{uid}",
+                               json={"age": rnd.randint(25, 85), "gender": rnd.choice("MF")})
+        r.raise_for_status()
+        patient_ids.append(uid)
+    r = await client.post("/api/v1/auth/register", json={
+        "username": f"loadtest_{run_id}_doctor", "full_name": "Load Test Doctor", "role": "doctor"})
+    r.raise_for_status()
+    doctor_id = r.json()["user_id"]
+
+    record_ids = []
+    for start in range(0, n_records, batch_size):
+        items = [dict(random_vitals(rnd), user_id=rnd.choice(patient_ids))
+                 for _ in range(min(batch_size, n_records - start))]
+        r = await client.post("/api/v1/patient/predict/batch", json=items, timeout=120)
+        r.raise_for_status()
+        record_ids.extend(rec["id"] for rec in r.json())
+    return Target(patient_ids, record_ids, doctor_id)
+
+
+# --- DRIVER ---
+
+async def drive(client, target, weights, concurrency, duration, max_requests, seed):
+    names, cum_weights = list(weights), []
+    for name in names:
+        cum_weights.append((cum_weights[-1] if cum_weights else 0.0) + weights[name])
+
+    samples = {name: [] for name in names}
+    errors = {name: {} for name in names}
+    deadline = time.perf_counter() + duration
+    issued = 0
+
+    async def worker(worker_id):
+        nonlocal issued
+        rnd = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline and (not max_requests or issued < max_requests):
+            issued += 1
+            name = rnd.choices(names, cum_weights=cum_weights)[0]
+            method, url, kwargs = OPERATIONS[name](rnd, target)
+            start = time.perf_counter()
+            try:
+                r = await client.request(method, url, **kwargs)
+                status = r.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if status == 200:
+                samples[name].append(elapsed)
+                if name == "predict":
+                    target.record_ids.append(r.json()["id"])
+            else:
+                errors[name][str(status)] = errors[name].get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return samples, errors, time.perf_counter() - start
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return None
+    idx = min(len(sorted_samples) - 1, max(0, int(round(pct / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[idx]
+
+
+def summarize(samples, errors, wall):
+    endpoints, all_samples = {}, []
+    for name, values in samples.items():
+        values.sort()
+        all_samples.extend(values)
+        endpoints[name] = {
+            "ok": len(values),
+            "errors": errors[name],
+            "throughput_rps": round(len(values) / wall, 2),
+            "p50_ms": _ms(percentile(values, 50)),
+            "p95_ms": _ms(percentile(values, 95)),
+            "p99_ms": _ms(percentile(values, 99)),
+            "mean_ms": _ms(statistics.fmean(values)) if values else None,
+        }
+    all_samples.sort()
+    total = {
+        "ok": len(all_samples),
+        "errors": sum(sum(e.values()) for e in errors.values()),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(all_samples) / wall, 2),
+        "p50_ms": _ms(percentile(all_samples, 50)),
+        "p95_ms": _ms(percentile(all_samples, 95)),
+        "p99_ms": _ms(percentile(all_samples, 99)),
+    }
+    return total, endpoints
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def database_size(engine):
+    if engine is None:
+        return None
+    from sqlalchemy import text
+    if engine.dialect.name == "sqlite":
+        path = engine.url.database
+        if not path or path == ":memory:":
+            return None
+        return sum(os.path.getsize(p) for p in (path, path + "-wal", path + "-shm") if os.path.exists(p))
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+    return None
+
+
+def row_counts(engine):
+    if engine is None:
+        return None
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        return {table: conn.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+                for table in ("user", "healthrecord", "remark")}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=BACKEND_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result):
+    print(f"\n{'endpoint':>10} {'ok':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for name, r in rows:
+        errs = r["errors"] if isinstance(r["errors"], int) else sum(r["errors"].values())
+        print(f"{name:>10} {r['ok']:>7} {errs:>5} {r['throughput_rps']:>9} "
+              f"{_fmt(r['p50_ms'])} {_fmt(r['p95_ms'])} {_fmt(r['p99_ms'])}")
+    for name, r in result["endpoints"].items():
+        if r["errors"]:
+            print(f"  ⚠️  {name} errors by status: {r['errors']}")
+    if result["db"]["size_bytes"] is not None:
+        print(f"\nDB size: {result['db']['size_bytes'] / 1e6:.1f} MB  rows: {result['db']['rows']}")
+
+
+def _fmt(value):
+    return f"{value:>9.2f}" if value is not None else f"{'-':>9}"
+
+
+def compare(old_path, new_path):
+    old, new = (json.loads(Path(p).read_text()) for p in (old_path, new_path))
+    print(f"old: {old['meta']['commit']} ({old['meta']['timestamp']})")
+    print(f"new: {new['meta']['commit']} ({new['meta']['timestamp']})")
+    print(f"\n{'endpoint':>10} {'metric':>15} {'old':>10} {'new':>10} {'change':>8}")
+    rows = [(n, new["endpoints"].get(n), old["endpoints"].get(n)) for n in new["endpoints"]]
+    rows.append(("TOTAL", new["total"], old["total"]))
+    for name, n, o in rows:
+        if not n or not o:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            a, b = o.get(metric), n.get(metric)
+            change = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "-"
+            print(f"{name:>10} {metric:>15} {_num(a)} {_num(b)} {change:>8}")
+
+
+def _num(value):
+    return f"{value:>10.2f}" if value is not None else f"{'-':>10}"
+
+
+async def run(args):
+    weights = parse_mix(args.mix)
+    rnd = random.Random(args.seed)
+    engine = None
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        if args.database_url:
+            from app.db.session import build_engine
+            engine = build_engine(args.database_url)
+        target = await seed_via_api(client, args.users, args.records, rnd)
+        lifespan = None
+    else:
+        # Must be set before the app (and its engine) is imported
+        db_path = Path(tempfile.mkdtemp()) / "loadtest.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        from app.db.session import engine
+        from app.main import app
+
+        print(f"Seeding {args.users:,} users / {args.records:,} records into {db_path} ...")
+        target = seed_database(engine, args.users, args.records, rnd)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()  # startup: migrations, inference pool, model preload
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                   base_url="http://loadtest", timeout=args.timeout)
+
+    try:
+        if args.warmup:
+            await drive(client, target, weights, args.concurrency, args.warmup, 0, args.seed + 1)
+        print(f"Driving {dict(weights)} at concurrency {args.concurrency} for {args.duration}s ...")
+        samples, errors, wall = await drive(client, target, weights, args.concurrency,
+                                            args.duration, args.requests, args.seed)
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    total, endpoints = summarize(samples, errors, wall)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mode": "http" if args.url else "in-process",
+            "url": args.url,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "total": total,
+        "endpoints": endpoints,
+        "db": {"size_bytes": database_size(engine), "rows": row_counts(engine)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--database-url", help="with --url: the server's DB, for size/row reporting")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no cap)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unrecorded traffic first")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted endpoint mix (default {DEFAULT_MIX})")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results JSON path")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    output = Path(args.output) if args.output else (
+        Path(__file__).resolve().parent / "results" /
+        f"loadtest-{result['meta']['commit'] or 'nogit'}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
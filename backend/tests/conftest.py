@@ -0,0 +1,71 @@
+"""
+Shared test setup. Settings are read when app modules are first imported, so
+the throwaway database and working directories are configured here, before
+any test module imports the app.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP = Path(tempfile.mkdtemp(prefix="cardiac-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP / 'test.db'}"
+os.environ["ANALYTICS_DIR"] = str(_TMP / "analytics_store")
+os.environ["ANALYTICS_REFRESH_SECONDS"] = "0"
+os.environ["FEEDBACK_JOURNAL_DIR"] = str(_TMP / "feedback_journal")
+os.environ["MODEL_MANIFEST_POLL_SECONDS"] = "0"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+VITALS = dict(weight=80.0, resting_hr=70, bp_systolic=120, bp_diastolic=80, pulse_rate_before=72,
+              respiratory_rate_before=16, borg_rating_before=9, has_htn=False, has_dm=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def tmp_engine(tmp_path):
+    from app.db.session import build_engine
+
+    engine = build_engine(f"sqlite:///{tmp_path / 'scratch.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def make_patient(client):
+    """Insert a patient with a profile; returns its id."""
+    from sqlalchemy import insert
+    from app.db.session import engine
+    from app.models.user import User, UserRole
+
+    def make(username, age=55, gender="M"):
+        with engine.begin() as conn:
+            result = conn.execute(insert(User.__table__).values(
+                username=username, role=UserRole.PATIENT.name, age=age, gender=gender))
+        return result.inserted_primary_key[0]
+    return make
+
+
+def record_row(patient_id, timestamp, **overrides):
+    """A HealthRecord row as the predict route would store it (for Core inserts)."""
+    mhr = 165
+    row = dict(patient_id=patient_id, timestamp=timestamp, weight=80.0, resting_hr=70, bp_systolic=120,
+               bp_diastolic=80, pulse_rate_before=72, respiratory_rate_before=16, borg_rating_before=9,
+               conditions="None", predicted_intensity="Moderate", mhr=mhr, target_hr_min=int(0.5 * mhr),
+               target_hr_max=int(0.85 * mhr), is_urgent=False, calories_burned=132.0,
+               model_version="v1", model_intensity="Moderate", model_urgent=False)
+    row.update(overrides)
+    return row
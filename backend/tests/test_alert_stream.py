@@ -0,0 +1,63 @@
+"""/doctor/alerts/stream: Last-Event-ID resume replays missed events, stale or future ids reset."""
+import asyncio
+import json
+
+import pytest
+
+from app.api.v1 import doctor
+from app.services.alert_broker import InProcessAlertBroker
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = InProcessAlertBroker(replay_size=3, max_queue=10)
+    monkeypatch.setattr(doctor, "alert_broker", broker)
+    for i in range(1, 6):  # ids 1-5; 3-5 still buffered
+        broker.publish("prediction", {"id": 100 + i})
+    return broker
+
+
+def parse(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines() if not line.startswith(":"))
+    return fields.get("id"), fields.get("event"), json.loads(fields["data"]) if "data" in fields else None
+
+
+async def read_events(broker, n, query_id=None, header_id=None, publish=()):
+    response = await doctor.stream_alerts(last_event_id=query_id, last_event_id_header=header_id)
+    stream = response.body_iterator
+    try:
+        assert (await stream.__anext__()).startswith("retry:")
+        events = []
+        for _ in range(n):
+            if not events and publish:
+                # Connected: anything published now arrives live
+                for payload in publish:
+                    broker.publish("feedback", payload)
+            events.append(parse(await asyncio.wait_for(stream.__anext__(), 2)))
+        return events
+    finally:
+        await stream.aclose()
+
+
+def test_resume_replays_missed_events(broker):
+    events = asyncio.run(read_events(broker, 2, header_id="3"))
+    assert [(i, e, d["id"], d["reason"]) for i, e, d in events] == [
+        ("4", "alert", 104, "prediction"), ("5", "alert", 105, "prediction")]
+
+
+def test_header_wins_over_query(broker):
+    events = asyncio.run(read_events(broker, 1, query_id=1, header_id="4"))
+    assert events[0][:2] == ("5", "alert")
+
+
+@pytest.mark.parametrize("last_id", [1, 99])
+def test_stale_or_future_id_resets(broker, last_id):
+    # 1: events 2+ fell out of the buffer; 99: ids restarted with the process
+    (event,) = asyncio.run(read_events(broker, 1, query_id=last_id))
+    assert event == ("5", "reset", {})
+
+
+def test_live_events_follow_the_replay(broker):
+    events = asyncio.run(read_events(broker, 2, header_id="4", publish=[{"id": 200}]))
+    assert [(i, d["id"], d["reason"]) for i, _, d in events] == [("5", 105, "prediction"), ("6", 200, "feedback")]
+    assert broker.stats()["subscribers"] == 0  # closing the stream unsubscribes
@@ -0,0 +1,32 @@
+"""Analytics store refresh: a failed refresh publishes no part files and can be retried."""
+import pytest
+
+from app.services import analytics_store as store_module
+from app.services.analytics_store import AnalyticsStore
+from conftest import VITALS
+
+
+def test_failed_refresh_leaves_no_parts(client, make_patient, tmp_path, monkeypatch):
+    patient = make_patient("analytics_fail")
+    ids = [client.post(f"/api/v1/patient/predict/{patient}", json=VITALS).json()["id"] for _ in range(3)]
+    store = AnalyticsStore(tmp_path / "store", lookback_seconds=0, max_parts=8)
+    real_stream = store_module.stream_chunks
+
+    def fail_after_first_chunk(statement):
+        chunks = real_stream(statement)
+        yield next(chunks)
+        raise ConnectionError("server closed the connection")
+
+    monkeypatch.setattr(store_module, "ROW_GROUP_ROWS", 1)  # the first chunk is written before the failure
+    monkeypatch.setattr(store_module, "stream_chunks", fail_after_first_chunk)
+    with pytest.raises(ConnectionError):
+        store.refresh()
+    assert [p for p in (tmp_path / "store").rglob("*") if p.is_file() and p.name != ".lock"] == []
+    assert not store.initialized()
+
+    monkeypatch.setattr(store_module, "stream_chunks", real_stream)
+    summary = store.refresh()
+    assert summary["rows_appended"] > 0
+    assert [p.name for p in (tmp_path / "store").rglob("*.tmp")] == []
+    loaded = store.load(["patient_id"]).to_pydict()
+    assert set(ids) <= set(loaded["id"])
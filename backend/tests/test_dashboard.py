@@ -0,0 +1,50 @@
+"""/doctor/dashboard keyset pages: no row lost or repeated when timestamps tie."""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert
+
+from app.db.session import engine
+from app.models.health import HealthRecord
+from conftest import record_row
+
+BASE = datetime(2001, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def walk(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        body = client.get("/api/v1/doctor/dashboard", params=query).json()
+        pages.append([item["id"] for item in body["items"]])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_cursor_pages_split_ties(client, make_patient):
+    patient = make_patient("dash_ties")
+    # 3 + 4 + 1 records share timestamps; pages of 3 end inside each group
+    stamps = [BASE] * 3 + [BASE - timedelta(minutes=1)] * 4 + [BASE - timedelta(minutes=2)]
+    with engine.begin() as conn:
+        conn.execute(insert(HealthRecord.__table__), [record_row(patient, ts) for ts in stamps])
+    with engine.connect() as conn:
+        expected = [row.id for row in conn.execute(
+            HealthRecord.__table__.select().where(HealthRecord.patient_id == patient)
+            .order_by(HealthRecord.timestamp.desc(), HealthRecord.id.desc()))]
+
+    for params in ({"patient_id": patient},
+                   {"date_from": (BASE - timedelta(hours=1)).isoformat(),
+                    "date_to": (BASE + timedelta(hours=1)).isoformat()}):
+        pages = walk(client, limit=3, fields="patient_id", **params)
+        assert [len(p) for p in pages] == [3, 3, 2]
+        assert [i for page in pages for i in page] == expected
+
+
+def test_columnar_shape_matches_rows(client, make_patient):
+    patient = make_patient("dash_columns")
+    with engine.begin() as conn:
+        conn.execute(insert(HealthRecord.__table__), [record_row(patient, BASE - timedelta(days=1))])
+    params = {"patient_id": patient, "fields": "predicted_intensity,is_urgent"}
+    rows = client.get("/api/v1/doctor/dashboard", params=params).json()
+    cols = client.get("/api/v1/doctor/dashboard", params=dict(params, shape="columns")).json()
+    assert [dict(zip(cols["columns"], r)) for r in cols["data"]] == rows["items"]
@@ -0,0 +1,78 @@
+"""Bulk remark/override: per-item statuses for a mix of valid, duplicate and unknown ids."""
+from sqlalchemy import select
+
+from app.api.v1.doctor import INTENSITY_HR_FACTORS
+from app.db.session import engine
+from app.models.health import HealthRecord, Remark
+from app.services.ml_service import estimate_calories
+from conftest import VITALS
+
+UNKNOWN_ID = 10**9
+
+
+def predict(client, patient, n):
+    return [client.post(f"/api/v1/patient/predict/{patient}", json=VITALS).json() for _ in range(n)]
+
+
+def test_bulk_override_mixed_ids(client, make_patient):
+    patient = make_patient("bulk_override")
+    a, b, c = predict(client, patient, 3)
+    stats_before = client.get(f"/api/v1/patient/stats/{patient}").json()
+
+    body = client.patch("/api/v1/doctor/override/bulk", json=[
+        {"record_id": a["id"], "new_intensity": "High"},
+        {"record_id": UNKNOWN_ID, "new_intensity": "Low"},
+        {"record_id": b["id"], "new_intensity": "Low"},
+        {"record_id": a["id"], "new_intensity": "Low"},
+    ]).json()
+    assert [r["status"] for r in body["results"]] == ["updated", "not_found", "updated", "duplicate"]
+    assert (body["updated"], body["failed"]) == (2, 2)
+
+    with engine.connect() as conn:
+        rows = {r.id: r for r in conn.execute(select(HealthRecord.__table__)
+                                              .where(HealthRecord.patient_id == patient))}
+    for record, intensity in ((a, "High"), (b, "Low")):
+        row = rows[record["id"]]
+        low, high = INTENSITY_HR_FACTORS[intensity]
+        assert row.predicted_intensity == intensity and not row.is_urgent
+        assert (row.target_hr_min, row.target_hr_max) == (int(low * row.mhr), int(high * row.mhr))
+        assert row.calories_burned == estimate_calories(intensity, row.weight)
+    assert rows[c["id"]].predicted_intensity == c["predicted_intensity"]  # untouched
+
+    stats_after = client.get(f"/api/v1/patient/stats/{patient}").json()
+    assert abs(stats_after["total_calories"] - sum(r.calories_burned for r in rows.values())) < 0.1
+    assert stats_after["sessions"] == stats_before["sessions"] == 3
+
+
+def test_invalid_intensity_is_422_on_both_routes(client, make_patient):
+    (record,) = predict(client, make_patient("bulk_invalid"), 1)
+    assert client.patch("/api/v1/doctor/override/bulk",
+                        json=[{"record_id": record["id"], "new_intensity": "Extreme"}]).status_code == 422
+    assert client.patch(f"/api/v1/doctor/override/{record['id']}",
+                        params={"new_intensity": "Extreme"}).status_code == 422
+
+
+def test_bulk_remarks_mixed_ids(client, make_patient):
+    patient = make_patient("bulk_remark")
+    a, b = predict(client, patient, 2)
+    body = client.post("/api/v1/doctor/remark/bulk", params={"user_id": 2}, json=[
+        {"record_id": a["id"], "text": "Reviewed"},
+        {"record_id": UNKNOWN_ID, "text": "Lost"},
+        {"record_id": a["id"], "text": "Follow up"},
+    ]).json()
+    assert [r["status"] for r in body["results"]] == ["saved", "not_found", "saved"]
+    assert (body["saved"], body["failed"]) == (2, 1)
+
+    with engine.connect() as conn:
+        texts = conn.execute(select(Remark.text).where(Remark.record_id == a["id"]).order_by(Remark.id)).scalars().all()
+        assert conn.execute(select(Remark).where(Remark.record_id == b["id"])).first() is None
+    assert texts == ["Reviewed", "Follow up"]
+    history = {r["id"]: r for r in client.get(f"/api/v1/patient/history/{patient}").json()}
+    assert history[a["id"]]["doctor_note"] == "Reviewed; Follow up"
+    assert history[a["id"]]["updated_at"] > history[b["id"]]["updated_at"]
+
+
+def test_bulk_limits(client):
+    assert client.patch("/api/v1/doctor/override/bulk", json=[]).status_code == 400
+    assert client.post("/api/v1/doctor/remark/bulk", params={"user_id": 2},
+                       json=[{"record_id": 1, "text": "x"}] * 501).status_code == 400
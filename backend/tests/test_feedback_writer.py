@@ -0,0 +1,103 @@
+"""Write-behind feedback: journal replay on start, retry after a failed flush, 404 for unknown records."""
+import asyncio
+import json
+
+from sqlalchemy import select
+
+from app.api.v1 import patient as patient_api
+from app.db.session import engine
+from app.models.health import HealthRecord
+from app.services import feedback_writer as fw
+from app.services.feedback_writer import FeedbackWriter
+from conftest import VITALS
+
+HR = HealthRecord.__table__
+
+
+def predict(client, patient, n):
+    return [client.post(f"/api/v1/patient/predict/{patient}", json=VITALS).json()["id"] for _ in range(n)]
+
+
+def feedback_of(record_id):
+    with engine.connect() as conn:
+        return tuple(conn.execute(select(HR.c.borg_rating_after, HR.c.mood, HR.c.symptoms)
+                                  .where(HR.c.id == record_id)).one())
+
+
+def row(record_id, borg, mood="Good", symptoms="None"):
+    return {"b_id": record_id, "b_borg": borg, "b_mood": mood, "b_symptoms": symptoms}
+
+
+def writer(journal_dir):
+    return FeedbackWriter(True, flush_rows=1000, flush_seconds=60, max_pending=100, journal_dir=journal_dir)
+
+
+def test_journal_replayed_on_start(client, make_patient, tmp_path):
+    a, b = predict(client, make_patient("fb_replay"), 2)
+    journal = tmp_path / "journal"
+    journal.mkdir()
+    (journal / "feedback-00000001.ndjson").write_text(
+        json.dumps(row(a, 11)) + "\n" + json.dumps(row(b, 12)) + "\n")
+    # A later segment supersedes the first; the torn last line from a crash is skipped
+    (journal / "feedback-00000002.ndjson").write_text(
+        json.dumps(row(a, 14, "Tired")) + "\n" + '{"b_id": ')
+
+    async def scenario():
+        w = writer(journal)
+        await w.start()
+        await w.stop()
+
+    asyncio.run(scenario())
+    assert feedback_of(a) == (14, "Tired", "None")
+    assert feedback_of(b) == (12, "Good", "None")
+    assert list(journal.iterdir()) == []
+
+
+def test_failed_flush_requeues_and_retries(client, make_patient, tmp_path, monkeypatch):
+    a, b = predict(client, make_patient("fb_retry"), 2)
+    journal = tmp_path / "journal"
+    real_write = fw._write_rows
+    calls = []
+
+    def flaky(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        real_write(rows)
+
+    monkeypatch.setattr(fw, "_write_rows", flaky)
+
+    async def scenario():
+        w = writer(journal)
+        await w.start()
+        w.submit(a, 10, "Good", "None")
+        w.submit(b, 11, "Good", "None")
+        assert await w.flush() == 0
+        assert w.stats()["pending"] == 2
+        assert len(list(journal.iterdir())) == 2  # the failed batch's segment is kept
+
+        w.submit(a, 15, "Tired", "None")  # newer than the requeued row
+        assert await w.flush() == 2
+        assert w.stats()["pending"] == 0
+        await w.stop()
+
+    asyncio.run(scenario())
+    assert calls == [2, 2]
+    assert feedback_of(a) == (15, "Tired", "None")
+    assert feedback_of(b) == (11, "Good", "None")
+    assert list(journal.iterdir()) == []
+
+
+def test_write_behind_unknown_record_404(client, make_patient, tmp_path, monkeypatch):
+    [record] = predict(client, make_patient("fb_404"), 1)
+    w = writer(tmp_path / "journal")
+    monkeypatch.setattr(patient_api, "feedback_writer", w)
+    client.portal.call(w.start)
+    try:
+        body = {"borg_rating": 13, "mood": "Good", "symptoms": []}
+        assert client.patch("/api/v1/patient/feedback/1000000000", json=body).status_code == 404
+        assert client.patch(f"/api/v1/patient/feedback/{record}", json=body).json() == {"status": "queued"}
+        assert w.stats()["pending"] == 1
+    finally:
+        client.portal.call(w.stop)
+    assert feedback_of(record) == (13, "Good", "None")
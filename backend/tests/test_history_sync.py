@@ -0,0 +1,54 @@
+"""/patient/history: ETag revalidation (304) and ?since= deltas from X-Sync-Cursor."""
+from conftest import VITALS
+
+
+def predict(client, patient, n):
+    return [client.post(f"/api/v1/patient/predict/{patient}", json=VITALS).json()["id"] for _ in range(n)]
+
+
+def history(client, patient, **params):
+    return client.get(f"/api/v1/patient/history/{patient}", params=params)
+
+
+def test_etag_revalidates_and_changes_with_remarks_and_feedback(client, make_patient):
+    patient = make_patient("sync_etag")
+    a, b, _ = predict(client, patient, 3)
+
+    first = history(client, patient)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and len(first.json()) == 3
+
+    unchanged = client.get(f"/api/v1/patient/history/{patient}", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert (unchanged.headers["etag"], unchanged.headers["x-sync-cursor"]) == (etag, first.headers["x-sync-cursor"])
+
+    client.post(f"/api/v1/doctor/remark/{a}", params={"text": "Reviewed", "user_id": 2})
+    after_remark = client.get(f"/api/v1/patient/history/{patient}", headers={"If-None-Match": etag})
+    assert after_remark.status_code == 200 and after_remark.headers["etag"] != etag
+
+    client.patch(f"/api/v1/patient/feedback/{b}", json={"borg_rating": 12, "mood": "Good", "symptoms": []})
+    after_feedback = client.get(f"/api/v1/patient/history/{patient}",
+                                headers={"If-None-Match": after_remark.headers["etag"]})
+    assert after_feedback.status_code == 200
+    assert after_feedback.headers["etag"] not in (etag, after_remark.headers["etag"])
+
+
+def test_since_returns_only_changed_records(client, make_patient):
+    patient = make_patient("sync_since")
+    a, b, c = predict(client, patient, 3)
+    cursor = history(client, patient).headers["x-sync-cursor"]
+
+    # Nothing changed: only the record the cursor points at (>=, re-sent rather than missed)
+    assert [r["id"] for r in history(client, patient, since=cursor).json()] == [c]
+
+    client.post(f"/api/v1/doctor/remark/{a}", params={"text": "Reviewed", "user_id": 2})
+    delta = history(client, patient, since=cursor)
+    assert {r["id"] for r in delta.json()} == {a, c}
+    assert next(r for r in delta.json() if r["id"] == a)["doctor_note"] == "Reviewed"
+
+    cursor = delta.headers["x-sync-cursor"]
+    client.patch(f"/api/v1/patient/feedback/{b}", json={"borg_rating": 12, "mood": "Good", "symptoms": []})
+    body = history(client, patient, since=cursor, shape="columns").json()
+    delta = {row[body["columns"].index("id")]: row for row in body["data"]}
+    assert set(delta) == {a, b}
+    assert delta[b][body["columns"].index("borg_rating_after")] == 12
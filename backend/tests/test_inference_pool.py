@@ -0,0 +1,50 @@
+"""InferencePool: coalesced batches give the single-call results; stop() fails what is left."""
+import asyncio
+import random
+
+from app.services.inference_pool import BATCH_SIZE, InferencePool
+from app.services.ml_service import ml_service
+
+
+def random_rows(n, seed=0):
+    rnd = random.Random(seed)
+    return [(rnd.randint(18, 90), rnd.choice("MF"), round(rnd.uniform(45, 140), 1),
+             rnd.randint(45, 120), rnd.randint(95, 180), rnd.randint(60, 110),
+             rnd.randint(50, 120), rnd.randint(10, 28), rnd.randint(6, 18),
+             rnd.choice(["None", "HTN", "DM", "HTN, DM"])) for _ in range(n)]
+
+
+def test_micro_batched_results_match_single_calls():
+    ml_service.ensure_loaded()
+    rows = random_rows(64)
+    ml_service.cache.clear()
+    expected = [ml_service.predict_and_audit(*row) for row in rows]
+    ml_service.cache.clear()
+
+    async def run():
+        pool = InferencePool("thread", 2, window_ms=20, max_batch=16)
+        await pool.start()
+        try:
+            batches = BATCH_SIZE.snapshot()["count"]
+            results = await asyncio.gather(*[pool.predict(*row) for row in rows])
+            return results, BATCH_SIZE.snapshot()["count"] - batches
+        finally:
+            await pool.stop()
+
+    results, batches = asyncio.run(run())
+    assert results == expected
+    assert batches < len(rows)  # requests were actually coalesced
+
+
+def test_stop_fails_queued_requests():
+    async def run():
+        pool = InferencePool("thread", 1, window_ms=500, max_batch=64)
+        await pool.start()
+        tasks = [asyncio.create_task(pool.predict(*row)) for row in random_rows(5)]
+        await asyncio.sleep(0.05)  # still inside the batch window
+        await pool.stop()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+
+    results = asyncio.run(run())
+    assert [str(r) for r in results] == ["inference pool stopped"] * 5
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,83 @@
+"""run_migrations on a database file from before any migration: indexes, columns and back-fills."""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import column, inspect, insert, select, table
+from sqlmodel import SQLModel
+
+from app.db.migrations import MIGRATIONS, run_migrations
+from app.models.health import HealthRecord, Remark
+from app.models.stats import PatientStats
+from app.models.trend import PatientTrend
+from app.models.user import User, UserRole
+from conftest import record_row
+
+HR = HealthRecord.__table__
+BASELINE_TABLES = {"user", "healthrecord", "remark"}
+# Columns migrations added to healthrecord (the baseline model had none of them)
+ADDED_COLUMNS = ("model_version", "updated_at", "model_intensity", "model_urgent")
+T0 = datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def build_baseline(engine):
+    """The schema as the original create_all left it: three tables, no secondary indexes."""
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for mapped in (HR, Remark.__table__):
+            for index in mapped.indexes:
+                conn.exec_driver_sql(f"DROP INDEX {index.name}")
+        for name in ADDED_COLUMNS:
+            conn.exec_driver_sql(f"ALTER TABLE healthrecord DROP COLUMN {name}")
+        for name in set(SQLModel.metadata.tables) - BASELINE_TABLES:
+            conn.exec_driver_sql(f'DROP TABLE "{name}"')
+
+
+def seed(engine):
+    # The mapped table would also insert the new columns' defaults
+    legacy = table("healthrecord", *[column(c.name, c.type) for c in HR.c if c.name not in ADDED_COLUMNS])
+
+    def baseline(row):
+        return {"symptoms": None, **{k: v for k, v in row.items() if k not in ADDED_COLUMNS}}
+
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__).values(id=1, username="legacy", role=UserRole.PATIENT.name,
+                                                   age=55, gender="M"))
+        conn.execute(insert(legacy), [
+            baseline(record_row(1, T0)),  # as the model prescribed
+            baseline(record_row(1, T0 + timedelta(days=1), predicted_intensity="High",
+                                target_hr_max=150)),  # doctor override
+            baseline(record_row(1, T0 + timedelta(days=1, hours=2), is_urgent=True,
+                                symptoms="Chest Pain")),  # escalated by feedback
+        ])
+        conn.execute(insert(Remark.__table__).values(record_id=1, doctor_id=1, text="Reviewed",
+                                                      timestamp=T0 + timedelta(days=30)))
+
+
+def test_baseline_database_is_migrated(tmp_engine):
+    build_baseline(tmp_engine)
+    seed(tmp_engine)
+    assert not {c["name"] for c in inspect(tmp_engine).get_columns("healthrecord")} & set(ADDED_COLUMNS)
+
+    # As on startup: create_all adds the new tables, migrations bring the old ones up to date
+    SQLModel.metadata.create_all(tmp_engine)
+    assert run_migrations(tmp_engine) == [version for version, _, _ in MIGRATIONS]
+    assert run_migrations(tmp_engine) == []
+
+    inspector = inspect(tmp_engine)
+    for table in (HR, Remark.__table__):
+        assert {i.name for i in table.indexes} <= {i["name"] for i in inspector.get_indexes(table.name)}
+    assert set(ADDED_COLUMNS) <= {c["name"] for c in inspector.get_columns("healthrecord")}
+
+    with tmp_engine.connect() as conn:
+        rows = conn.execute(select(HR.c.id, HR.c.predicted_intensity, HR.c.updated_at,
+                                   HR.c.model_intensity, HR.c.model_urgent).order_by(HR.c.id)).all()
+        stats = conn.execute(select(PatientStats.__table__)).one()
+        trend = conn.execute(select(PatientTrend.__table__)).one()
+
+    assert [r.predicted_intensity for r in rows] == ["Moderate", "High", "Moderate"]
+    # updated_at: the latest remark, else the session's own timestamp
+    assert [r.updated_at for r in rows] == [T0 + timedelta(days=30), T0 + timedelta(days=1),
+                                            T0 + timedelta(days=1, hours=2)]
+    # Only the untouched prescription is known to be the model's own
+    assert [(r.model_intensity, r.model_urgent) for r in rows] == [("Moderate", False), (None, None), (None, None)]
+    assert (stats.patient_id, stats.sessions, stats.active_days) == (1, 3, 2)
+    assert (trend.patient_id, trend.sessions) == (1, 3)
@@ -0,0 +1,64 @@
+"""
+The shipped model artifact loads in a plain process, and the compiled single-row
+fast path gives exactly the labels of pipeline.predict.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.fast_path import FEATURE_ORDER  # noqa: E402
+from app.services.ml_service import MODEL_DIR  # noqa: E402
+from app.services.model_registry import ModelRegistry  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    registry = ModelRegistry(MODEL_DIR)
+    return registry.load(registry.active_version())
+
+
+def random_features(rnd, conditions):
+    return (
+        rnd.randint(18, 90), rnd.choice(["M", "F"]), round(rnd.uniform(40, 160), 1),
+        rnd.randint(40, 130), rnd.randint(90, 200), rnd.randint(50, 120),
+        rnd.randint(45, 140), rnd.randint(8, 30), rnd.randint(6, 20),
+        rnd.choice(conditions),
+    )
+
+
+def test_artifact_loads(bundle):
+    assert bundle.pipeline is not None
+    assert bundle.encoder is not None
+    assert bundle.fast_path is not None
+
+
+def test_fast_path_matches_pipeline(bundle):
+    import pandas as pd
+
+    rnd = random.Random(0)
+    conditions = bundle.input_domains["Pre-existing Conditions"]
+    inputs = [random_features(rnd, conditions) for _ in range(3000)]
+    expected = bundle.encoder.inverse_transform(
+        bundle.pipeline.predict(pd.DataFrame(inputs, columns=list(FEATURE_ORDER))))
+    mismatches = [
+        (features, label) for features, label in zip(inputs, expected)
+        if bundle.fast_path.predict(*features) != label
+    ]
+    assert mismatches == []
+
+
+def test_unknown_condition_falls_back(bundle):
+    # Outside the manifest's domain: no guess, the caller uses the pipeline
+    assert bundle.fast_path.predict(60, "M", 80.0, 70, 120, 80, 72, 16, 10, "CKD") is None
+
+
+def test_no_domain_no_fast_path(bundle):
+    from app.services.fast_path import compile_pipeline
+    assert compile_pipeline(bundle.pipeline, bundle.encoder, input_domains={}) is None
@@ -0,0 +1,83 @@
+"""PatientStats kept by the per-write upserts equals a full rebuild_stats."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlmodel import Session
+
+from app.db.session import SyncSessionAdapter, engine
+from app.models.health import HealthRecord
+from app.services import stats_service
+from conftest import VITALS, record_row
+
+COLUMNS = ["sessions", "total_calories", "active_days", "last_active_date", "last_session_at"]
+
+
+def stats_row(conn, patient_id):
+    row = conn.execute(select(stats_service.STATS).where(stats_service.STATS.c.patient_id == patient_id)).one()
+    return {c: getattr(row, c) for c in COLUMNS}
+
+
+def rebuilt(patient_ids):
+    # Rebuild in a transaction that is rolled back: the shared test database keeps its state
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            stats_service.rebuild_stats(conn)
+            rows = {p: stats_row(conn, p) for p in patient_ids}
+            transaction.rollback()
+    return rows
+
+
+def incremental(patient_ids):
+    with engine.connect() as conn:
+        return {p: stats_row(conn, p) for p in patient_ids}
+
+
+def assert_same(a, b):
+    assert a.keys() == b.keys()
+    for patient_id in a:
+        left, right = dict(a[patient_id]), dict(b[patient_id])
+        assert abs(left.pop("total_calories") - right.pop("total_calories")) < 1e-6
+        assert left == right
+
+
+def test_upserts_match_rebuild_across_days(make_patient):
+    patient = make_patient("stats_days")
+    start = datetime(2002, 6, 1, 23, 0, tzinfo=timezone.utc)
+    # Batches in time order; the second starts on the day the first ended
+    batches = [[0, 0.5], [1.5, 2, 26], [50], [50.2, 75]]
+
+    async def write():
+        adapter = SyncSessionAdapter(Session(engine, expire_on_commit=False))
+        try:
+            for hours in batches:
+                records = [HealthRecord(**record_row(patient, start + timedelta(hours=h),
+                                                     calories_burned=100.0 + h)) for h in hours]
+                adapter.add_all(records)
+                await stats_service.record_sessions(adapter, records)
+                await adapter.commit()
+            await stats_service.adjust_calories(adapter, {patient: -12.5})
+            await adapter.execute(HealthRecord.__table__.update()
+                                  .where(HealthRecord.patient_id == patient,
+                                         HealthRecord.timestamp == start)
+                                  .values(calories_burned=100.0 - 12.5))
+            await adapter.commit()
+        finally:
+            await adapter.close()
+
+    asyncio.run(write())
+    live = incremental([patient])
+    assert live[patient]["sessions"] == 8 and live[patient]["active_days"] == 5
+    assert_same(live, rebuilt([patient]))
+
+
+def test_api_writes_match_rebuild(client, make_patient):
+    patients = [make_patient("stats_api_a"), make_patient("stats_api_b", age=40, gender="F")]
+    for patient in patients:
+        assert client.post(f"/api/v1/patient/predict/{patient}", json=VITALS).status_code == 200
+    batch = [dict(VITALS, user_id=p, weight=60.0 + i) for i, p in enumerate(patients * 2)]
+    records = client.post("/api/v1/patient/predict/batch", json=batch).json()
+    override = {"Low": "High"}.get(records[0]["predicted_intensity"], "Low")
+    assert client.patch(f"/api/v1/doctor/override/{records[0]['id']}",
+                        params={"new_intensity": override}).status_code == 200
+    assert_same(incremental(patients), rebuilt(patients))
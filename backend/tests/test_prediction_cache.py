@@ -0,0 +1,64 @@
+"""PredictionCache: TTL expiry, LRU eviction, and keys scoped to the model version."""
+import pytest
+
+from app.services import prediction_cache
+from app.services.prediction_cache import PredictionCache
+
+FEATURES = (60, "M", 80.0, 70, 120, 80, 72, 16, 10, "None")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(max_size=4, ttl_seconds=10)
+    cache.put("k", {"predicted_intensity": "Low"})
+    clock[0] += 9.9
+    assert cache.get("k") == {"predicted_intensity": "Low"}
+    clock[0] += 0.2
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0 and cache.evictions == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = PredictionCache(max_size=2, ttl_seconds=60)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # "b" is now the oldest
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1} and cache.get("c") == {"v": 3}
+
+
+def test_hits_are_copies(clock):
+    cache = PredictionCache(max_size=2, ttl_seconds=60)
+    cache.put("k", {"v": 1})
+    cache.get("k")["v"] = 99
+    assert cache.get("k") == {"v": 1}
+
+
+def test_cache_is_keyed_by_model_version():
+    from app.services.ml_service import ml_service
+    from app.services.model_registry import ModelBundle
+
+    ml_service.ensure_loaded()
+    live = ml_service.bundle
+    ml_service.cache.clear()
+    first = ml_service.predict_and_audit(*FEATURES)
+    assert ml_service.predict_and_audit(*FEATURES) == first
+    hits = ml_service.cache.hits
+
+    # Same features on another version must not be served from v1's entry
+    other = ModelBundle("v-other", live.pipeline, live.encoder, live.input_domains)
+    ml_service.bundle = other
+    try:
+        result = ml_service.predict_and_audit(*FEATURES)
+    finally:
+        ml_service.bundle = live
+    assert ml_service.cache.hits == hits
+    assert result["model_version"] == "v-other"
+    assert ml_service.cache.get((live.version,) + FEATURES)["model_version"] == live.version
@@ -0,0 +1,84 @@
+"""Rescore runs: an interrupted run resumes from its checkpoint without gaps or duplicates."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlmodel import SQLModel
+
+from app.models.health import HealthRecord
+from app.models.rescore import RescoreResult, RescoreRun
+from app.models.user import User, UserRole
+from app.services import rescore_service
+from app.services.ml_service import ml_service
+from conftest import record_row
+
+RESULTS = RescoreResult.__table__
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+CHUNK = 4
+
+
+@pytest.fixture
+def history(tmp_engine):
+    """27 records: 3 from a patient without a profile, 4 with unknown model output."""
+    SQLModel.metadata.create_all(tmp_engine)
+    with tmp_engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": 1, "username": "profiled", "role": UserRole.PATIENT.name, "age": 60, "gender": "F"},
+            {"id": 2, "username": "no_profile", "role": UserRole.PATIENT.name, "age": None, "gender": None},
+        ])
+        rows = []
+        for i in range(27):
+            overrides = {"resting_hr": 60 + i, "bp_systolic": 110 + 2 * i}
+            if i % 9 == 4:
+                overrides["patient_id"] = 2
+            if i % 7 == 3:
+                overrides.update(model_intensity=None, model_urgent=None)
+            rows.append(record_row(overrides.pop("patient_id", 1), T0 + timedelta(hours=i), **overrides))
+        conn.execute(insert(HealthRecord.__table__), rows)
+    return tmp_engine
+
+
+def run_results(engine, run_id):
+    with engine.connect() as conn:
+        run = conn.execute(select(RescoreRun.__table__).where(RescoreRun.__table__.c.id == run_id)).one()
+        ids = conn.execute(select(RESULTS.c.record_id).where(RESULTS.c.run_id == run_id)
+                           .order_by(RESULTS.c.record_id)).scalars().all()
+    return run, ids
+
+
+def test_interrupted_run_resumes_from_checkpoint(history, monkeypatch):
+    version = ml_service.registry.active_version()
+    reference = rescore_service.create_run(history, version, CHUNK)
+    rescore_service.execute_run(history, reference, workers=0)
+    expected_run, expected_ids = run_results(history, reference)
+    assert (expected_run.scored, expected_run.skipped, expected_run.excluded) == (20, 3, 4)
+
+    real_write, writes = rescore_service._write_chunk, []
+
+    def crash_after_two(*args):
+        if len(writes) == 2:
+            raise KeyboardInterrupt
+        writes.append(args[2])  # last_id
+        real_write(*args)
+
+    monkeypatch.setattr(rescore_service, "_write_chunk", crash_after_two)
+    run_id = rescore_service.create_run(history, version, CHUNK)
+    with pytest.raises(KeyboardInterrupt):
+        rescore_service.execute_run(history, run_id, workers=0)
+    run, ids = run_results(history, run_id)
+    assert (run.status, run.last_record_id) == ("failed", writes[-1])
+    assert ids and all(i <= run.last_record_id for i in ids)
+
+    monkeypatch.setattr(rescore_service, "_write_chunk", real_write)
+    rescore_service.execute_run(history, run_id, workers=0)
+    run, ids = run_results(history, run_id)
+    assert (run.status, run.error, run.last_record_id) == ("done", None, expected_run.last_record_id)
+    assert ids == expected_ids  # every scorable record exactly once
+    assert (run.scored, run.skipped, run.excluded, run.changed, run.adjusted) == (
+        expected_run.scored, expected_run.skipped, expected_run.excluded,
+        expected_run.changed, expected_run.adjusted)
+
+    # Resuming a finished run is a no-op
+    rescore_service.execute_run(history, run_id, workers=0)
+    with history.connect() as conn:
+        assert conn.execute(select(func.count()).where(RESULTS.c.run_id == run_id)).scalar() == len(ids)
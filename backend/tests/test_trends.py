@@ -0,0 +1,63 @@
+"""Trend windows: ring-buffer serialization and resize, feedback written into the window."""
+from app.services.feedback_writer import _write_rows
+from app.services.trend_service import UNKNOWN, VALUES, TrendBuffer
+from conftest import VITALS
+
+
+def session(n):
+    return {"record_id": n, "timestamp": 1_700_000_000 + n * 3600,
+            **{f: (UNKNOWN if f == "borg_rating_after" and n % 2 else 60 + n + k) for k, f in enumerate(VALUES)}}
+
+
+def filled(size, n):
+    buffer = TrendBuffer(size)
+    for i in range(1, n + 1):
+        buffer.append(session(i))
+    return buffer
+
+
+def test_round_trip_keeps_order_after_wrapping():
+    buffer = filled(4, 6)  # wrapped: sessions 3-6 remain, head mid-array
+    restored = TrendBuffer.from_bytes(buffer.to_bytes(), 4)
+    assert restored.sessions() == buffer.sessions() == [session(i) for i in range(3, 7)]
+    assert (restored.head, restored.count) == (buffer.head, buffer.count)
+    assert restored.to_bytes() == buffer.to_bytes()
+
+
+def test_resize_keeps_the_most_recent_sessions():
+    data = filled(4, 6).to_bytes()
+    assert TrendBuffer.from_bytes(data, 2).sessions() == [session(5), session(6)]
+
+    grown = TrendBuffer.from_bytes(data, 6)
+    assert grown.sessions() == [session(i) for i in range(3, 7)]
+    grown.append(session(7))
+    grown.append(session(8))
+    grown.append(session(9))
+    assert grown.sessions() == [session(i) for i in range(4, 10)]
+
+
+def test_set_value_only_touches_buffered_sessions():
+    buffer = filled(3, 5)
+    assert buffer.set_value(5, "borg_rating_after", 14)
+    assert not buffer.set_value(1, "borg_rating_after", 14)  # evicted
+    assert buffer.sessions()[-1]["borg_rating_after"] == 14
+
+
+def window(client, patient):
+    return {s["record_id"]: s["borg_rating_after"] for s in client.get(f"/api/v1/patient/trend/{patient}").json()["sessions"]}
+
+
+def test_feedback_is_stored_in_the_window(client, make_patient):
+    patient = make_patient("trend_feedback")
+    a, b, c = [client.post(f"/api/v1/patient/predict/{patient}", json=VITALS).json()["id"] for _ in range(3)]
+    assert window(client, patient) == {a: None, b: None, c: None}
+
+    # Inline write (the route), then a write-behind batch
+    client.patch(f"/api/v1/patient/feedback/{a}", json={"borg_rating": 13, "mood": "Good", "symptoms": []})
+    _write_rows([{"b_id": b, "b_borg": 15, "b_mood": "Tired", "b_symptoms": "None"},
+                 {"b_id": 10**9, "b_borg": 11, "b_mood": "Good", "b_symptoms": "None"}])
+    assert window(client, patient) == {a: 13, b: 15, c: None}
+
+    # The next prediction sees both ratings
+    trend = client.post(f"/api/v1/patient/predict/{patient}", json=VITALS).json()["trend"]
+    assert trend["borg_rise"] == {"mean": 5.0, "last": 6, "sessions": 2}
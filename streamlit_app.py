@@ -28,6 +28,33 @@ BORG_DESC = {
     20: "Maximal exertion (Absolute maximum effort)"
 }
 
+# --- HISTORY SYNC ---
+def sync_history(user_id):
+    # Keeps the history in session state and asks the API only for what
+    # changed: 304 when nothing did, otherwise the new/edited records
+    # (merged by id). Returns the history DataFrame, or None on error.
+    cache = st.session_state.setdefault("history_cache", {})
+    entry = cache.get(user_id)
+    headers, params = {}, {"shape": "columns"}
+    if entry:
+        headers["If-None-Match"] = entry["etag"]
+        if entry["cursor"]: params["since"] = entry["cursor"]
+
+    res = requests.get(f"{API_URL}/patient/history/{user_id}", headers=headers, params=params)
+    if res.status_code == 304:
+        return entry["df"]
+    if res.status_code != 200:
+        return None
+
+    body = res.json()
+    df = pd.DataFrame(body["data"], columns=body["columns"])
+    if entry:
+        # New versions replace the cached rows with the same id
+        df = pd.concat([df, entry["df"][~entry["df"]["id"].isin(df["id"])]], ignore_index=True)
+    df = df.sort_values("timestamp", ascending=False, ignore_index=True)
+    cache[user_id] = {"etag": res.headers.get("ETag", ""), "cursor": res.headers.get("X-Sync-Cursor", ""), "df": df}
+    return df
+
 # --- AUTH FUNCTIONS ---
 def login(username):
     user_data = None
@@ -46,9 +73,39 @@ def login(username):
         st.session_state["user"] = user_data
         st.rerun()
 
+DASHBOARD_PAGE = 200
+
+def fetch_dashboard(cursor=None, limit=DASHBOARD_PAGE, **params):
+    # One keyset page (newest first) -> (DataFrame, next_cursor); the
+    # columnar shape loads straight into a DataFrame. Older pages are only
+    # fetched when the doctor asks for them.
+    params.update(limit=limit, shape="columns")
+    if cursor:
+        params["cursor"] = cursor
+    res = requests.get(f"{API_URL}/doctor/dashboard", params=params)
+    if res.status_code != 200:
+        return None, None
+    page = res.json()
+    return pd.DataFrame(page["data"], columns=page["columns"]), page["next_cursor"]
+
+def resolve_usernames(user_ids):
+    # id -> username, remembered for the session; unknown ids in one request
+    names = st.session_state.setdefault("usernames", {})
+    missing = sorted({int(i) for i in user_ids} - names.keys())
+    for start in range(0, len(missing), 1000):
+        chunk = missing[start:start + 1000]
+        res = requests.get(f"{API_URL}/users", params={"ids": ",".join(map(str, chunk))})
+        if res.status_code == 200:
+            names.update({u["id"]: u["username"] for u in res.json()["items"]})
+    return names
+
+# Columns the doctor view actually renders (usernames resolved separately)
+DASHBOARD_FIELDS = "patient_id,timestamp,symptoms,bp_systolic,calories_burned,is_urgent,predicted_intensity,borg_rating_before,mood"
+
 def logout():
     st.session_state["user"] = None
     st.session_state["plan_data"] = None
+    st.session_state.pop("history_cache", None)
     st.rerun()
 
 # ==========================================
@@ -131,21 +188,17 @@ else:
 
         # --- GLOBAL STATS ---
         try:
-            h_res = requests.get(f"{API_URL}/patient/history/{user['id']}")
-            hist_df = pd.DataFrame()
-            if h_res.status_code == 200:
-                h_data = h_res.json()
-                if h_data:
-                    hist_df = pd.DataFrame(h_data)
-                    hist_df['date'] = pd.to_datetime(hist_df['timestamp']).dt.date
-                    streak_days = len(hist_df['date'].unique())
-                    total_cals = int(hist_df['calories_burned'].sum())
-                    
-                    m1, m2, m3 = st.columns(3)
-                    m1.metric("🔥 Active Streak", f"{streak_days} Days")
-                    m2.metric("⚡ Total Burn", f"{total_cals} kcal")
-                    m3.metric("📝 Total Sessions", len(hist_df))
-                    st.divider()
+            hist_df = sync_history(user["id"])
+            if hist_df is None: hist_df = pd.DataFrame()
+            if not hist_df.empty:
+                # Aggregates are maintained server-side
+                stats = requests.get(f"{API_URL}/patient/stats/{user['id']}").json()
+                
+                m1, m2, m3 = st.columns(3)
+                m1.metric("🔥 Active Streak", f"{stats['active_days']} Days")
+                m2.metric("⚡ Total Burn", f"{int(stats['total_calories'])} kcal")
+                m3.metric("📝 Total Sessions", stats['sessions'])
+                st.divider()
         except:
             st.error("Could not load stats.")
         
@@ -201,6 +254,15 @@ else:
                 st.subheader("Your AI Prescription")
                 if data["is_urgent"]: st.error("⚠️ HIGH RISK DETECTED - Intensity Reduced")
                 else: st.success(f"✅ Target: {data['predicted_intensity']} Intensity")
+
+                # Trend flags: this session compared with your recent ones
+                TREND_MESSAGES = {
+                    "resting_hr_rising": "Your resting heart rate is well above your recent average.",
+                    "bp_systolic_rising": "Your systolic blood pressure is well above your recent average.",
+                    "high_exertion": "Your recent workouts have felt much harder at the end than at the start.",
+                }
+                for flag in data.get("trend_flags", []):
+                    st.warning(f"📈 {TREND_MESSAGES.get(flag, flag)} Consider mentioning it to your doctor.")
                 
                 # RESTORED VIDEO HERE
                 st.video(data["youtube_link"])
@@ -254,53 +316,94 @@ else:
         col_t, col_r = st.columns([6,1])
         with col_t: st.title("👨‍⚕️ Clinical Command Center")
         with col_r: 
-            if st.button("🔄 Refresh", key="doc_refresh"): st.rerun()
+            if st.button("🔄 Refresh", key="doc_refresh"):
+                st.session_state.pop("dash", None)
+                st.rerun()
         
         try:
-            res = requests.get(f"{API_URL}/doctor/dashboard")
-            if res.status_code == 200:
-                all_records = res.json()
-                if not all_records:
+            # Recent activity, kept for the session until Refresh / an edit
+            dash = st.session_state.get("dash")
+            if dash is None:
+                df, next_cursor = fetch_dashboard(fields=DASHBOARD_FIELDS)
+                if df is not None:
+                    dash = st.session_state["dash"] = {"df": df, "next_cursor": next_cursor}
+            if dash is not None:
+                df = dash["df"]
+                if df.empty:
                     st.info("No records found.")
                 else:
-                    df = pd.DataFrame(all_records)
+                    names = resolve_usernames(df["patient_id"].unique())
+                    df["patient_username"] = df["patient_id"].map(names)
                     # Safe Defaults
                     for c in ["symptoms", "calories_burned", "is_urgent", "patient_username", "borg_rating", "borg_rating_before"]:
                         if c not in df.columns: df[c] = None
 
                     # 1. ALERT FILTER (Strict Urgency Check)
                     # Only show if is_urgent is TRUE. If Doctor overrode it (False), it disappears.
-                    urgent_cases = df[df["is_urgent"] == True]
+                    a_res = requests.get(f"{API_URL}/doctor/alerts", params={"limit": 1000})
+                    urgent_cases = pd.DataFrame(a_res.json()["items"] if a_res.status_code == 200 else [])
                     
                     if not urgent_cases.empty:
                         st.error(f"⚠️ {len(urgent_cases)} CRITICAL PATIENTS REQUIRE REVIEW")
                         # --- UPDATED: Added 'id' to the view ---
                         st.dataframe(urgent_cases[["id", "patient_username", "timestamp", "symptoms", "bp_systolic"]])
+
+                        # Clear several alerts in one request
+                        with st.expander("Bulk review"):
+                            bulk_ids = st.multiselect("Alert IDs", urgent_cases["id"].tolist(), key="bulk_ids")
+                            bulk_i = st.selectbox("Set Intensity", ["Low", "Moderate", "High"], key="bulk_i")
+                            bulk_note = st.text_input("Note for all (optional)", key="bulk_note")
+                            if st.button("Apply to Selected") and bulk_ids:
+                                if bulk_note:
+                                    requests.post(f"{API_URL}/doctor/remark/bulk", params={"user_id": user["id"]},
+                                                  json=[{"record_id": int(i), "text": bulk_note} for i in bulk_ids])
+                                b_res = requests.patch(f"{API_URL}/doctor/override/bulk",
+                                                       json=[{"record_id": int(i), "new_intensity": bulk_i} for i in bulk_ids])
+                                if b_res.status_code == 200:
+                                    failed = [r for r in b_res.json()["results"] if r["status"] != "updated"]
+                                    if failed:
+                                        st.warning(f"⚠️ {len(failed)} not updated: {failed}")
+                                    else:
+                                        st.success(f"✅ {b_res.json()['updated']} alerts cleared")
+                                        st.session_state.pop("dash", None)
+                                        st.rerun()
+                                else:
+                                    st.error("Bulk update failed")
                     else:
                         st.success("✅ No Critical Alerts Pending")
 
                     st.divider()
 
-                    # 2. PATIENT INSPECTOR
+                    # 2. PATIENT INSPECTOR (patients with recent activity)
+                    st.caption(f"Showing the {len(df)} most recent sessions")
+                    if dash["next_cursor"] and st.button("⬇️ Load older sessions"):
+                        older, next_cursor = fetch_dashboard(cursor=dash["next_cursor"], fields=DASHBOARD_FIELDS)
+                        if older is not None:
+                            dash["df"] = pd.concat([df, older], ignore_index=True)
+                            dash["next_cursor"] = next_cursor
+                            st.rerun()
+
                     c1, c2 = st.columns([1, 3])
                     with c1:
                         st.markdown("### 👤 Select Patient")
-                        p_users = sorted(df["patient_username"].astype(str).unique())
+                        patient_ids = dict(zip(df["patient_username"].astype(str), df["patient_id"]))
+                        p_users = sorted(patient_ids)
                         selected_user = st.selectbox("Username", p_users)
                     
                     with c2:
                         st.markdown(f"### Patient: **{selected_user}** Overview")
-                        p_df = df[df["patient_username"] == selected_user].copy()
+                        # The selected patient's own records, scoped server-side
+                        selected_id = int(patient_ids[selected_user])
+                        p_df, _ = fetch_dashboard(patient_id=selected_id, limit=1000, fields=DASHBOARD_FIELDS)
+                        p_df["patient_username"] = selected_user
                         p_df["timestamp"] = pd.to_datetime(p_df["timestamp"])
-                        p_df = p_df.sort_values("timestamp", ascending=False)
                         
                         # Stats
-                        stk = len(p_df["timestamp"].dt.date.unique())
-                        cal = int(p_df["calories_burned"].sum())
+                        p_stats = requests.get(f"{API_URL}/patient/stats/{selected_id}").json()
                         
                         m1, m2 = st.columns(2)
-                        m1.metric("Streak", f"{stk} Days")
-                        m2.metric("Total Burn", f"{cal} kcal")
+                        m1.metric("Streak", f"{p_stats['active_days']} Days")
+                        m2.metric("Total Burn", f"{int(p_stats['total_calories'])} kcal")
                         
                         st.subheader("Detailed History")
                         
@@ -328,6 +431,7 @@ else:
                             note = st.text_area("Doctor's Note")
                             if st.button("Save Note"):
                                 requests.post(f"{API_URL}/doctor/remark/{rec_id}", params={"text": note, "user_id": user["id"]})
+                                st.session_state.pop("dash", None)
                                 st.success("Saved!")
                         
                         with act2:
@@ -336,6 +440,7 @@ else:
                             if st.button("Update"):
                                 requests.patch(f"{API_URL}/doctor/override/{ov_id}", params={"new_intensity": new_i})
                                 st.success("Updated!")
+                                st.session_state.pop("dash", None)
                                 st.rerun()
 
             else: